@@ -0,0 +1,108 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# atlas.py module
+# Description:
+#   Texture atlases: several images of the same size packed into a grid on
+#   one texture, so objects that used to need their own textures (each
+#   billiard ball, each face of a die) share a single bind.
+#   Every image keeps a region of the atlas, and texture coordinates that
+#   covered the whole image (0 to 1) are remapped into that region.
+#   Each cell is padded with copies of its edge pixels, so sampling right
+#   at the edge of a region never picks up the image next to it.
+#   Only for images drawn once across a shape (not repeating ones).
+#   Mipmaps only go down as far as the padding lasts (a 4 pixel border is
+#   still 1 pixel two levels down), and atlases are never compressed, as
+#   compression works on 4x4 blocks that would cross into the next image.
+#==============================
+import math
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from textures import power_of_two_size
+
+# pixels of edge padding around each image (also keeps rows 4-byte aligned for sizes that are multiples of 4)
+ATLAS_PADDING = 4
+
+class AtlasRegion:
+    """Where one image sits in an atlas, in texture coordinates"""
+
+    def __init__(self, u0, v0, u1, v1):
+        self.u0 = u0
+        self.v0 = v0
+        self.u1 = u1
+        self.v1 = v1
+
+    def remap(self, s, t):
+        """ Texture coordinates (s, t) over the whole image, moved into this region. """
+        return (self.u0 + s * (self.u1 - self.u0), self.v0 + t * (self.v1 - self.v0))
+
+    def as_tuple(self):
+        return (self.u0, self.v0, self.u1, self.v1)
+
+class TextureAtlas:
+    """An uploaded atlas Texture and the region of each image in it"""
+
+    def __init__(self, texture, regions):
+        self.texture = texture  # Texture (see textures.py)
+        self.regions = regions  # name -> AtlasRegion
+
+    def __getitem__(self, name):
+        return self.regions[name]
+
+    def __contains__(self, name):
+        return name in self.regions
+
+    def __len__(self):
+        return len(self.regions)
+
+def atlas_layout(count):
+    """ (columns, rows) of the most square grid with room for count images. """
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    return (columns, rows)
+
+def pack_images(images, cell_size, padding=ATLAS_PADDING):
+    """ Packs images (name -> (cell_size, cell_size, 3) uint8 arrays, bottom row first like OpenGL)
+        into one grid. Returns the (height, width, 3) pixels and the AtlasRegion of each name.
+    """
+    (columns, rows) = atlas_layout(len(images))
+    cell = cell_size + 2 * padding
+    (width, height) = (columns * cell, rows * cell)
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    regions = {}
+    for (index, (name, image)) in enumerate(images.items()):
+        x = (index % columns) * cell
+        y = (index // columns) * cell
+        pixels[y:y + cell, x:x + cell] = np.pad(image, ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+        regions[name] = AtlasRegion((x + padding) / width, (y + padding) / height,
+                                    (x + padding + cell_size) / width, (y + padding + cell_size) / height)
+    return (pixels, regions)
+
+def load_cell(file_name, cell_size):
+    """ An image file resized to a cell of the atlas, flipped so its bottom row comes first (like load_texture). """
+    im = Image.open(file_name).convert("RGB")
+    im = im.transpose(method=Image.Transpose.FLIP_TOP_BOTTOM)
+    return np.asarray(im.resize((cell_size, cell_size)), dtype=np.uint8)
+
+def build_atlas(registry, key, file_names, cell_size=None, max_cell_size=None, filter=GL_NEAREST, padding=ATLAS_PADDING):
+    """ Loads file_names (name -> image file) into one atlas texture in registry (see textures.py).
+        Without a cell_size, the cells are the power of two nearest the biggest image, up to max_cell_size.
+        If the grid would be bigger than OpenGL allows, the cells are shrunk until it fits.
+        Returns a TextureAtlas.
+    """
+    (columns, rows) = atlas_layout(len(file_names))
+    max_size = glGetIntegerv(GL_MAX_TEXTURE_SIZE)
+    if cell_size is None:
+        biggest = max(max(Image.open(file_name).size) for file_name in file_names.values())
+        cell_size = power_of_two_size(biggest, min(max_cell_size or max_size, max_size))
+    while max(columns, rows) * (cell_size + 2 * padding) > max_size and cell_size > 1:
+        cell_size //= 2
+
+    images = {name: load_cell(file_name, cell_size) for (name, file_name) in file_names.items()}
+    (pixels, regions) = pack_images(images, cell_size, padding)
+    (height, width) = pixels.shape[:2]
+    texture = registry.upload(key, width, height, GL_RGB, pixels, GL_CLAMP_TO_EDGE, filter, compress=False, max_level=int(math.log2(padding)))
+    return TextureAtlas(texture, regions)
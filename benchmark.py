@@ -0,0 +1,217 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# benchmark.py module
+# Description:
+#   Headless benchmarks for the pool physics in billiards.py.
+#   Covers the standard 11 ball rack with a fixed break, a full 15 ball
+#   rack, and synthetic tables of 100 to 10,000 balls. Reports steps per
+#   second, time per collision pair, and peak memory, and writes the
+#   results as JSON so runs of different versions can be compared:
+#       python benchmark.py [--output results.json] [--quick]
+#==============================
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import subprocess
+from billiards import *
+
+# the break used for every rack benchmark (straight down the table at full power)
+BREAK_ANGLE = 0
+BREAK_POWER = 4
+
+# synthetic tables keep about this many balls per unit of table area
+SYNTHETIC_DENSITY = 0.5
+
+def triangle_rack(rows=5, spacing=0.4, cue_x=-2, apex_x=2):
+    """ A cue ball plus a full triangle of rows balls on a side (5 rows is the 15 ball rack).
+        Spaced the same way as STANDARD_RACK.
+    """
+    layout = [(0, cue_x, 0)]
+    id = 1
+    for row in range(rows):
+        for place in range(row + 1):
+            layout.append((id, apex_x + row * spacing, (place - row / 2) * spacing))
+            id += 1
+    return layout
+
+def synthetic_balls(count, seed=0):
+    """ A square table with count balls scattered on a grid, all moving in random directions. """
+    half_size = math.sqrt(count / SYNTHETIC_DENSITY) / 2
+    table = Table(half_length=half_size, half_width=half_size)
+
+    generator = np.random.default_rng(seed)
+    side = math.ceil(math.sqrt(count))
+    spacing = 2 * half_size / side
+    layout = [(index, (index % side + 0.5) * spacing - half_size, (index // side + 0.5) * spacing - half_size) for index in range(count)]
+
+    ball_set = BallSet(table, layout)
+    angles = generator.uniform(0, 2 * math.pi, count)
+    ball_set.dir_x[:] = np.cos(angles)
+    ball_set.dir_z[:] = np.sin(angles)
+    ball_set.speed[:] = generator.uniform(0.5, 4, count)
+    ball_set.awake[:] = True
+    return ball_set
+
+def racked_break(layout):
+    ball_set = BallSet(Table(), layout)
+    ball_set.strike(BREAK_ANGLE, BREAK_POWER)
+    return ball_set
+
+#==============================
+# Measurements
+#==============================
+
+def time_steps(make_ball_set, max_steps, repeats):
+    """ Best time over repeats of stepping a fresh ball set until it stops (or max_steps). Returns (seconds, steps). """
+    best = None
+    for repeat in range(repeats):
+        ball_set = make_ball_set()
+        steps = 0
+        start_time = time.perf_counter()
+        while steps < max_steps and not ball_set.at_rest():
+            ball_set.step()
+            steps += 1
+        elapsed = time.perf_counter() - start_time
+        if best is None or elapsed < best[0]:
+            best = (elapsed, steps)
+    return best
+
+def time_events(make_ball_set, max_steps, repeats):
+    """ Same as time_steps, but with the EventSimulator jumping straight to rest. Returns (seconds, steps, events). """
+    best = None
+    for repeat in range(repeats):
+        simulator = EventSimulator(make_ball_set())
+        start_time = time.perf_counter()
+        steps = simulator.run_until_rest(max_steps)
+        elapsed = time.perf_counter() - start_time
+        if best is None or elapsed < best[0]:
+            best = (elapsed, steps, simulator.events_processed)
+    return best
+
+def peak_memory(make_ball_set, max_steps):
+    """ Peak bytes allocated while making and stepping a ball set (traced separately, tracing slows things down). """
+    tracemalloc.start()
+    ball_set = make_ball_set()
+    steps = 0
+    while steps < max_steps and not ball_set.at_rest():
+        ball_set.step()
+        steps += 1
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def time_pairs(count, repeats):
+    """ Seconds per call of compare and of collision_time for two balls that just started touching. """
+    # the cue ball's try position overlaps the other ball
+    ball_set = BallSet(Table(), [(0, -0.15, 0), (1, 0.15, 0.05)])
+    ball_set.speed[0] = 2
+    ball_set.dir_x[0] = 1
+    ball_set.awake[0] = True
+    ball_set.predict(ball_set.awake)
+    saved = [getattr(ball_set, name).copy() for name in BallSet.STATE_ARRAYS]
+
+    def restore():
+        for (name, array) in zip(BallSet.STATE_ARRAYS, saved):
+            getattr(ball_set, name)[:] = array
+
+    compare_time = math.inf
+    collision_time = math.inf
+    for repeat in range(repeats):
+        # restoring is timed on its own and taken back out
+        start_time = time.perf_counter()
+        for call in range(count):
+            restore()
+        restore_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for call in range(count):
+            restore()
+            ball_set.compare(0, 1)
+        compare_time = min(compare_time, (time.perf_counter() - start_time - restore_time) / count)
+
+        start_time = time.perf_counter()
+        for call in range(count):
+            ball_set.collision_time(0, 1)
+        collision_time = min(collision_time, (time.perf_counter() - start_time) / count)
+    return (compare_time, collision_time)
+
+#==============================
+# Suite
+#==============================
+
+def scenarios(quick=False):
+    """ (name, ball count, make_ball_set, max steps) for every table in the suite. """
+    standard = (lambda: racked_break(STANDARD_RACK))
+    full = (lambda: racked_break(triangle_rack(5)))
+    tables = [
+        ("rack_11_break", len(STANDARD_RACK), standard, 5000),
+        ("rack_15_break", 16, full, 5000),
+    ]
+    for (count, steps) in ((100, 200), (1000, 50), (10000, 10)):
+        if quick:
+            steps = max(steps // 10, 2)
+        tables.append((f"synthetic_{count}", count, (lambda count=count: synthetic_balls(count)), steps))
+    return tables
+
+def run_suite(quick=False, repeats=3):
+    results = []
+    for (name, count, make_ball_set, max_steps) in scenarios(quick):
+        print(f'{name}...', file=sys.stderr)
+        (elapsed, steps) = time_steps(make_ball_set, max_steps, repeats)
+        result = {
+            "name": name,
+            "balls": count,
+            "steps": steps,
+            "seconds": elapsed,
+            "steps_per_second": steps / elapsed if elapsed > 0 else None,
+            "ms_per_step": 1000 * elapsed / steps if steps else None,
+            "peak_memory_bytes": peak_memory(make_ball_set, max_steps),
+        }
+        # the event simulator is only worth timing on the real racks, it jumps straight to rest
+        if name.startswith("rack"):
+            (event_elapsed, event_steps, events) = time_events(make_ball_set, max_steps, repeats)
+            result["event_seconds"] = event_elapsed
+            result["event_steps"] = event_steps
+            result["events"] = events
+        results.append(result)
+
+    (compare_time, collision_time) = time_pairs(200 if quick else 2000, repeats)
+    results.append({
+        "name": "collision_pair",
+        "compare_us": compare_time * 1e6,
+        "collision_time_us": collision_time * 1e6,
+    })
+    return results
+
+def version():
+    """ The git commit being benchmarked, if there is one. """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the pool physics and writes the results as JSON")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON here instead of printing it")
+    parser.add_argument("--quick", action="store_true", help="fewer steps and repeats, for a fast check")
+    arguments = parser.parse_args()
+
+    report = {
+        "version": version(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": run_suite(arguments.quick, 1 if arguments.quick else 3),
+    }
+    text = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
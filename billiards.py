@@ -0,0 +1,1061 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# billiards.py module
+# Description:
+#   Headless physics for the pool minigame.
+#   Defines the table, the billiard balls, and the ball set that
+#   steps every ball forward one frame at a time and applies the
+#   pocket rules. Nothing in here touches OpenGL, so the simulation
+#   can run without a window (batch runs, analysis, etc.).
+#   The interactive scene only reads the state from this module.
+#
+#   Ball state is stored as a struct of NumPy arrays in BallSet, so
+#   moving, bouncing, slowing down, and pocketing are done for every
+#   ball at once. BilliardBall is a thin view of one slot in those arrays.
+#==============================
+import math
+import copy
+import heapq
+import numpy as np
+from utils import *
+
+# radius of every billiard ball
+BALL_RADIUS = 0.25
+
+# frame time (ms per frame) the movement speeds were tuned for
+DEFAULT_DELAY = int(1000.0 / 60.0 + 0.5)
+
+# standard layout used by the minigame
+#   each entry is (id, x offset, z offset) from the center of the table
+#   id 0 is the cue ball
+STANDARD_RACK = [
+    (0, -2, 0),         # cue
+    (8, 2, 0),          # eight
+    (1, 2.4, 0.2),      # one
+    (3, 2.4, -0.2),     # three
+    (10, 2.8, 0.4),     # ten
+    (14, 2.8, -0.4),    # fourteen
+    (9, 2.8, 0),        # nine
+    (13, 3.2, 0.2),     # thirteen
+    (4, 3.2, -0.2),     # four
+    (6, 3.2, 0.6),      # six
+    (2, 3.2, -0.6),     # two
+]
+
+#==============================
+# Ball orientation
+#   each ball's rotation is a unit quaternion (w, x, y, z), kept in NumPy
+#   arrays so rolling can be worked out without an OpenGL context
+#==============================
+
+# balls start turned -90 degrees about x, so the texture's pole points along z
+INITIAL_ORIENTATION = np.array([math.cos(math.radians(-45)), math.sin(math.radians(-45)), 0.0, 0.0])
+
+def quaternion_multiply(q, r):
+    """ Row-by-row product q * r of two (n, 4) arrays of quaternions (the rotation r, then q). """
+    (w1, x1, y1, z1) = (q[:, 0], q[:, 1], q[:, 2], q[:, 3])
+    (w2, x2, y2, z2) = (r[:, 0], r[:, 1], r[:, 2], r[:, 3])
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=1)
+
+def normalize_quaternions(q):
+    return q / np.linalg.norm(q, axis=1)[:, np.newaxis]
+
+def rolling_quaternions(distance_x, distance_z, radius=BALL_RADIUS):
+    """ Rotations of balls that rolled (distance_x, distance_z) along the table, as an (n, 4) array.
+        A ball rolls about the axis up x direction by distance / radius radians (distance is the arc length).
+    """
+    distance = np.hypot(distance_x, distance_z)
+    half_angle = distance / radius / 2
+    # axis is (0, 1, 0) x (distance_x, 0, distance_z) / distance, balls that did not move get no rotation
+    scale = np.divide(np.sin(half_angle), distance, out=np.zeros_like(distance), where=distance > 0)
+    return np.stack([np.cos(half_angle), distance_z * scale, np.zeros_like(distance), -distance_x * scale], axis=1)
+
+def quaternion_matrices(q):
+    """ (n, 4, 4) float32 rotation matrices of unit quaternions, laid out column by column for glMultMatrixf. """
+    (w, x, y, z) = (q[:, 0], q[:, 1], q[:, 2], q[:, 3])
+    matrices = np.zeros((len(q), 4, 4), dtype=np.float32)
+    # matrices[i][column][row]
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y + w * z)
+    matrices[:, 0, 2] = 2 * (x * z - w * y)
+    matrices[:, 1, 0] = 2 * (x * y - w * z)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z + w * x)
+    matrices[:, 2, 0] = 2 * (x * z + w * y)
+    matrices[:, 2, 1] = 2 * (y * z - w * x)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    matrices[:, 3, 3] = 1
+    return matrices
+
+class Table:
+    """The playable area of a pool table (xz-plane only)"""
+
+    def __init__(
+        self,
+        x=0,                                # center of the table
+        z=0,
+        half_length=7.25,                   # ball bounds are x: [x - 7.25, x + 7.25]
+        half_width=2.75,                    #   and z: [z - 2.75, z + 2.75]
+        delay=DEFAULT_DELAY,                # frame time (ms) used to scale ball speeds
+        friction=0.01,                      # speed lost by a ball every frame
+        corner_pocket_size=0.5,             # distance from a corner that still counts as a pocket
+        middle_pocket_size=1                # distance from the middle that still counts as a pocket
+    ):
+        self.x = x
+        self.z = z
+        self.half_length = half_length
+        self.half_width = half_width
+        self.delay = delay
+        self.friction = friction
+        self.corner_pocket_size = corner_pocket_size
+        self.middle_pocket_size = middle_pocket_size
+
+        # ball bounds
+        self.min_x = x - half_length
+        self.max_x = x + half_length
+        self.min_z = z - half_width
+        self.max_z = z + half_width
+
+    # both pocket checks work on single values or whole arrays of positions
+    def pocketed_at_x_cushion(self, z):
+        """ Checks if a ball crossing one of the short (x) cushions at z falls in a corner pocket. """
+        return (z > self.max_z - self.corner_pocket_size) | (z < self.min_z + self.corner_pocket_size)
+
+    def pocketed_at_z_cushion(self, x):
+        """ Checks if a ball crossing one of the long (z) cushions at x falls in a corner or middle pocket. """
+        return (abs(self.x - x) < self.middle_pocket_size) | (x > self.max_x - self.corner_pocket_size) | (x < self.min_x + self.corner_pocket_size)
+
+class BilliardBall:
+    """A single ball, viewed through the arrays of the BallSet that owns it"""
+
+    def __init__(self, ball_set, index):
+        self.ball_set = ball_set
+        self.index = index
+
+    def _array_property(name, cast):
+        def get(self):
+            return cast(getattr(self.ball_set, name)[self.index])
+        def set(self, value):
+            getattr(self.ball_set, name)[self.index] = value
+        return property(get, set)
+
+    # identifier, 0 for cue
+    id = _array_property("ids", int)
+
+    # position and state
+    x = _array_property("x", float)
+    z = _array_property("z", float)
+    sunk = _array_property("sunk", bool)
+
+    # "try" positions - where the ball wants to go, used in advance
+    tx = _array_property("tx", float)
+    tz = _array_property("tz", float)
+
+    # movement info
+    awake = _array_property("awake", bool)
+
+    # distance traveled during the last frame, used for rolling
+    distance_x = _array_property("distance_x", float)
+    distance_z = _array_property("distance_z", float)
+
+    del _array_property
+
+    @property
+    def table(self):
+        return self.ball_set.table
+
+    @property
+    def force_magnitude(self):
+        return float(self.ball_set.speed[self.index])
+
+    @force_magnitude.setter
+    def force_magnitude(self, magnitude):
+        # setting a speed wakes the ball up (or puts it to sleep if it is too slow)
+        self.ball_set.speed[self.index] = magnitude
+        self.ball_set.awake[self.index] = magnitude > self.ball_set.sleep_speed and not self.sunk
+
+    @property
+    def force_direction(self):
+        # note: this is a copy, assign a new Vector to change the direction
+        return Vector(a_list=[float(self.ball_set.dir_x[self.index]), 0, float(self.ball_set.dir_z[self.index])])
+
+    @force_direction.setter
+    def force_direction(self, direction):
+        self.ball_set.dir_x[self.index] = direction.dx
+        self.ball_set.dir_z[self.index] = direction.dz
+
+    def predict(self, time=0):
+        self.ball_set.predict_ball(self.index, time)
+
+    def compare(self, other):
+        self.ball_set.compare(self.index, other.index)
+
+    def find_collision_time(self, other):
+        return self.ball_set.collision_time(self.index, other.index)
+
+class SpatialHash:
+    """A uniform grid over ball positions, used to find balls that are close to each other"""
+
+    # cells are keyed by (cell x * CELL_KEY_STRIDE + cell z), so a neighboring cell is a fixed offset away
+    CELL_KEY_STRIDE = 1 << 32
+    # below this many balls, checking every pair costs less than the grid lookups
+    ALL_PAIRS_LIMIT = 64
+    # every (first, second) pair of positions for each small set size, shared by all grids
+    all_pairs = {}
+
+    def __init__(self, xs, zs, indices, cell_size=BALL_RADIUS):
+        """ Buckets the balls at the given indices by their (xs, zs) position.
+            With cell_size equal to the collision tolerance, touching balls are always in the same or adjacent cells.
+        """
+        self.cell_size = cell_size
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.keys = self.cell_keys(xs[self.indices], zs[self.indices])
+
+        # sort by key so each cell is one contiguous run of the arrays
+        order = np.argsort(self.keys, kind="stable")
+        self.sorted_keys = self.keys[order]
+        self.sorted_indices = self.indices[order]
+
+        self.offsets = self.neighbor_offsets().tolist()
+        self.cells = None
+
+    def cell_keys(self, xs, zs):
+        cell_x = np.floor(np.asarray(xs) / self.cell_size).astype(np.int64)
+        cell_z = np.floor(np.asarray(zs) / self.cell_size).astype(np.int64)
+        return cell_x * self.CELL_KEY_STRIDE + cell_z
+
+    def neighbor_offsets(self):
+        return np.array([dx * self.CELL_KEY_STRIDE + dz for dx in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64)
+
+    def pairs(self):
+        """ Every pair (first, second) with first < second that share or neighbor a cell, as two arrays.
+            Small sets just return every pair, which is cheaper than searching the grid.
+        """
+        count = len(self.indices)
+        if count <= self.ALL_PAIRS_LIMIT:
+            if count not in self.all_pairs:
+                self.all_pairs[count] = np.triu_indices(count, 1)
+            (first, second) = self.all_pairs[count]
+            return (self.indices[first], self.indices[second])
+
+        firsts = [np.zeros(0, dtype=np.int64)]
+        seconds = [np.zeros(0, dtype=np.int64)]
+        for offset in self.neighbor_offsets().tolist():
+            targets = self.keys + offset
+            starts = np.searchsorted(self.sorted_keys, targets, side="left")
+            counts = np.searchsorted(self.sorted_keys, targets, side="right") - starts
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # expand each ball's run of neighbors into one flat list of (ball, neighbor)
+            run_starts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            neighbors = self.sorted_indices[run_starts + np.arange(total)]
+            balls = np.repeat(self.indices, counts)
+
+            keep = balls < neighbors
+            firsts.append(balls[keep])
+            seconds.append(neighbors[keep])
+
+        return (np.concatenate(firsts), np.concatenate(seconds))
+
+    # single lookups and moves are cheaper through plain dicts than through NumPy,
+    #   so those are built the first time they are needed
+    def build_cells(self):
+        self.cells = {}
+        self.ball_keys = {}
+        for (key, index) in zip(self.keys.tolist(), self.indices.tolist()):
+            self.cells.setdefault(key, []).append(index)
+            self.ball_keys[index] = key
+
+    def cell_key(self, x, z):
+        return math.floor(x / self.cell_size) * self.CELL_KEY_STRIDE + math.floor(z / self.cell_size)
+
+    def near(self, x, z):
+        """ Indices of every ball bucketed in the cell containing (x, z) or a neighboring cell, as a list. """
+        if self.cells is None:
+            self.build_cells()
+
+        key = self.cell_key(x, z)
+        found = []
+        for offset in self.offsets:
+            found.extend(self.cells.get(key + offset, ()))
+        return found
+
+    def move(self, index, x, z):
+        """ Re-buckets a ball that moved to (x, z). """
+        if self.cells is None:
+            self.build_cells()
+
+        key = self.cell_key(x, z)
+        old_key = self.ball_keys[index]
+        if key != old_key:
+            self.cells[old_key].remove(index)
+            self.cells.setdefault(key, []).append(index)
+            self.ball_keys[index] = key
+
+class BallSet:
+    """All of the billiard balls on a table, stored as parallel arrays and stepped forward together"""
+
+    # every per-ball array, in the order they are made by rack()
+    STATE_ARRAYS = ("ids", "x", "z", "sunk", "tx", "tz", "dir_x", "dir_z", "speed", "awake", "distance_x", "distance_z", "previous_x", "previous_z", "orientation", "previous_orientation")
+
+    def __init__(self, table, layout=STANDARD_RACK, substeps=1, sleep_speed=0.0):
+        self.table = table
+        self.layout = layout
+        # balls at or below this speed are stopped and put to sleep (skipped until something hits them)
+        self.sleep_speed = sleep_speed
+        # each step can be split into smaller substeps so fast balls move less between collision checks
+        self.substeps = substeps
+        self.fraction = 1.0 / substeps
+        self.rack()
+
+    def rack(self, layout=None):
+        """ Places a fresh set of balls using the given layout (defaults to the one this set was made with). """
+        if layout is not None:
+            self.layout = layout
+        count = len(self.layout)
+
+        # identifier and position
+        self.ids = np.array([id for (id, dx, dz) in self.layout], dtype=np.int64)
+        self.x = np.array([self.table.x + dx for (id, dx, dz) in self.layout], dtype=np.float64)
+        self.z = np.array([self.table.z + dz for (id, dx, dz) in self.layout], dtype=np.float64)
+        self.sunk = np.zeros(count, dtype=bool)
+
+        # "try" positions - where each ball wants to go this frame
+        self.tx = self.x.copy()
+        self.tz = self.z.copy()
+
+        # movement info, direction is a unit vector in the xz-plane
+        self.dir_x = np.zeros(count)
+        self.dir_z = np.zeros(count)
+        self.speed = np.zeros(count)
+
+        # only awake balls are moved, a racked table starts asleep
+        self.awake = np.zeros(count, dtype=bool)
+
+        # distance traveled during the last frame
+        self.distance_x = np.zeros(count)
+        self.distance_z = np.zeros(count)
+
+        # positions before the last step, used to draw in between steps
+        self.previous_x = self.x.copy()
+        self.previous_z = self.z.copy()
+
+        # rotation of each ball as a quaternion, built up as the balls roll
+        self.orientation = np.tile(INITIAL_ORIENTATION, (count, 1))
+        self.previous_orientation = self.orientation.copy()
+
+        self.balls = [BilliardBall(self, index) for index in range(count)]
+
+    def copy(self):
+        """ A separate ball set in the same state, on the same table (used to try out shots). """
+        duplicate = copy.copy(self)
+        for name in self.STATE_ARRAYS:
+            setattr(duplicate, name, getattr(self, name).copy())
+        duplicate.balls = [BilliardBall(duplicate, index) for index in range(len(self.ids))]
+        return duplicate
+
+    def cue_ball(self):
+        return self.balls[0]
+
+    def strike(self, angle, power):
+        """ Hits the cue ball with the given power toward angle (degrees, counter-clockwise from +x). """
+        direction = Vector(Point(math.cos(math.radians(angle)), 0, -math.sin(math.radians(angle))))
+        direction.normalize()
+        self.speed[0] = power
+        self.dir_x[0] = direction.dx
+        self.dir_z[0] = direction.dz
+        self.awake[0] = not self.sunk[0]
+
+    def step(self):
+        """ Advances every ball on the table by one frame (made of substeps smaller moves). """
+        self.remember_positions()
+        # nothing to do once every ball is asleep
+        if not self.awake.any():
+            self.distance_x[:] = 0
+            self.distance_z[:] = 0
+            return
+
+        for substep in range(self.substeps):
+            if not self.awake.any():
+                break
+
+            # try to move on its own
+            # sleeping balls keep their try position on their current one
+            self.predict(self.awake)
+
+            # check for interball collisions, which wake up any sleeping ball that is hit
+            self.collide()
+
+            # actually move
+            # precondition: all awake non-sunk balls predicted successfully
+            self.advance(self.awake & ~self.sunk)
+            self.settle()
+
+        # report the distance covered over the whole step
+        self.distance_x = self.x - self.previous_x
+        self.distance_z = self.z - self.previous_z
+        self.roll()
+
+    def settle(self):
+        """ Puts sunk balls and balls that have slowed to sleep_speed to sleep. """
+        sleeping = self.awake & (self.sunk | (self.speed <= self.sleep_speed))
+        self.speed[sleeping] = 0
+        self.awake &= ~sleeping
+
+    def remember_positions(self):
+        self.previous_x[:] = self.x
+        self.previous_z[:] = self.z
+        self.previous_orientation[:] = self.orientation
+
+    def roll(self):
+        """ Turns every ball by the distance it traveled in the last frame. """
+        rolling = rolling_quaternions(self.distance_x, self.distance_z)
+        self.orientation = normalize_quaternions(quaternion_multiply(rolling, self.orientation))
+
+    def interpolated_orientations(self, alpha):
+        """ Orientations alpha (0 to 1) of the way from before the last step to now, as an (n, 4) array. """
+        previous = self.previous_orientation
+        # q and -q are the same rotation, blend toward whichever is closer
+        closer = np.where((np.sum(previous * self.orientation, axis=1) < 0)[:, np.newaxis], -previous, previous)
+        return normalize_quaternions(closer + (self.orientation - closer) * alpha)
+
+    def orientation_matrices(self, alpha=1.0):
+        """ Rotation matrices of every ball for glMultMatrixf, alpha of the way through the last step. """
+        return quaternion_matrices(self.interpolated_orientations(alpha))
+
+    def interpolated_positions(self, alpha):
+        """ Positions alpha (0 to 1) of the way from before the last step to now, as (xs, zs) arrays. """
+        return (self.previous_x + (self.x - self.previous_x) * alpha, self.previous_z + (self.z - self.previous_z) * alpha)
+
+    #==============================
+    # Batched movement
+    #==============================
+
+    def predict(self, mask, time=0):
+        """ Finds the try positions of every ball in mask, bouncing them off the cushions. """
+        scale = (self.table.delay - time) / self.fraction
+        self.tx[mask] = self.x[mask] + (self.dir_x[mask] * self.speed[mask] / scale)
+        self.tz[mask] = self.z[mask] + (self.dir_z[mask] * self.speed[mask] / scale)
+
+        self.bounds_check(mask)
+
+    def bounds_check(self, mask):
+        # bounds check with walls and holes
+        table = self.table
+        tx = self.tx
+        tz = self.tz
+
+        low = mask & (tx < table.min_x)
+        high = mask & (tx > table.max_x)
+        hit = low | high
+        self.sunk |= hit & table.pocketed_at_x_cushion(tz)
+        tx[low] = (2 * table.min_x) - tx[low]
+        tx[high] = (2 * table.max_x) - tx[high]
+        self.dir_x[hit] = -self.dir_x[hit]
+
+        low = mask & (tz < table.min_z)
+        high = mask & (tz > table.max_z)
+        hit = low | high
+        self.sunk |= hit & table.pocketed_at_z_cushion(tx)
+        tz[low] = (2 * table.min_z) - tz[low]
+        tz[high] = (2 * table.max_z) - tz[high]
+        self.dir_z[hit] = -self.dir_z[hit]
+
+    def advance(self, mask):
+        self.x[mask] = self.tx[mask]
+        self.z[mask] = self.tz[mask]
+
+        # slow down after movement
+        self.speed[mask] = np.maximum(self.speed[mask] - self.table.friction * self.fraction, 0)
+
+    #==============================
+    # Ball-ball collisions
+    #==============================
+
+    def collide(self, tolerance=BALL_RADIUS):
+        """ Resolves every collision for this frame.
+            Each pair of balls is checked at most once, in the same order as checking
+            every ball against the balls after it. A spatial hash keeps far apart
+            pairs from ever being looked at.
+        """
+        count = len(self.ids)
+        grid = SpatialHash(self.tx, self.tz, np.flatnonzero(~self.sunk), tolerance)
+        (first, second) = grid.pairs()
+        # two sleeping balls can't hit each other
+        touching = (self.awake[first] | self.awake[second]) & (np.abs(self.tx[first] - self.tx[second]) <= tolerance) & (np.abs(self.tz[first] - self.tz[second]) <= tolerance)
+
+        # pairs are keyed by (ball * count + other) so the heap pops them in loop order
+        queue = np.sort(first[touching] * count + second[touching]).tolist()
+        if not queue:
+            return
+
+        current_ball = -1
+        current_ball_sunk = False
+        last_key = -1
+        while queue:
+            key = heapq.heappop(queue)
+            if key == last_key:
+                continue
+            last_key = key
+
+            (index, other) = divmod(key, count)
+            # a ball sunk before its turn is skipped entirely, one sunk during its turn keeps comparing
+            if index != current_ball:
+                current_ball = index
+                current_ball_sunk = self.sunk[index]
+            if current_ball_sunk or self.sunk[other]:
+                continue
+
+            if self.compare(index, other, tolerance):
+                self.awake[index] = True
+                self.awake[other] = True
+                # both balls moved, so they may now overlap balls later in the order
+                grid.move(index, self.tx[index], self.tz[index])
+                grid.move(other, self.tx[other], self.tz[other])
+                for ball in (index, other):
+                    ball_x = self.tx[ball]
+                    ball_z = self.tz[ball]
+                    for near in grid.near(ball_x, ball_z):
+                        if near == ball or abs(self.tx[near] - ball_x) > tolerance or abs(self.tz[near] - ball_z) > tolerance:
+                            continue
+                        later = min(ball, near) * count + max(ball, near)
+                        if later > key:
+                            heapq.heappush(queue, later)
+
+    def compare(self, index, other, tolerance=BALL_RADIUS):
+        """ Collides two balls if their try positions overlap. Returns True if they collided. """
+        tx = self.tx
+        tz = self.tz
+
+        # bounds check with other ball (tolerance = radius)
+        if not (abs(tx[index] - tx[other]) <= tolerance and abs(tz[index] - tz[other]) <= tolerance):
+            return False
+
+        # redirect both
+
+        # all of this occurs over the course of one "DELAY"
+
+        # split into precollision (part 1), collision (part 2, but doesnt take any time), and postcollision (part 3)
+
+        # part 1: move up until the collision
+        # in other words, calculate the collision centers
+
+        # this requires us to find the precise time of collision
+        collision_time = self.collision_time(index, other) # see the function below
+
+        # part 2: determine new velocities post-collision
+
+        # <x1 - x2>
+        center_diff_x = float(tx[index] - tx[other])
+        center_diff_z = float(tz[index] - tz[other])
+        # <x2 - x1>
+        other_center_diff_x = float(tx[other] - tx[index])
+        other_center_diff_z = float(tz[other] - tz[index])
+
+        # balls sitting exactly on top of each other have no direction to bounce in
+        if center_diff_x == 0 and center_diff_z == 0:
+            return False
+
+        # <v1>
+        old_velocity_x = float(self.dir_x[index] * self.speed[index])
+        old_velocity_z = float(self.dir_z[index] * self.speed[index])
+        # <v2>
+        other_old_velocity_x = float(self.dir_x[other] * self.speed[other])
+        other_old_velocity_z = float(self.dir_z[other] * self.speed[other])
+
+        # <v1 - v2>
+        velocity_diff_x = old_velocity_x - other_old_velocity_x
+        velocity_diff_z = old_velocity_z - other_old_velocity_z
+
+        # dot(<v1 - v2>, <x1 - x2>) / ||<x1 - x2>||^2
+        dot = velocity_diff_x * center_diff_x + velocity_diff_z * center_diff_z
+        scalar = dot / (math.sqrt(center_diff_x * center_diff_x + center_diff_z * center_diff_z) ** 2)
+        # dot(<v2 - v1>, <x2 - x1>) / ||<x2 - x1>||^2
+        other_scalar = dot / (math.sqrt(other_center_diff_x * other_center_diff_x + other_center_diff_z * other_center_diff_z) ** 2)
+
+        # entire formula
+        new_velocity_x = old_velocity_x - center_diff_x * scalar
+        new_velocity_z = old_velocity_z - center_diff_z * scalar
+        other_new_velocity_x = other_old_velocity_x - other_center_diff_x * other_scalar
+        other_new_velocity_z = other_old_velocity_z - other_center_diff_z * other_scalar
+
+        self.set_velocity(index, new_velocity_x, new_velocity_z)
+        self.set_velocity(other, other_new_velocity_x, other_new_velocity_z)
+
+        # part 3: move the rest
+        self.predict_ball(index, collision_time)
+        self.predict_ball(other, collision_time)
+        return True
+
+    def set_velocity(self, index, velocity_x, velocity_z):
+        """ Splits a velocity into the speed and unit direction of a ball. """
+        magnitude = math.sqrt(velocity_x * velocity_x + velocity_z * velocity_z)
+        if magnitude != 0:
+            velocity_x /= magnitude
+            velocity_z /= magnitude
+        self.speed[index] = magnitude
+        self.dir_x[index] = velocity_x
+        self.dir_z[index] = velocity_z
+
+    def predict_ball(self, index, time=0):
+        """ Same as predict, for a single ball (used to finish a frame after a collision). """
+        table = self.table
+        scale = (table.delay - time) / self.fraction
+        tx = float(self.x[index] + (self.dir_x[index] * self.speed[index] / scale))
+        tz = float(self.z[index] + (self.dir_z[index] * self.speed[index] / scale))
+
+        # bounds check with walls and holes
+        if tx < table.min_x or tx > table.max_x:
+            if table.pocketed_at_x_cushion(tz):
+                self.sunk[index] = True
+            tx = (2 * (table.min_x if tx < table.min_x else table.max_x)) - tx
+            self.dir_x[index] = -self.dir_x[index]
+        if tz < table.min_z or tz > table.max_z:
+            if table.pocketed_at_z_cushion(tx):
+                self.sunk[index] = True
+            tz = (2 * (table.min_z if tz < table.min_z else table.max_z)) - tz
+            self.dir_z[index] = -self.dir_z[index]
+
+        self.tx[index] = tx
+        self.tz[index] = tz
+
+    def collision_time(self, index, other):
+        # BEGIN REF
+        # logic based on https://stackoverflow.com/questions/43577298/calculating-collision-times-between-two-circles-physics
+
+        # goal is to find collision time using quadratic formula, since we get a quadratic equation
+        # following along with the post at https://stackoverflow.com/a/43577790:
+
+        # we can derive the quadratic equation using my variables like so:
+
+        # position_x =
+        #         (1 / 2 * dir_x * friction * time ** 2)
+        #         + (dir_x * speed * time)
+        #         + (x)
+
+        # position_z =
+        #         (1 / 2 * dir_z * friction * time ** 2)
+        #         + (dir_z * speed * time)
+        #         + (z)
+
+        # (and the same for the other ball)
+
+        # distance = math.sqrt((position_x - other_position_x) ** 2 + (position_z - other_position_z) ** 2)
+        # distance - (0.25 + 0.25) = 0   <--- this is a quadratic equation when simplified, solve for time
+
+        # then, https://stackoverflow.com/a/70245568 provides a simplification of the derivation using WolframAlpha to calculate like so:
+
+        epsilon = -0.0001
+
+        velocity_diff_x = float(self.dir_x[index] * self.speed[index] - self.dir_x[other] * self.speed[other])
+        velocity_diff_z = float(self.dir_z[index] * self.speed[index] - self.dir_z[other] * self.speed[other])
+        position_diff_x = float(self.x[index] - self.x[other])
+        position_diff_z = float(self.z[index] - self.z[other])
+
+        distance = (BALL_RADIUS + BALL_RADIUS) ** 2 # radii of two balls added together
+        a = velocity_diff_x ** 2 + velocity_diff_z ** 2
+        b = 2 * (position_diff_x * velocity_diff_x + position_diff_z * velocity_diff_z)
+        c = position_diff_x ** 2 + position_diff_z ** 2 - distance
+        discriminant = b ** 2 - 4 * a * c
+
+        # ignore near misses (b > epsilon, d = 0) or imaginary solutions (d < 0)
+        if b > epsilon or discriminant <= 0:
+            return -1
+
+        # if there is a real solution, find using quadratic formula
+
+        entry_time = (-b - math.sqrt(discriminant)) / (2 * a) # collision entrance time
+        exit_time = (-b - math.sqrt(discriminant)) / (2 * a) # collision exit time
+
+        # if we are already between entry time and exit time, the collision is ongoing, so collision time is now
+        if entry_time < 0 and exit_time > 0 and b <= epsilon:
+            return 0
+
+        # else collision time is the entry time
+        return entry_time
+
+        # END REF
+
+    #==============================
+    # Pocket rules
+    #   sinking the cue ball is a scratch, and the game resets
+    #   sinking every other ball (without a scratch) clears the table
+    #==============================
+
+    def scratched(self):
+        return bool(self.sunk[0])
+
+    def cleared(self):
+        return bool(self.sunk[1:].all())
+
+    def at_rest(self):
+        """ Checks if every ball still on the table has stopped moving (is asleep). """
+        return not self.awake.any()
+
+#==============================
+# Event-driven simulation
+#==============================
+
+# kinds of events in the EventSimulator queue
+BALL_EVENT = 0          # two balls touch
+CUSHION_X_EVENT = 1     # a ball reaches a short (x) cushion
+CUSHION_Z_EVENT = 2     # a ball reaches a long (z) cushion
+REST_EVENT = 3          # a ball rolls to a stop
+
+# touching balls closing slower than this are treated as not closing
+CLOSING_TOLERANCE = 1e-12
+# events handled at one time (within SAME_TIME frames) before the rest of the ball-ball contacts then are dropped
+MAX_EVENTS_AT_ONCE = 1000
+SAME_TIME = 1e-9
+
+class EventSimulator:
+    """Continuous simulation of a BallSet that jumps from one impact to the next.
+       Balls roll like in BallSet.step (speed / delay per frame, losing friction
+       every frame), but the exact time of every ball-ball and ball-cushion impact
+       is solved for instead of checking for overlaps once per frame.
+       Contact is not the same as in BallSet.step: here balls are round and touch
+       when their centers are contact_distance (two radii, 0.5) apart, where
+       BallSet.compare collides balls whose centers are within one radius (0.25) on
+       both x and z. So balls in STANDARD_RACK (about 0.45 apart) already touch here,
+       and the two can play a shot out differently (6 of 150 random breaks ended with
+       a different number of balls sunk or a different scratch).
+       Time is measured in frames. Call reset() after changing the ball set directly
+       (strike() does this for you).
+    """
+
+    def __init__(self, ball_set, contact_distance=2 * BALL_RADIUS):
+        self.ball_set = ball_set
+        self.contact_distance = contact_distance
+        self.events_processed = 0
+        self.collisions = 0
+        self.events_dropped = 0     # ball-ball contacts skipped by handle_until
+        self.reset()
+
+    def reset(self):
+        """ Restarts the event queue from the current state of the ball set. """
+        balls = self.ball_set
+        count = len(balls.ids)
+        self.time = 0.0
+        self.queue = []
+        self.sequence = 0
+
+        # the arrays of the ball set hold each ball's state at start[ball]
+        self.start = np.zeros(count)
+        # any event scheduled with an old version of a ball is out of date
+        self.versions = [0] * count
+        # positions at the last sync, used to report the distance traveled
+        self.synced_x = balls.x.copy()
+        self.synced_z = balls.z.copy()
+
+        moving = balls.speed > 0
+        balls.awake[:] = moving & ~balls.sunk
+        for ball in np.flatnonzero(moving & ~balls.sunk).tolist():
+            # pairs of moving balls only need to be predicted once
+            self.predict(ball, skip=moving & (np.arange(count) < ball))
+
+    def strike(self, angle, power):
+        self.sync()
+        self.ball_set.strike(angle, power)
+        self.reset()
+
+    #==============================
+    # Motion
+    #==============================
+
+    def travel(self, speed, elapsed):
+        """ Distance covered in elapsed frames by a ball starting at speed (works on arrays). """
+        table = self.ball_set.table
+        if table.friction > 0:
+            elapsed = np.minimum(elapsed, speed / table.friction)
+        return (speed * elapsed - table.friction * elapsed * elapsed / 2) / table.delay
+
+    def rest_time(self, ball):
+        """ Time the ball stops rolling (infinite with no friction). """
+        balls = self.ball_set
+        if balls.speed[ball] == 0:
+            return self.start[ball]
+        if balls.table.friction == 0:
+            return math.inf
+        return self.start[ball] + balls.speed[ball] / balls.table.friction
+
+    def move_to(self, ball, time):
+        """ Rebases a single ball to the given time. """
+        balls = self.ball_set
+        elapsed = time - self.start[ball]
+        distance = self.travel(balls.speed[ball], elapsed)
+        balls.x[ball] += balls.dir_x[ball] * distance
+        balls.z[ball] += balls.dir_z[ball] * distance
+        balls.speed[ball] = max(balls.speed[ball] - balls.table.friction * elapsed, 0)
+        self.start[ball] = time
+
+    def sync(self):
+        """ Rebases every moving ball to the current time, so the ball set arrays are up to date. """
+        balls = self.ball_set
+        # sleeping balls haven't moved since they stopped
+        live = balls.awake
+        elapsed = self.time - self.start[live]
+        distance = self.travel(balls.speed[live], elapsed)
+        balls.x[live] += balls.dir_x[live] * distance
+        balls.z[live] += balls.dir_z[live] * distance
+        balls.speed[live] = np.maximum(balls.speed[live] - balls.table.friction * elapsed, 0)
+        self.start[live] = self.time
+
+        balls.tx[:] = balls.x
+        balls.tz[:] = balls.z
+        balls.distance_x[:] = balls.x - self.synced_x
+        balls.distance_z[:] = balls.z - self.synced_z
+        balls.roll()
+        self.synced_x = balls.x.copy()
+        self.synced_z = balls.z.copy()
+
+    #==============================
+    # Predictions
+    #==============================
+
+    def schedule(self, time, kind, ball, other=-1):
+        other_version = self.versions[other] if other >= 0 else 0
+        heapq.heappush(self.queue, (time, self.sequence, kind, ball, other, self.versions[ball], other_version))
+        self.sequence += 1
+
+    def predict(self, ball, skip=None):
+        """ Schedules every upcoming event for a ball that was just rebased to the current time. """
+        balls = self.ball_set
+        table = balls.table
+        speed = balls.speed[ball]
+
+        if speed > 0:
+            rest = self.rest_time(ball)
+            self.schedule(rest, REST_EVENT, ball)
+
+            # cushion impacts, each axis only ever heads toward one cushion until it bounces
+            for (kind, position, direction, low, high) in (
+                (CUSHION_X_EVENT, balls.x[ball], balls.dir_x[ball], table.min_x, table.max_x),
+                (CUSHION_Z_EVENT, balls.z[ball], balls.dir_z[ball], table.min_z, table.max_z),
+            ):
+                if direction == 0:
+                    continue
+                needed = max(((low if direction < 0 else high) - position) / direction, 0) * table.delay
+                time = self.time_to_cover(speed, needed)
+                if time is not None and self.time + time <= rest:
+                    self.schedule(self.time + time, kind, ball)
+
+        # ball-ball impacts, only against balls that could reach each other before stopping
+        others = ~balls.sunk
+        others[ball] = False
+        if skip is not None:
+            others &= ~skip
+        if speed == 0:
+            others &= balls.speed > 0
+        candidates = np.flatnonzero(others)
+        if len(candidates) == 0:
+            return
+
+        elapsed = self.time - self.start[candidates]
+        other_speed = np.maximum(balls.speed[candidates] - table.friction * elapsed, 0)
+        other_distance = self.travel(balls.speed[candidates], elapsed)
+        other_x = balls.x[candidates] + balls.dir_x[candidates] * other_distance
+        other_z = balls.z[candidates] + balls.dir_z[candidates] * other_distance
+
+        reach = self.reach(speed) + self.reach(other_speed)
+        gap = np.hypot(other_x - balls.x[ball], other_z - balls.z[ball])
+        close = gap <= self.contact_distance + reach
+
+        for (other, x, z, other_speed) in zip(candidates[close].tolist(), other_x[close].tolist(), other_z[close].tolist(), other_speed[close].tolist()):
+            time = self.time_to_contact(ball, other, x, z, other_speed)
+            if time is not None:
+                self.schedule(self.time + time, BALL_EVENT, ball, other)
+
+    def reach(self, speed):
+        """ How far a ball at speed rolls before stopping (works on arrays). """
+        table = self.ball_set.table
+        if table.friction == 0:
+            return np.inf
+        return speed * speed / (2 * table.friction * table.delay)
+
+    def time_to_cover(self, speed, needed):
+        """ Frames for a ball starting at speed to roll needed / delay units, or None if it stops first.
+            Solves speed * t - friction * t^2 / 2 = needed.
+        """
+        friction = self.ball_set.table.friction
+        if friction == 0:
+            return needed / speed
+        discriminant = speed * speed - 2 * friction * needed
+        if discriminant < 0:
+            return None
+        return (speed - math.sqrt(discriminant)) / friction
+
+    def time_to_contact(self, ball, other, other_x, other_z, other_speed):
+        """ Frames until two balls are contact_distance apart and closing, or None if they never are.
+            Each ball moves as p + v * t + a * t^2 while rolling, so the squared distance is a quartic in t.
+        """
+        balls = self.ball_set
+        table = balls.table
+        speed = balls.speed[ball]
+
+        # relative position, velocity, and acceleration (halved) of ball from other
+        c_x = balls.x[ball] - other_x
+        c_z = balls.z[ball] - other_z
+        b_x = (balls.dir_x[ball] * speed - balls.dir_x[other] * other_speed) / table.delay
+        b_z = (balls.dir_z[ball] * speed - balls.dir_z[other] * other_speed) / table.delay
+        accel = -table.friction / (2 * table.delay)
+        a_x = accel * (balls.dir_x[ball] * (speed > 0) - balls.dir_x[other] * (other_speed > 0))
+        a_z = accel * (balls.dir_z[ball] * (speed > 0) - balls.dir_z[other] * (other_speed > 0))
+
+        # already touching, collide now only if they are closing
+        #   (faster than rounding error, or a pair that was just resolved would keep colliding forever)
+        gap = c_x * c_x + c_z * c_z - self.contact_distance ** 2
+        closing = b_x * c_x + b_z * c_z
+        if gap <= 0:
+            return 0.0 if closing < -CLOSING_TOLERANCE else None
+
+        # the motion above only holds until the first of the two balls stops
+        horizon = math.inf
+        if table.friction > 0:
+            for moving_speed in (speed, other_speed):
+                if moving_speed > 0:
+                    horizon = min(horizon, moving_speed / table.friction)
+
+        roots = np.roots([
+            a_x * a_x + a_z * a_z,
+            2 * (a_x * b_x + a_z * b_z),
+            b_x * b_x + b_z * b_z + 2 * (a_x * c_x + a_z * c_z),
+            2 * closing,
+            gap,
+        ])
+        first = None
+        for root in roots.tolist():
+            if abs(root.imag) > 1e-7:
+                continue
+            time = root.real
+            if 0 < time <= horizon and (first is None or time < first):
+                first = time
+        return first
+
+    #==============================
+    # Running
+    #==============================
+
+    def next_event(self, until):
+        """ Pops the next event happening no later than until that is still up to date, or None. """
+        while self.queue and self.queue[0][0] <= until:
+            event = heapq.heappop(self.queue)
+            (time, sequence, kind, ball, other, version, other_version) = event
+            if version != self.versions[ball] or (other >= 0 and other_version != self.versions[other]):
+                continue
+            return event
+        return None
+
+    def handle(self, event):
+        (time, sequence, kind, ball, other, version, other_version) = event
+        balls = self.ball_set
+        table = balls.table
+        self.time = max(self.time, time)
+        self.events_processed += 1
+
+        self.move_to(ball, self.time)
+        self.versions[ball] += 1
+        if kind == BALL_EVENT:
+            self.move_to(other, self.time)
+            self.versions[other] += 1
+            self.collide(ball, other)
+            self.predict(ball)
+            self.predict(other, skip=(np.arange(len(balls.ids)) == ball))
+            return
+
+        if kind == REST_EVENT:
+            balls.speed[ball] = 0
+            balls.awake[ball] = False
+        elif kind == CUSHION_X_EVENT:
+            balls.x[ball] = table.min_x if balls.dir_x[ball] < 0 else table.max_x
+            balls.dir_x[ball] = -balls.dir_x[ball]
+            if table.pocketed_at_x_cushion(balls.z[ball]):
+                self.sink(ball)
+                return
+        elif kind == CUSHION_Z_EVENT:
+            balls.z[ball] = table.min_z if balls.dir_z[ball] < 0 else table.max_z
+            balls.dir_z[ball] = -balls.dir_z[ball]
+            if table.pocketed_at_z_cushion(balls.x[ball]):
+                self.sink(ball)
+                return
+        self.predict(ball)
+
+    def sink(self, ball):
+        balls = self.ball_set
+        balls.sunk[ball] = True
+        balls.speed[ball] = 0
+        balls.awake[ball] = False
+
+    def collide(self, ball, other):
+        """ Elastic collision between two equal balls that are touching. """
+        balls = self.ball_set
+        normal_x = balls.x[ball] - balls.x[other]
+        normal_z = balls.z[ball] - balls.z[other]
+        length = math.hypot(normal_x, normal_z)
+        if length == 0:
+            return
+        normal_x /= length
+        normal_z /= length
+
+        velocity_x = balls.dir_x[ball] * balls.speed[ball]
+        velocity_z = balls.dir_z[ball] * balls.speed[ball]
+        other_velocity_x = balls.dir_x[other] * balls.speed[other]
+        other_velocity_z = balls.dir_z[other] * balls.speed[other]
+
+        # only the part of the velocity along the line between the centers is exchanged
+        closing = (velocity_x - other_velocity_x) * normal_x + (velocity_z - other_velocity_z) * normal_z
+        if closing >= 0:
+            return
+        balls.set_velocity(ball, velocity_x - closing * normal_x, velocity_z - closing * normal_z)
+        balls.set_velocity(other, other_velocity_x + closing * normal_x, other_velocity_z + closing * normal_z)
+        # a ball that hits another head on stops dead
+        balls.awake[ball] = balls.speed[ball] > 0
+        balls.awake[other] = balls.speed[other] > 0
+        self.collisions += 1
+
+    def handle_until(self, end):
+        """ Handles every event up to the time end.
+            After MAX_EVENTS_AT_ONCE events at one time, the rest of the ball-ball contacts at that time are dropped,
+            so balls that keep colliding without time moving forward can't hang the simulation.
+        """
+        instant = None
+        count = 0
+        event = self.next_event(end)
+        while event is not None:
+            if instant is None or event[0] > instant + SAME_TIME:
+                instant = event[0]
+                count = 0
+            count += 1
+            if count > MAX_EVENTS_AT_ONCE and event[2] == BALL_EVENT:
+                self.events_dropped += 1
+            else:
+                self.handle(event)
+            event = self.next_event(end)
+
+    def advance(self, frames=1.0):
+        """ Handles every event in the next frames and brings the ball set up to the new time. """
+        self.ball_set.remember_positions()
+        end = self.time + frames
+        self.handle_until(end)
+        self.time = end
+        self.sync()
+
+    def run_until_rest(self, max_frames=math.inf):
+        """ Jumps from event to event until every ball stops (or max_frames pass). Returns the frames simulated. """
+        begin = self.time
+        end = begin + max_frames
+        self.handle_until(end)
+        # once the queue runs dry every ball has stopped at the time of the last event
+        if not self.ball_set.at_rest():
+            self.time = end
+        self.sync()
+        return self.time - begin
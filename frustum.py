@@ -0,0 +1,125 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# frustum.py module
+# Description:
+#   View frustum culling.
+#   The six planes of what the camera can see are worked out from the
+#   Camera's own settings (field of view, aspect ratio, near/far planes,
+#   eye, look and pitch angles), the same way placeCamera and
+#   setProjection set up OpenGL, so nothing is read back from OpenGL.
+#   Objects are given bounding boxes or spheres, and any object completely
+#   outside the frustum is skipped before it makes a single GL call.
+#==============================
+import math
+
+class Frustum:
+    """Six planes facing into the view volume, each as (a, b, c, d) with a*x + b*y + c*z + d >= 0 inside"""
+
+    def __init__(self, planes):
+        self.planes = planes
+
+    @staticmethod
+    def from_camera(camera):
+        # forward matches the look at point in Camera.placeCamera
+        look = math.radians(camera.lookAngle)
+        pitch = math.radians(camera.pitchAngle)
+        forward = (-math.sin(look) * math.cos(pitch), -math.sin(pitch), -math.cos(look) * math.cos(pitch))
+        # gluLookAt with (0, 1, 0) as up: right = forward x up, then the real up = right x forward
+        right = vector_normalize(vector_cross(forward, (0, 1, 0)))
+        up = vector_cross(right, forward)
+
+        eye = (camera.eye.x, camera.eye.y, camera.eye.z)
+        # camAngle is the vertical field of view (see gluPerspective)
+        half_height = math.tan(math.radians(camera.camAngle) / 2)
+        half_width = half_height * camera.aspRatio
+
+        planes = []
+        # near and far
+        planes.append(plane_through(forward, vector_add(eye, vector_scale(forward, camera.near))))
+        planes.append(plane_through(vector_scale(forward, -1), vector_add(eye, vector_scale(forward, camera.far))))
+        # the sides all go through the eye, their normals point in from the edges of the view
+        for (side, half_size) in ((right, half_width), (up, half_height)):
+            for sign in (1, -1):
+                # the edge of the view runs along forward + sign * half_size * side,
+                # this normal is perpendicular to it, within the plane of forward and side
+                normal = vector_normalize(vector_sub(vector_scale(forward, half_size), vector_scale(side, sign)))
+                planes.append(plane_through(normal, eye))
+        return Frustum(planes)
+
+    def sphere_visible(self, x, y, z, radius):
+        for (a, b, c, d) in self.planes:
+            if a * x + b * y + c * z + d < -radius:
+                return False
+        return True
+
+    def box_visible(self, low, high):
+        """ True unless the box from low (x, y, z) to high is completely outside one of the planes. """
+        for (a, b, c, d) in self.planes:
+            # the corner of the box farthest along the plane normal
+            x = high[0] if a >= 0 else low[0]
+            y = high[1] if b >= 0 else low[1]
+            z = high[2] if c >= 0 else low[2]
+            if a * x + b * y + c * z + d < 0:
+                return False
+        return True
+
+class FrustumCuller:
+    """Checks objects against the camera's frustum each frame and keeps count of what was skipped"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.frustum = None
+        self.tested = 0     # objects checked this frame
+        self.culled = 0     # objects skipped this frame
+        self.culled_names = []
+
+    def begin_frame(self, camera):
+        self.frustum = Frustum.from_camera(camera)
+        self.tested = 0
+        self.culled = 0
+        self.culled_names = []
+
+    def box_visible(self, name, low, high):
+        return self.record(name, self.frustum.box_visible(low, high))
+
+    def sphere_visible(self, name, x, y, z, radius):
+        return self.record(name, self.frustum.sphere_visible(x, y, z, radius))
+
+    def record(self, name, visible):
+        if not self.enabled:
+            return True
+        self.tested += 1
+        if not visible:
+            self.culled += 1
+            self.culled_names.append(name)
+        return visible
+
+    def __str__(self):
+        return f'{self.culled} of {self.tested} objects culled' + (f' ({", ".join(self.culled_names)})' if self.culled_names else '')
+
+#==============================
+# Small vector helpers (tuples of 3)
+#==============================
+
+def vector_add(u, v):
+    return (u[0] + v[0], u[1] + v[1], u[2] + v[2])
+
+def vector_sub(u, v):
+    return (u[0] - v[0], u[1] - v[1], u[2] - v[2])
+
+def vector_scale(u, s):
+    return (u[0] * s, u[1] * s, u[2] * s)
+
+def vector_cross(u, v):
+    return (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+
+def vector_normalize(u):
+    length = math.sqrt(u[0]**2 + u[1]**2 + u[2]**2)
+    return (u[0] / length, u[1] / length, u[2] / length)
+
+def plane_through(normal, point):
+    """ The plane through point facing along normal, as (a, b, c, d). """
+    return (normal[0], normal[1], normal[2], -(normal[0] * point[0] + normal[1] * point[1] + normal[2] * point[2]))
@@ -0,0 +1,61 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# geometry_cache.py module
+# Description:
+#   Caches static geometry in OpenGL display lists.
+#   The first time an object is drawn, every GL call it makes (vertices,
+#   texture binds, materials, transforms) is compiled into a display list
+#   on the GPU side. After that the whole object is replayed with a single
+#   glCallList, instead of thousands of immediate mode calls from Python.
+#   Only use this for objects that never change, or give each version of
+#   an object its own key.
+#   Anything that tracks GL state to skip redundant calls (like the texture
+#   registry) is passed in as a tracker. Replaying a list changes state behind
+#   its back, so every tracker is told to forget() around each list.
+#==============================
+from OpenGL.GL import *
+
+class GeometryCache:
+    """Display lists of static objects, keyed by any hashable value"""
+
+    def __init__(self, enabled=True, trackers=()):
+        self.enabled = enabled          # when False, every object is drawn directly (for debugging)
+        self.lists = {}                 # key -> display list name
+        self.trackers = list(trackers)  # state trackers with a forget() method
+        self.calls = 0                  # display lists replayed
+
+    def draw(self, key, draw_function, *args):
+        """ Draws an object from its display list, compiling draw_function(*args) into it the first time. """
+        if not self.enabled:
+            draw_function(*args)
+            return
+
+        if key not in self.lists:
+            list_name = glGenLists(1)
+            # the list can't count on any state set before it, so every bind inside it gets recorded
+            self.forget()
+            # GL_COMPILE only records the calls, so call the list right after to draw it this time too
+            glNewList(list_name, GL_COMPILE)
+            draw_function(*args)
+            glEndList()
+            self.lists[key] = list_name
+        glCallList(self.lists[key])
+        self.calls += 1
+        self.forget()
+
+    def forget(self):
+        for tracker in self.trackers:
+            tracker.forget()
+
+    def invalidate(self, key=None):
+        """ Deletes the list for key (or every list), so it gets compiled again the next time it is drawn. """
+        keys = [key] if key is not None else list(self.lists)
+        for key in keys:
+            if key in self.lists:
+                glDeleteLists(self.lists.pop(key), 1)
+
+    def __len__(self):
+        return len(self.lists)
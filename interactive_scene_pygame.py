@@ -8,227 +8,34 @@
 #==============================
 
 import sys
+import argparse
 import pygame
 import math
 import copy
+import numpy as np
 from OpenGL.GLU import *
 from OpenGL.GL import *
 from utils import *
 from camera import *
 from light import *
+from billiards import *
+from timestep import *
+from shot_search import *
+from recording import *
+from geometry_cache import *
+from textures import *
+from materials import *
+from meshes import *
+from lod import *
+from frustum import *
+from atlas import *
+from redraw import *
+from profiler import *
+from render_queue import *
+from pixel_lighting import *
 from PIL import Image
 import random
 
-# map of ball rotation matrices
-ball_rotation_matrices = {}
-
-class BilliardBall:
-    def __init__(self, id, x, z):
-        # identifier
-        self.id = id # 0 for cue
-
-        # position and state
-        self.x = x
-        self.z = z
-        self.sunk = False
-
-        # save the modelview matrix for rotations only
-        glPushMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
-        glRotate(-90, 1, 0, 0)  # initial rotation
-        ball_rotation_matrices[id] = glGetFloatv(GL_MODELVIEW_MATRIX)
-        glPopMatrix()
-
-        # movement info
-        self.force_magnitude = 0
-        self.force_direction = Vector(Point(0, 0, 0))
-        # DEBUG: initial cue ball speed
-        # if id == 0:
-        #     self.force_magnitude = 4
-        #     self.force_direction = Vector(Point(1, 0, 0))
-        #     self.force_direction.normalize()
-
-        # "try" positions - where the ball wants to go, used in advance
-        self.tx = x
-        self.tz = z
-    
-    def predict(self, time=0):
-        # attempt to do any potential movement
-        self.tx = self.x + (self.force_direction.dx * self.force_magnitude / (DELAY - time))
-        self.tz = self.z + (self.force_direction.dz * self.force_magnitude / (DELAY - time))
-
-        self.bounds_check()
-
-    def bounds_check(self, tolerance=0.25):
-        # bounds check with walls and holes
-        if self.tx < ball_min_x:
-            if self.tz > ball_max_z - 0.5 or self.tz < ball_min_z + 0.5:
-                self.sunk = True
-            self.tx = (2 * ball_min_x) - self.tx
-            self.force_direction.dx = -self.force_direction.dx
-        elif self.tx > ball_max_x:
-            if self.tz > ball_max_z - 0.5 or self.tz < ball_min_z + 0.5:
-                self.sunk = True
-            self.tx = (2 * ball_max_x) - self.tx
-            self.force_direction.dx = -self.force_direction.dx
-        if self.tz < ball_min_z:
-            if abs(table_x - self.tx) < 1 or self.tx > ball_max_x - 0.5 or self.tx < ball_min_x + 0.5:
-                self.sunk = True
-            self.tz = (2 * ball_min_z) - self.tz
-            self.force_direction.dz = -self.force_direction.dz
-        elif self.tz > ball_max_z:
-            if abs(table_x - self.tx) < 1 or self.tx > ball_max_x -0.5 or self.tx < ball_min_x + 0.5:
-                self.sunk = True
-            self.tz = (2 * ball_max_z) - self.tz
-            self.force_direction.dz = -self.force_direction.dz
-
-    def advance(self):
-        self.distance_x = self.tx - self.x
-        self.distance_z = self.tz - self.z
-
-        self.x = self.tx
-        self.z = self.tz
-
-        # slow down after movement
-        self.force_magnitude -= force_loss_over_time
-        self.force_magnitude = max(self.force_magnitude, 0)
-    
-    def compare(self, other, tolerance=0.25):
-        # bounds check with other ball (tolerance = radius)
-        if abs(self.tx - other.tx) <= tolerance and abs(self.tz - other.tz) <= tolerance:
-            # redirect both
-
-            # all of this occurs over the course of one "DELAY"
-
-            # split into precollision (part 1), collision (part 2, but doesnt take any time), and postcollision (part 3)
-
-            # part 1: move up until the collision
-            # in other words, calculate the collision centers
-
-            # this requires us to find the precise time of collision
-            collision_time = self.find_collision_time(other) # see the function below
-
-            # x1
-            center = Point(self.tx, 0, self.tz)
-            # x2
-            other_center = Point(other.tx, 0, other.tz)
-
-            # part 2: determine new velocities post-collision
-            # vectors marked with <v> in comments
-
-            # <x1 - x2>; p = x1, q = x2, q - p
-            center_diff_vector = Vector(other_center, center)       
-            # <x2 - x1>; p = x2, q = x1, q - p                                    
-            other_center_diff_vector = Vector(center, other_center)
-
-            # <v1>
-            old_velocity = self.force_direction.scalar_mult(self.force_magnitude)
-            # <v2>
-            other_old_velocity = other.force_direction.scalar_mult(other.force_magnitude)
-
-            # <v1 - v2>
-            velocity_diff = Vector()
-            velocity_diff.dx = old_velocity.dx - other_old_velocity.dx
-            velocity_diff.dy =  old_velocity.dy - other_old_velocity.dy
-            velocity_diff.dz = old_velocity.dz - other_old_velocity.dz
-            # <v2 - v1>
-            other_velocity_diff = Vector()
-            other_velocity_diff.dx = other_old_velocity.dx - old_velocity.dx
-            other_velocity_diff.dy =  other_old_velocity.dy - old_velocity.dy
-            other_velocity_diff.dz = other_old_velocity.dz - old_velocity.dz
-
-            # dot(<v1 - v2>, <x1 - x2>) / ||<x1 - x2>||^2
-            scalar = velocity_diff.dot(center_diff_vector) / (center_diff_vector.magnitude() ** 2)
-            # dot(<v2 - v1>, <x2 - x1>) / ||<x2 - x1>||^2
-            other_scalar = velocity_diff.dot(center_diff_vector) / (other_center_diff_vector.magnitude() ** 2)
-
-            # apply scalars from above
-            scaled_part = center_diff_vector.scalar_mult(scalar)
-            other_scaled_part = other_center_diff_vector.scalar_mult(other_scalar)
-
-            # entire formula
-            new_velocity = Vector()
-            new_velocity.dx = old_velocity.dx - scaled_part.dx
-            new_velocity.dy = old_velocity.dy - scaled_part.dy
-            new_velocity.dz = old_velocity.dz - scaled_part.dz
-            other_new_velocity = Vector()
-            other_new_velocity.dx = other_old_velocity.dx - other_scaled_part.dx
-            other_new_velocity.dy = other_old_velocity.dy - other_scaled_part.dy
-            other_new_velocity.dz = other_old_velocity.dz - other_scaled_part.dz
-
-            self.force_magnitude = new_velocity.magnitude()
-            new_velocity.normalize()
-            self.force_direction = new_velocity
-
-            other.force_magnitude = other_new_velocity.magnitude()
-            other_new_velocity.normalize()
-            other.force_direction = other_new_velocity
-
-            # part 3: move the rest
-            self.predict(collision_time)
-            other.predict(collision_time)
-            
-    def find_collision_time(self, other):
-        # BEGIN REF
-        # logic based on https://stackoverflow.com/questions/43577298/calculating-collision-times-between-two-circles-physics
-
-        # goal is to find collision time using quadratic formula, since we get a quadratic equation
-        # following along with the post at https://stackoverflow.com/a/43577790:
-
-        # we can derive the quadratic equation using my variables like so:
-
-        # position_x = 
-        #         (1 / 2 * self.force_direction.dx * force_loss_over_time * time ** 2) 
-        #         + (self.force_direction.dx * self.force_magnitude * time) 
-        #         + (self.x)
-
-        # position_z = 
-        #         (1 / 2 * self.force_direction.dz * force_loss_over_time * time ** 2) 
-        #         + (self.force_direction.dz * self.force_magnitude * time) 
-        #         + (self.z)
-
-        # other_position_x = 
-        #         (1 / 2 * other.force_direction.dx * force_loss_over_time * time ** 2) 
-        #         + (other.force_direction.dx * other.force_magnitude * time) 
-        #         + (other.x)
-
-        # other_position_z = 
-        #         (1 / 2 * other.force_direction.dz * force_loss_over_time * time ** 2) 
-        #         + (other.force_direction.dz * other.force_magnitude * time) 
-        #         + (other.z)
-
-        # distance = math.sqrt((position_x - other_position_x) ** 2 + (position_z - other_position_z) ** 2)
-        # distance - (0.25 + 0.25) = 0   <--- this is a quadratic equation when simplified, solve for time
-
-        # then, https://stackoverflow.com/a/70245568 provides a simplification of the derivation using WolframAlpha to calculate like so:
-
-        epsilon = -0.0001
-
-        distance = (0.25 + 0.25) ** 2 # radii of two balls added together
-        a = (self.force_direction.dx * self.force_magnitude - other.force_direction.dx * other.force_magnitude) ** 2 + (self.force_direction.dz * self.force_magnitude - other.force_direction.dz * other.force_magnitude) ** 2
-        b = 2 * ((self.x - other.x) * (self.force_direction.dx * self.force_magnitude - other.force_direction.dx * other.force_magnitude) + (self.z - other.z) * (self.force_direction.dz * self.force_magnitude - other.force_direction.dz * other.force_magnitude))
-        c = (self.x - other.x) ** 2 + (self.z - other.z) ** 2 - distance
-        discriminant = b ** 2 - 4 * a * c
-
-        # ignore near misses (b > epsilon, d = 0) or imaginary solutions (d < 0)
-        if b > epsilon or discriminant <= 0:
-            return -1
-
-        # if there is a real solution, find using quadratic formula
-
-        entry_time = (-b - math.sqrt(discriminant)) / (2 * a) # collision entrance time
-        exit_time = (-b - math.sqrt(discriminant)) / (2 * a) # collision exit time
-
-        # if we are already between entry time and exit time, the collision is ongoing, so collision time is now
-        if entry_time < 0 and exit_time > 0 and b <= epsilon:
-            return 0
-
-        # else collision time is the entry time
-        return entry_time
-
-        # END REF
-
 #=======================================
 # Initial data configuration + Global module variables
 #=======================================
@@ -253,6 +60,7 @@ wall_texture = None
 ceiling_texture = None
 table_top_texture = None 
 table_support_texture = None
+table_leg_texture = None
 lamp_support_texture = None
 lamp_head_texture = None
 aluminum_light_texture = None
@@ -260,25 +68,29 @@ aluminum_dark_texture = None
 pool_wood_texture = None
 felt_texture = None
 pocket_texture = None
-dice_texture_1 = None
-dice_texture_2 = None
-dice_texture_3 = None
-dice_texture_4 = None
-dice_texture_5 = None
-dice_texture_6 = None
 cue_ball_texture = None
-one_ball_texture = None
-three_ball_texture = None
-eight_ball_texture = None
-ten_ball_texture = None
-fourteen_ball_texture = None
-nine_ball_texture = None
-thirteen_ball_texture = None
-four_ball_texture = None
-six_ball_texture = None
-two_ball_texture = None
 library_painting_texture = None
 
+# texture atlases (see atlas.py), every ball and every dice face shares one texture
+ball_atlas = None
+dice_atlas = None
+
+# the images packed into each atlas
+BALL_IMAGES = {
+    "cue": "resources/cue.jpg",
+    "one": "resources/ball1_squish.jpg",
+    "two": "resources/ball2_squish.jpg",
+    "three": "resources/ball3_squish.jpg",
+    "four": "resources/ball4_squish.jpg",
+    "six": "resources/ball6_squish.jpg",
+    "eight": "resources/ball8_squish.jpg",
+    "nine": "resources/ball9_squish.jpg",
+    "ten": "resources/ball10_squish.jpg",
+    "thirteen": "resources/ball13_squish.jpg",
+    "fourteen": "resources/ball14_squish.jpg",
+}
+DICE_IMAGES = {side: f"resources/dice_{side}.jpg" for side in range(1, 7)}
+
 # Dice state information
 dice_animating = False
 dice_rotation = [0, 0, 0] 
@@ -289,13 +101,7 @@ has_won_before = False
 won_pool = False
 table_x = 0
 table_z = 0
-# ball bounds are x: [-7.25, 7.25] z: [-2.75, 2.75]
-ball_min_x = table_x - 7.25
-ball_max_x = table_x + 7.25
-ball_min_z = table_z - 2.75
-ball_max_z = table_z + 2.75
 force_loss_over_time = 0.01
-all_balls = []
 
 # Hanging light state information
 hanging_light_switched_on = False
@@ -311,6 +117,7 @@ light_pole_length = 5
 light_swinging = False
 light_should_swing = False
 light_angle = 0 # if starting swinging, change to math.radians(45)
+previous_light_angle = light_angle # angle before the last step, for drawing in between steps
 light_angle_velocity = 0
 light_angle_acceleration = 0
 gravity = 1
@@ -322,8 +129,55 @@ cue_ball_angle = 0
 cue_ball_power = 2
 
 # These parameters define simple animation properties
-FPS = 60.0  # frames per second
-DELAY = int(1000.0 / FPS + 0.5) # frame time (ms per frame)
+FPS = 60.0  # frames per second (drawing only)
+STEPS_PER_SECOND = 60.0  # animation/physics updates per second, independent of FPS
+DELAY = int(1000.0 / STEPS_PER_SECOND + 0.5) # step time (ms per step)
+MAX_STEPS_PER_FRAME = 5  # past this a slow frame drops time instead of catching up
+PHYSICS_SUBSTEPS = 1  # raise to split each pool step into smaller moves
+
+# runs advance() at a fixed rate however long each frame takes
+timestep = FixedTimestep(STEPS_PER_SECOND, MAX_STEPS_PER_FRAME)
+render_alpha = 1.0 # how far between the last two steps the current frame is drawn
+
+# headless pool simulation (see billiards.py), the scene only reads its state
+# ball bounds are x: [-7.25, 7.25] z: [-2.75, 2.75]
+pool_table = Table(table_x, table_z, delay=DELAY, friction=force_loss_over_time)
+pool = BallSet(pool_table, substeps=PHYSICS_SUBSTEPS)
+# set to True to run the minigame with the event-driven simulator (exact impact times) instead of frame stepping
+USE_EVENT_PHYSICS = False
+pool_events = EventSimulator(pool)
+# shot hints run a background shot search over this many random shots
+HINT_SHOTS = 400
+shot_hint = None # ShotSearch in progress, if any
+
+# recording and replay of pool games (see recording.py), set up from the command line in main()
+pool_steps = 0 # physics steps played so far
+recorder = None # ShotRecorder when recording
+record_path = None
+replay_player = None # ShotPlayer when replaying
+
+# every texture, with its sampler settings and which one is bound (see textures.py)
+#   textures are mipmapped, and compressed where the driver supports it
+textures = TextureRegistry(mipmaps=True, compress=True)
+# largest side a texture is uploaded with (it is also kept within what OpenGL allows)
+MAX_TEXTURE_SIZE = 2048
+
+# buffers for the meshes built in NumPy, shared by every object with the same shape (see meshes.py)
+meshes = MeshCache()
+
+# the active front and back materials (see materials.py)
+materials = MaterialTracker()
+
+# display lists for the objects that never move (see geometry_cache.py)
+#   the render queue splits each object into lists of plain geometry, so no binds or materials are hidden in them
+static_geometry = GeometryCache()
+
+# lighting worked out for every pixel by a shader, with room for more lights than fixed function OpenGL (see pixel_lighting.py)
+#   turned off when the shader can't run, or with --fixed-function-lighting
+pixel_lighting = PixelLighting()
+
+# everything in the room is submitted here and drawn sorted by texture and material (see render_queue.py)
+render_queue = RenderQueue(textures, materials, static_geometry, texturing=pixel_lighting.texturing)
 
 # all lights in the scene
 # order is flashlight (100% white), overhead red, overhead green, overhead blue, hanging light (50% yellow) + flicker, desk lamp (75% white)
@@ -427,37 +281,161 @@ obstacles = [
     ((-7.5, -40), (7.5, -39)),  # Wall painting boundaries
 ]
 
+# Bounding boxes of the objects (low corner, high corner) for frustum culling (see frustum.py)
+#   the walls have none, the camera is always inside them
+object_bounds = {
+    "floor": ((-40, 0, -40), (40, 0, 40)),
+    "ceiling": ((-40, 40, -40), (40, 40, 40)),
+    "side table": ((-39, 0, -37), (-31, 8.5, -31)),
+    "desk lamp": ((-33.5, 8.5, -37.5), (-30.5, 13, -34.5)),
+    "dice": ((-38, 8, -35), (-35, 10, -33)),
+    "pool table": ((table_x - 10.25, 0, table_z - 6.25), (table_x + 10.25, 10, table_z + 6.25)), # balls and shot indicator included
+    "painting": ((-8.5, 11.5, -40), (8.5, 28.5, -39)),
+}
+# the hanging lamp swings, so it gets a sphere around everything it can reach
+HANGING_LAMP_REACH = 11.5
+
+# objects outside the view are skipped each frame, press C to print how many
+culling = FrustumCuller()
+
+# frames are only drawn when something changed, an idle scene waits for input (see redraw.py)
+redraw = RedrawTracker()
+# window events that mean the picture has to be drawn again
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN, pygame.WINDOWRESTORED)
+
+# times each part of a frame, only while the overlay is shown or --profile is given (see profiler.py)
+profiler = FrameProfiler()
+show_profiler = False   # whether the overlay is drawn (I key)
+profile_path = None     # file the profile is written to when the window closes
+PROFILE_EXPORT_FILE = "profile.json" # file the O key writes the profile to
+PROFILER_OVERLAY_REFRESH = 30 # frames between updates of the overlay text
+profiler_overlay = None # (width, height, RGBA bytes) of the overlay text, drawn every frame
+
 # Window data
 window_dimensions = (1000, 800)
 name = b'Project 2'
 
+# level of detail for curved shapes, picked from how big they look on screen (see lod.py)
+#   each list is the segments around the shape at each level, from coarse to fine
+detail = LevelOfDetail(window_dimensions[1])
+LIGHT_BALL_LEVELS = (8, 16, 32, 100)
+HANGING_LAMP_LEVELS = (8, 16, 30)
+POCKET_LEVELS = (8, 16, 32) # segments around a whole pocket
+
+# grid of the floor and ceiling, and of the walls, as (x slices, y slices)
+ROOM_SLICES = (10, 10)
+WALL_SLICES = (10, 5)
+ROOM_SLICES_PER_PIXEL = (1, 1) # with per-pixel lighting
+
 #==============================
 # OpenGL and Scene Setup
 #==============================
 
 def main():
+    parse_arguments()
     init()
     global camera
-    camera = Camera(CAM_ANGLE, window_dimensions[0]/window_dimensions[1], CAM_NEAR, CAM_FAR)
-    camera.eye = copy.deepcopy(start_camera_position)  # Position the camera
-    # camera.look = Point(0, 0, 0)  # Look at the center of the scene
-    # camera.up = Vector(Point(0, 1, 0))  # Set up vector
-    camera.add_room_bounds(room_bounds) # Add bounding box for room
-    camera.add_obstacle_bounding_boxes(obstacles) # Add bounding boxes for objects
+    camera = create_camera(window_dimensions[0]/window_dimensions[1])
 
     # Enters the main loop.   
     # Displays the window and starts listening for events.
     main_loop()
+
+    if recorder is not None:
+        recorder.save(record_path)
+        print(f'Saved the game to {record_path}')
+    if profile_path is not None:
+        profiler.export(profile_path)
+        print(f'Saved the frame profile to {profile_path}')
     return
 
+# the camera at its starting position, kept inside the room and out of the furniture
+def create_camera(aspect_ratio):
+    new_camera = Camera(CAM_ANGLE, aspect_ratio, CAM_NEAR, CAM_FAR)
+    new_camera.eye = copy.deepcopy(start_camera_position)  # Position the camera
+    # new_camera.look = Point(0, 0, 0)  # Look at the center of the scene
+    # new_camera.up = Vector(Point(0, 1, 0))  # Set up vector
+    new_camera.add_room_bounds(room_bounds) # Add bounding box for room
+    new_camera.add_obstacle_bounding_boxes(obstacles) # Add bounding boxes for objects
+    return new_camera
+
+def positive_float(text):
+    value = float(text)
+    if not (value > 0 and math.isfinite(value)):
+        raise argparse.ArgumentTypeError(f'{text} is not a positive number')
+    return value
+
+def parse_arguments():
+    global recorder, record_path, replay_player, pool, pool_events, USE_EVENT_PHYSICS, timestep, profile_path
+    parser = argparse.ArgumentParser(description="Interactive 3D scene with a pool minigame")
+    parser.add_argument("--record", metavar="FILE", help="record the pool game to FILE when the window closes")
+    parser.add_argument("--replay", metavar="FILE", help="replay a recorded pool game")
+    parser.add_argument("--speed", type=positive_float, help="replay speed (2 = twice as fast, only with --replay)")
+    parser.add_argument("--uncompressed-textures", action="store_true", help="upload textures without compressing them")
+    parser.add_argument("--always-redraw", action="store_true", help="draw every frame, even when nothing changed")
+    parser.add_argument("--fixed-function-lighting", action="store_true", help="light the scene per vertex with OpenGL's own lights, instead of the per-pixel shader")
+    parser.add_argument("--extra-lights", type=int, default=0, metavar="N", help=f"add N colored lights around the room (per-pixel lighting only, up to {MAX_LIGHTS} lights in all)")
+    parser.add_argument("--unsorted-draws", action="store_true", help="draw in the order objects are drawn in the code, instead of sorted by texture and material")
+    parser.add_argument("--profile", metavar="FILE", help="time every frame and write the profile to FILE as JSON when the window closes")
+    arguments = parser.parse_args()
+    if arguments.speed is not None and not arguments.replay:
+        parser.error("--speed only applies to --replay")
+
+    if arguments.uncompressed_textures:
+        textures.compress = False
+    if arguments.always_redraw:
+        redraw.enabled = False
+    if arguments.unsorted_draws:
+        render_queue.enabled = False
+    if arguments.fixed_function_lighting:
+        pixel_lighting.enabled = False
+    if arguments.extra_lights:
+        add_extra_lights(arguments.extra_lights)
+    if arguments.profile:
+        profile_path = arguments.profile
+        profiler.enabled = True
+
+    if arguments.replay:
+        log = ShotLog.load(arguments.replay)
+        replay_player = ShotPlayer(log)
+        (pool, pool_events) = log.new_ball_set()
+        USE_EVENT_PHYSICS = log.events
+        random.seed(log.seed)
+        # more steps per second plays everything faster, including the lights and dice
+        speed = arguments.speed if arguments.speed is not None else 1.0
+        timestep = FixedTimestep(STEPS_PER_SECOND * speed, MAX_STEPS_PER_FRAME * max(1, math.ceil(speed)))
+    elif arguments.record:
+        record_path = arguments.record
+        recorder = ShotRecorder(pool, USE_EVENT_PHYSICS)
+
+# colors the extra lights take turns with
+EXTRA_LIGHT_COLORS = [[1.0, 0.4, 0.2], [0.2, 1.0, 0.4], [0.3, 0.5, 1.0], [1.0, 0.9, 0.3], [0.9, 0.3, 1.0], [0.3, 1.0, 1.0]]
+
+# adds count small colored lights in a ring around the room, below the ceiling
+#   there are only 8 fixed function lights, so these have no GL_LIGHTn and only show up with per-pixel lighting
+def add_extra_lights(count):
+    count = min(count, MAX_LIGHTS - len(lights))
+    for index in range(count):
+        angle = 2 * math.pi * index / count
+        color = EXTRA_LIGHT_COLORS[index % len(EXTRA_LIGHT_COLORS)]
+        lights.append(Light(
+            None,
+            enabled=True,
+            position=Point(30 * math.sin(angle), 36, 30 * math.cos(angle)),
+            ambient=[0.05 * c for c in color] + [1.0],
+            diffuse=[0.5 * c for c in color] + [1.0],
+            specular=[0.5 * c for c in color] + [1.0],
+            display_ball=False, # the spheres are drawn in the ambient color, too dark to see for these
+            is_point_light=True,
+            constant_attenuation=1,
+            linear_attenuation=0.05,
+            quadratic_attenuation=0.002
+        ))
+
 # Any initialization material to do...
 def init():
     # state information
     global clock, running
-    # quadrics
-    global tube, ball, disk
-    # textures
-    global dice_texture_1, dice_texture_2, dice_texture_3, dice_texture_4, dice_texture_5, dice_texture_6, floor_texture, wall_texture, ceiling_texture, table_support_texture, table_top_texture, lamp_support_texture, lamp_head_texture, aluminum_light_texture, aluminum_dark_texture, pool_wood_texture, felt_texture, pocket_texture, cue_ball_texture, one_ball_texture, three_ball_texture, eight_ball_texture, ten_ball_texture, fourteen_ball_texture, nine_ball_texture, thirteen_ball_texture, four_ball_texture, six_ball_texture, two_ball_texture, library_painting_texture
 
     # pygame setup
     pygame.init()
@@ -466,36 +444,33 @@ def init():
     clock = pygame.time.Clock()
     running = True
 
+    init_scene()
+
+# Loads everything the scene draws with and sets up OpenGL, once there is a context
+#   (the pygame window, or an offscreen one from offscreen.py)
+def init_scene():
+    # quadrics
+    global tube, ball, disk
+    # textures
+    global floor_texture, wall_texture, ceiling_texture, table_support_texture, table_leg_texture, table_top_texture, lamp_support_texture, lamp_head_texture, aluminum_light_texture, aluminum_dark_texture, pool_wood_texture, felt_texture, pocket_texture, cue_ball_texture, library_painting_texture, ball_atlas, dice_atlas
+
     # loading / generating textures
-    wall_texture = load_texture("resources/wall.jpg", 512)
-    ceiling_texture = load_texture("resources/Concrete_texture.jpg", 1024) 
-    table_top_texture = load_texture("resources/table_top.jpg", 512)
-    table_support_texture = load_texture("resources/table_support.jpg", 512)
-    lamp_support_texture = load_texture("resources/lamp_support.jpg", 512)
-    lamp_head_texture = load_texture("resources/lamp_head.jpg", 512)
-    aluminum_dark_texture = load_texture("resources/HangingLamp_Dark.jpg", 1024)
-    aluminum_light_texture = load_texture("resources/HangingLamp_Light.jpg", 1024)
-    pool_wood_texture = load_texture("resources/pool_wood.jpg", 1024)
-    felt_texture = load_texture("resources/felt.jpg", 1024)
-    pocket_texture = load_texture("resources/pocket.jpg", 512)
-    dice_texture_1 = load_texture("resources/dice_1.jpg", 512)
-    dice_texture_2 = load_texture("resources/dice_2.jpg", 512)
-    dice_texture_3 = load_texture("resources/dice_3.jpg", 512)
-    dice_texture_4 = load_texture("resources/dice_4.jpg", 512)
-    dice_texture_5 = load_texture("resources/dice_5.jpg", 512)
-    dice_texture_6 = load_texture("resources/dice_6.jpg", 512)
-    cue_ball_texture = load_texture("resources/cue.jpg", 512)
-    one_ball_texture = load_texture("resources/ball1_squish.jpg", 1024)
-    three_ball_texture = load_texture("resources/ball3_squish.jpg", 1024)
-    eight_ball_texture = load_texture("resources/ball8_squish.jpg", 1024)
-    ten_ball_texture = load_texture("resources/ball10_squish.jpg", 1024)
-    fourteen_ball_texture = load_texture("resources/ball14_squish.jpg", 1024)
-    nine_ball_texture = load_texture("resources/ball9_squish.jpg", 1024)
-    thirteen_ball_texture = load_texture("resources/ball13_squish.jpg", 1024)
-    four_ball_texture = load_texture("resources/ball4_squish.jpg", 1024)
-    six_ball_texture = load_texture("resources/ball6_squish.jpg", 1024)
-    two_ball_texture = load_texture("resources/ball2_squish.jpg", 1024)
-    library_painting_texture = load_texture("resources/library_painting.jpg", 2048)
+    wall_texture = load_texture("resources/wall.jpg")
+    ceiling_texture = load_texture("resources/Concrete_texture.jpg") 
+    table_top_texture = load_texture("resources/table_top.jpg")
+    table_support_texture = load_texture("resources/table_support.jpg")
+    table_leg_texture = load_texture("resources/table_support.jpg", filter=GL_LINEAR) # the legs are smoothed, the painting frame is not
+    lamp_support_texture = load_texture("resources/lamp_support.jpg")
+    lamp_head_texture = load_texture("resources/lamp_head.jpg")
+    aluminum_dark_texture = load_texture("resources/HangingLamp_Dark.jpg")
+    aluminum_light_texture = load_texture("resources/HangingLamp_Light.jpg")
+    pool_wood_texture = load_texture("resources/pool_wood.jpg")
+    felt_texture = load_texture("resources/felt.jpg")
+    pocket_texture = load_texture("resources/pocket.jpg")
+    cue_ball_texture = load_texture("resources/cue.jpg") # still used on its own by the shot indicator
+    ball_atlas = build_atlas(textures, "ball atlas", BALL_IMAGES, max_cell_size=512) # a ball is never more than a few hundred pixels across
+    dice_atlas = build_atlas(textures, "dice atlas", DICE_IMAGES)
+    library_painting_texture = load_texture("resources/library_painting.jpg")
     floor_texture = generate_checkerboard_texture(4, 4, 1, [[139, 69, 19, 255], [205, 133, 63, 255]]) 
 
     # loading / creating quadrics
@@ -515,25 +490,48 @@ def init():
     gluQuadricNormals(disk, GLU_SMOOTH) 
 
     # OpenGL setup
+    # texture environment and hint are global state, so they are set once here (each texture keeps its own wrap/filter)
+    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
+    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
+    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, [0.3, 0.3, 0.3, 1.0])
+    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, GL_TRUE) # draw specular reflections relative to camera direction
+    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE) # light both sides of a shape
     glEnable(GL_LIGHTING)
     glEnable(GL_NORMALIZE)    # Inefficient...
     glEnable(GL_DEPTH_TEST)   # For z-buffering!
+    # falls back to the fixed function lighting above when the shader can't be used
+    pixel_lighting.create()
+    if not pixel_lighting.enabled and any(light.gl_light_name is None for light in lights):
+        print("Warning: lights past GL_LIGHT7 need per-pixel lighting, they are left off")
+
+    # counters shown by the profiler, read once at the end of each frame
+    profiler.track("display lists", lambda: static_geometry.calls)
+    profiler.track("mesh draws", meshes.draws)
+    profiler.track("texture binds", lambda: textures.binds)
+    profiler.track("binds skipped", lambda: textures.skipped)
+    profiler.track("materials set", lambda: materials.applied)
+    profiler.track("objects culled", lambda: culling.culled, per_frame=True)
+    profiler.track("state changes", lambda: render_queue.changes, per_frame=True)
+    profiler.track("unsorted changes", lambda: render_queue.unsorted_changes, per_frame=True)
 
     reset_balls()
 
-# helper function to load in textures with a given file and image size
+# helper function to load in textures from a file
+#   the image is resized to the nearest power of two to its own size (for mipmaps), up to MAX_TEXTURE_SIZE
 #   in order to preserve repeating patterns, the image is resized instead of cropped
-def load_texture(file_name, dim):
+#   wrap and filter are set on the texture once here, returns a Texture (see textures.py)
+def load_texture(file_name, wrap=GL_REPEAT, filter=GL_NEAREST):
+    key = (file_name, wrap, filter)
+    if key in textures:
+        return textures[key]
+
     im = Image.open(file_name)
     im = im.transpose(method=Image.Transpose.FLIP_TOP_BOTTOM)
-    size = (dim, dim)
+    max_size = min(MAX_TEXTURE_SIZE, glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+    size = (power_of_two_size(im.width, max_size), power_of_two_size(im.height, max_size))
     texture = im.resize(size).tobytes("raw")
 
-    texture_name = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, texture_name)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, dim, dim, 0, GL_RGB,
-                 GL_UNSIGNED_BYTE, texture)
-    return texture_name
+    return textures.upload(key, size[0], size[1], GL_RGB, texture, wrap, filter)
 
 # helper function to create a checkerboard texture, used for the floor
 def generate_checkerboard_texture(nrows, ncols, block_size, block_colors):
@@ -553,38 +551,64 @@ def generate_checkerboard_texture(nrows, ncols, block_size, block_colors):
                         texture[idx] = c
                         idx += 1
 
-    texture_name = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, texture_name)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA,
-                 ncols*block_size, 
-                 nrows*block_size, 
-                 0, GL_RGBA, 
-                 GL_UNSIGNED_BYTE, texture)
-    return texture_name
+    return textures.upload(("checkerboard", nrows, ncols, block_size), ncols*block_size, nrows*block_size, GL_RGBA, texture)
 
 def main_loop():
-    global running, clock
+    global running, clock, render_alpha
+    frame_time = timestep.step_time # real time the last frame took (seconds)
     while running:
         # poll for events
-        # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                keyboard(event)
-
+        #   with nothing moving and nothing new to draw, sleep until the next event instead
+        if redraw.idle():
+            events = [pygame.event.wait()] + pygame.event.get()
+            # the time spent asleep isn't given to the animations, one step runs to catch up with the input
+            clock.tick()
+            frame_time = timestep.step_time
+        else:
+            events = pygame.event.get()
 
-        # Always advance to the next frame
+        # pygame.QUIT event means the user clicked X to close your window
+        with profiler.scope("events"):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    keyboard(event)
+                    redraw.mark("key")
+                elif event.type in REDRAW_EVENTS:
+                    redraw.mark("window")
+
+        # Advance in fixed steps to catch up with the real time that has passed
         #   Necessary for calculating rolling dice positions or swinging light location
-        advance()
-
-        # (Re)draw the scene (should only do this when necessary!)
-        display()
-
-        # Flipping causes the current image to be seen. (Double-Buffering)
-        pygame.display.flip()
-
-        clock.tick(FPS)  # delays to keep it at FPS frame rate
+        with profiler.scope("advance"):
+            for step in range(timestep.advance(frame_time)):
+                advance()
+
+        active = scene_active()
+        redraw.watch("camera", (camera.eye.x, camera.eye.y, camera.eye.z, camera.lookAngle, camera.pitchAngle))
+        if any(light.changed for light in lights):
+            redraw.mark("lights")
+        # with nothing moving, the latest step is drawn as it is
+        render_alpha = timestep.alpha() if active else 1.0
+
+        # (Re)draw the scene, only when something changed
+        if redraw.should_draw(active):
+            with profiler.scope("display"):
+                display()
+
+            # Flipping causes the current image to be seen. (Double-Buffering)
+            with profiler.scope("flip"):
+                pygame.display.flip()
+            profiler.end_frame()
+
+        frame_time = clock.tick(FPS) / 1000.0  # delays to keep it at FPS frame rate
+
+# whether anything in the scene is moving on its own, so every frame has to be drawn
+def scene_active():
+    # the hanging light can start flickering on any step while it is on
+    return (dice_animating or light_swinging or hanging_light_switched_on
+            or not pool.at_rest() or shot_hint is not None
+            or (replay_player is not None and not replay_player.finished()))
 
 # Callback function used to display the scene
 # Currently it just draws a simple polyline (LINE_STRIP)
@@ -604,10 +628,14 @@ def display():
     glColor3f(1.0, 1.0, 1.0)
     draw_scene()
 
+    if show_profiler:
+        with profiler.scope("overlay"):
+            draw_profiler_overlay()
+
     # And show the scene
     glFlush()
 
-# Advance the scene one frame
+# Advance the scene one fixed step
 def advance():
     # Dice animations
     global dice_animating, dice_rotation, dice_rotation2
@@ -627,39 +655,31 @@ def advance():
 
     # Billiards behaviors
     # gamestate
-    global won_pool, has_won_before
+    global won_pool, has_won_before, pool_steps
 
-    if all_balls[0].sunk:
+    if replay_player is not None:
+        for record in replay_player.due(pool_steps):
+            if record.kind == STRIKE_RECORD:
+                strike_cue_ball(record.angle, record.power)
+            else:
+                reset_balls()
+
+    if pool.scratched():
         reset_balls()
-    
-    temp = True
-    for other_ball_index in range(1, len(all_balls)):
-        if not all_balls[other_ball_index].sunk:
-            temp = False
 
-    won_pool = temp
+    won_pool = pool.cleared()
+
+    check_shot_hint()
 
     if won_pool and not has_won_before:
         print("Great job sinking all the billiard balls without sinking the cue ball!")
         has_won_before = True
 
-    # try to move on its own
-    for ball_index in range(len(all_balls)):
-        if not all_balls[ball_index].sunk:
-            all_balls[ball_index].predict()
-
-    # check for interball collisions
-    for ball_index in range(len(all_balls)):
-        if not all_balls[ball_index].sunk:
-            for other_ball_index in range(len(all_balls)):
-                if all_balls[ball_index].id != all_balls[other_ball_index].id and not all_balls[other_ball_index].sunk:
-                    all_balls[ball_index].compare(all_balls[other_ball_index])
-
-    # actually move
-    # precondition: all non-sunk balls predicted successfully
-    for ball in all_balls:
-        if not ball.sunk:
-            ball.advance()
+    if USE_EVENT_PHYSICS:
+        pool_events.advance()
+    else:
+        pool.step()
+    pool_steps += 1
 
     # Hanging light animations
     global hanging_light_switched_on, flickering, flicker_duration, flicker_elapsed_frames, reflickering, reflicker_duration, reflicker_elapsed_frames
@@ -681,7 +701,7 @@ def advance():
             # begin the flicker
             if should_flicker:
                 flickering = True
-                flicker_duration = random.random() * 1.5 * FPS # flicker of up to 3 seconds
+                flicker_duration = random.random() * 1.5 * STEPS_PER_SECOND # flicker of up to 3 seconds
                 flicker_elapsed_frames = 0
                 lights[4].enabled = False
         # if the light is flickering, count up the flicker time or reflicker time
@@ -711,7 +731,7 @@ def advance():
                 # begin the reflicker
                 if should_reflicker:
                     reflickering = True
-                    reflicker_duration = random.random() * 0.5 * FPS # reflicker of up to 1 seconds
+                    reflicker_duration = random.random() * 0.5 * STEPS_PER_SECOND # reflicker of up to 1 seconds
                     reflicker_elapsed_frames = 0
                     # reflicker with lower light level
                     lights[4].enabled = True
@@ -734,7 +754,8 @@ def advance():
 
     # print(f'Flicker: \t{flickering}, Reflicker: \t{reflickering}')
 
-    global light_swinging, light_angle, light_angle_velocity, light_angle_acceleration
+    global light_swinging, light_angle, light_angle_velocity, light_angle_acceleration, previous_light_angle
+    previous_light_angle = light_angle
 
     # set the flag for if the light is moving to be 
     light_swinging = abs(light_angle) > 0.01 or abs(light_angle_velocity) > 0.01
@@ -773,7 +794,10 @@ def advance():
     # print(f'Light Pos: {lights[4].position}, Light Direction: {lights[4].direction}')
 
     # Flashlight updating
+    update_flashlight()
 
+# Moves the flashlight (light 0) to the camera, pointing where it looks
+def update_flashlight():
     # calculate the direction using vector between camera location and look at point 
     camera_direction = Vector(camera.eye, camera.get_look_at_point())
 
@@ -783,7 +807,7 @@ def advance():
 # Function used to handle any key events
 # event: The keyboard event that happened
 def keyboard(event):
-    global running, dice_animating, hanging_light_switched_on, light_swinging, light_should_swing, light_angle_velocity, ball_game_active, cue_ball_angle, cue_ball_power
+    global running, dice_animating, hanging_light_switched_on, light_swinging, light_should_swing, light_angle_velocity, ball_game_active, cue_ball_angle, cue_ball_power, show_profiler, profiler_overlay
     key = event.key # "ASCII" value of the key pressed
     if key == 27:  # ASCII code 27 = ESC-key
         running = False
@@ -823,6 +847,33 @@ def keyboard(event):
     elif key == ord('h'):
         # Output help message to the console
         print_help_message()
+    elif key == ord('c'):
+        # Output how many objects the last frame skipped
+        print(f'Frustum culling: {culling}')
+        print(f'Render queue: {render_queue}')
+        print(f'Lighting: {pixel_lighting if pixel_lighting.enabled else "fixed function"}')
+    elif key == ord('l'):
+        # Switch between per-pixel and fixed function lighting (if the shader could be built)
+        if pixel_lighting.program is not None:
+            pixel_lighting.enabled = not pixel_lighting.enabled
+            # fixed function OpenGL only gets the settings that changed, so send all of them again
+            for light in lights:
+                light.mark_changed()
+            print(f'Lighting: {"per pixel" if pixel_lighting.enabled else "fixed function"}')
+    elif key == ord('i'):
+        # Show/hide the frame profiler, which only runs while shown (or with --profile)
+        show_profiler = not show_profiler
+        profiler_overlay = None
+        if show_profiler and not profiler.enabled:
+            profiler.reset()
+        profiler.enabled = show_profiler or profile_path is not None
+    elif key == ord('o'):
+        # Write the frame profile to a file
+        if profiler.frames > 0:
+            profiler.export(PROFILE_EXPORT_FILE)
+            print(f'Saved the frame profile to {PROFILE_EXPORT_FILE}')
+        else:
+            print('No frames profiled yet, press I to start the profiler')
     elif key == ord('0'):
         # Toggle activation of light 0
         lights[0].enabled = not lights[0].enabled
@@ -860,17 +911,25 @@ def keyboard(event):
         # Start the light slowing down if moving
         elif light_swinging and light_should_swing:
             light_should_swing = False
+    elif key in (ord('p'), ord(' ')) and replay_player is not None and not replay_player.finished():
+        # the replay plays the pool game from the log, resets or strikes from the keyboard would break it
+        print("The pool game is being replayed, wait for the replay to finish to play")
     elif key == ord('p'):
         # reset pool balls
+        if recorder is not None:
+            recorder.reset(pool_steps)
         reset_balls()
     elif key == ord(' '):
         # enabling the billiard ball game interactions
         ball_game_active = not ball_game_active
 
         if not ball_game_active:
-            all_balls[0].force_magnitude = cue_ball_power
-            all_balls[0].force_direction = Vector(Point(math.cos(math.radians(cue_ball_angle)), 0, -math.sin(math.radians(cue_ball_angle))))
-            all_balls[0].force_direction.normalize()
+            cancel_shot_hint()
+            (angle, power) = (cue_ball_angle, cue_ball_power)
+            if recorder is not None:
+                # the recorder rounds the shot to what it stores, so the replay matches
+                (angle, power) = recorder.strike(pool_steps, angle, power)
+            strike_cue_ball(angle, power)
 
     # custom controls for the ball game
     if ball_game_active:
@@ -888,6 +947,9 @@ def keyboard(event):
             # decrease power down to 0.1
             cue_ball_power -= 0.1
             cue_ball_power = max(cue_ball_power, 0.1)
+        elif key == ord('b'):
+            # search for a good shot in the background and aim at it
+            start_shot_hint()
     
 
 # function to set up the camera, lights, and world
@@ -899,80 +961,154 @@ def draw_scene():
     # Place the camera
     glMatrixMode(GL_MODELVIEW);
     camera.placeCamera()
+    detail.begin_frame(camera)
+    culling.begin_frame(camera)
     
     # Now transform the world
     glColor3f(1, 1, 1)
-    place_lights()
-    draw_objects() 
+    with profiler.scope("lights"):
+        place_lights()
+    with profiler.scope("objects"):
+        if pixel_lighting.enabled:
+            pixel_lighting.use()
+        draw_objects()
+        if pixel_lighting.enabled:
+            pixel_lighting.stop()
 
 # function to set up the main lights in the room
 def place_lights():
     """Set up the main lights."""
     global lights
 
-    amb = [0.3, 0.3, 0.3, 1.0]   # No ambient light initially
-    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, amb)
+    glMatrixMode(GL_MODELVIEW)
+    # with per-pixel lighting every enabled light goes to the shader at once (see pixel_lighting.py)
+    if pixel_lighting.enabled:
+        pixel_lighting.upload(lights)
 
+    balls_by_level = {} # segments -> (positions, colors) of the light spheres
     for index, light in enumerate(lights):
-        # skip disabled lights
+        if pixel_lighting.enabled:
+            # the shader gets every setting each frame, nothing to remember
+            light.take_changes()
+        elif light.gl_light_name is not None:
+            send_light(light)
+        else:
+            # lights past the fixed function ones only light anything with per-pixel lighting
+            continue
+
         if not light.enabled:
-            glDisable(light.gl_light_name)
             continue
-        # display enabled lights
-        else:
-            glMatrixMode(GL_MODELVIEW)
-
-            # For each light, set position, ambient, diffuse, and specular values using class
-            #   note: light.position is not valid for GL_POSITION, as it is a point and not a list
-            glLightfv(light.gl_light_name, GL_POSITION, light.get_position_list())
-            glLightfv(light.gl_light_name, GL_AMBIENT, light.ambient)
-            glLightfv(light.gl_light_name, GL_DIFFUSE, light.diffuse)
-            glLightfv(light.gl_light_name, GL_SPECULAR, light.specular)
-
-            # Constant attenuation (for distance, etc.)
-            # Only works for fixed light locations!  Otherwise disabled
-            glLightf(light.gl_light_name, GL_CONSTANT_ATTENUATION, light.constant_attenuation)
-            glLightf(light.gl_light_name, GL_LINEAR_ATTENUATION, light.linear_attenuation)
-            glLightf(light.gl_light_name, GL_QUADRATIC_ATTENUATION, light.quadratic_attenuation)
-
-            # Create a spotlight effect (none at the moment)
-            #   note: if not a spot light, these values should be 180.0 and 0.0, meaning they have no effect
-            glLightf(light.gl_light_name, GL_SPOT_CUTOFF, light.spot_cutoff) 
-            glLightf(light.gl_light_name, GL_SPOT_EXPONENT, light.spot_exponent)
-            # Attach direction to spot lights only
-            if light.is_spot_light:
-                glLightfv(light.gl_light_name, GL_SPOT_DIRECTION, light.direction)
 
+        # remember where to draw a SELF-COLORED sphere (in spot where light is!)
+        if light.display_ball and culling.sphere_visible(f"light ball {index}", light.position.x, light.position.y, light.position.z, 0.2):
+            segments = detail.segments(light.position.x, light.position.y, light.position.z, 0.2, LIGHT_BALL_LEVELS)
+            balls_by_level.setdefault(segments, ([], []))
+            balls_by_level[segments][0].append([light.position.x, light.position.y, light.position.z])
+            balls_by_level[segments][1].append(light.ambient[0:3])
+
+    # the light spheres with the same level of detail are drawn in one call (see meshes.py)
+    if balls_by_level:
+        glDisable(GL_LIGHTING)
+        for segments, (positions, colors) in balls_by_level.items():
+            meshes.sphere_batch(0.2, segments, segments).draw(positions, colors=colors)
+        # leave the current color the same as drawing the spheres one at a time did
+        glColor3f(*colors[-1])
+        glEnable(GL_LIGHTING)
+
+# sends a light to fixed function OpenGL (with the camera's transform current)
+def send_light(light):
+    # only the settings changed since the last frame are sent again (see light.py)
+    changed = light.take_changes()
+    if "enabled" in changed:
+        if light.enabled:
             glEnable(light.gl_light_name)
+        else:
+            glDisable(light.gl_light_name)
 
-            # This part draws a SELF-COLORED sphere (in spot where light is!)
-            if (light.display_ball):
-                glPushMatrix()
-                glTranslatef(light.position.x, light.position.y, light.position.z)
-                glDisable(GL_LIGHTING)
-                glColor3f(light.ambient[0], light.ambient[1], light.ambient[2]) # Colored sphere
-                gluSphere(ball, 0.2, 100, 100)
-                glEnable(GL_LIGHTING)
-                glPopMatrix()
-
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, GL_TRUE) # draw specular reflections relative to camera direction
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE) # light both sides of a shape
+    # set ambient, diffuse, and specular values using class
+    if "ambient" in changed:
+        glLightfv(light.gl_light_name, GL_AMBIENT, light.ambient)
+    if "diffuse" in changed:
+        glLightfv(light.gl_light_name, GL_DIFFUSE, light.diffuse)
+    if "specular" in changed:
+        glLightfv(light.gl_light_name, GL_SPECULAR, light.specular)
+
+    # Constant attenuation (for distance, etc.)
+    # Only works for fixed light locations!  Otherwise disabled
+    if "constant_attenuation" in changed:
+        glLightf(light.gl_light_name, GL_CONSTANT_ATTENUATION, light.constant_attenuation)
+    if "linear_attenuation" in changed:
+        glLightf(light.gl_light_name, GL_LINEAR_ATTENUATION, light.linear_attenuation)
+    if "quadratic_attenuation" in changed:
+        glLightf(light.gl_light_name, GL_QUADRATIC_ATTENUATION, light.quadratic_attenuation)
+
+    # Create a spotlight effect (none at the moment)
+    #   note: if not a spot light, these values should be 180.0 and 0.0, meaning they have no effect
+    if "spot_cutoff" in changed:
+        glLightf(light.gl_light_name, GL_SPOT_CUTOFF, light.spot_cutoff)
+    if "spot_exponent" in changed:
+        glLightf(light.gl_light_name, GL_SPOT_EXPONENT, light.spot_exponent)
+
+    # skip disabled lights (their other settings are still sent, OpenGL keeps them until the light is back on)
+    if not light.enabled:
+        return
+
+    # position and direction go through the camera transform when they are set, so they are sent every frame
+    #   note: light.position is not valid for GL_POSITION, as it is a point and not a list
+    glLightfv(light.gl_light_name, GL_POSITION, light.get_position_list())
+    # Attach direction to spot lights only
+    if light.is_spot_light:
+        glLightfv(light.gl_light_name, GL_SPOT_DIRECTION, light.direction)
 
 # function to draw the actual elements and objects in the room
 def draw_objects():
     glPushMatrix()
-    draw_floor(0, 0, 0, 80, 80, 10, 10)
-    draw_walls(0, 0, 0, 80, 40, 10, 5)
-    draw_ceiling(0, 40, 0, 80, 80, 10, 10)
-    draw_side_table(-35, 0, -34)
-    draw_desk_lamp(-32, 8.5, -36)
-    draw_dice(-37, 9, -34)
-    draw_hanging_spotlight(0, 40, 0)
-    draw_pool_table(table_x, 4, table_z)
-    draw_balls()
-    if ball_game_active:
-        draw_ball_game_indicator()
-    draw_wall_painting(0, 20, -39.5, 15, 15)
+    # objects submit what they draw to the render queue, which draws it all sorted by texture and material
+    # static objects are baked into display lists, one for each texture and material they use
+    # anything outside the view is skipped before it makes any GL calls
+    render_queue.begin()
+    # fixed function lighting is only worked out at the corners of the grid, so the room needs a fine grid
+    #   for the spotlights to show up on it, lit per pixel two triangles a side are enough
+    (room_slices, wall_slices) = (ROOM_SLICES_PER_PIXEL, ROOM_SLICES_PER_PIXEL) if pixel_lighting.enabled else (ROOM_SLICES, WALL_SLICES)
+    if culling.box_visible("floor", *object_bounds["floor"]):
+        with profiler.scope("floor"):
+            render_queue.bake(("floor", room_slices), draw_floor, 0, 0, 0, 80, 80, *room_slices)
+    with profiler.scope("walls"):
+        render_queue.bake(("walls", wall_slices), draw_walls, 0, 0, 0, 80, 40, *wall_slices)
+    if culling.box_visible("ceiling", *object_bounds["ceiling"]):
+        with profiler.scope("ceiling"):
+            render_queue.bake(("ceiling", room_slices), draw_ceiling, 0, 40, 0, 80, 80, *room_slices)
+    if culling.box_visible("side table", *object_bounds["side table"]):
+        with profiler.scope("side table"):
+            render_queue.bake("side table", draw_side_table, -35, 0, -34)
+    if culling.box_visible("desk lamp", *object_bounds["desk lamp"]):
+        with profiler.scope("desk lamp"):
+            render_queue.bake("desk lamp", draw_desk_lamp, -32, 8.5, -36)
+    if culling.box_visible("dice", *object_bounds["dice"]):
+        with profiler.scope("dice"):
+            draw_dice(-37, 9, -34)
+    if culling.sphere_visible("hanging lamp", 0, 40, 0, HANGING_LAMP_REACH):
+        with profiler.scope("hanging lamp"):
+            draw_hanging_spotlight(0, 40, 0)
+    pool_table_visible = culling.box_visible("pool table", *object_bounds["pool table"])
+    if pool_table_visible:
+        with profiler.scope("pool table"):
+            # the pockets get rounder up close, each level has its own display list
+            pocket_segments = detail.segments(table_x, 8.75, table_z, 1.5, POCKET_LEVELS)
+            render_queue.bake(("pool table", pocket_segments), draw_pool_table, table_x, 4, table_z, 2 * math.pi / pocket_segments)
+    # the painting has one version for each state of the lights
+    if culling.box_visible("painting", *object_bounds["painting"]):
+        with profiler.scope("painting"):
+            painting_visible = is_painting_visible()
+            render_queue.bake(("painting", painting_visible), draw_wall_painting, 0, 20, -39.5, 15, 15, painting_visible)
+    with profiler.scope("render queue"):
+        render_queue.flush()
+    # the balls are drawn in batches with a region of the atlas for each ball, so they set their own state
+    if pool_table_visible:
+        with profiler.scope("balls"):
+            draw_balls()
+            if ball_game_active:
+                draw_ball_game_indicator()
     glPopMatrix()
     
 #=======================================
@@ -981,196 +1117,154 @@ def draw_objects():
 
 # draws the floor using a textured plane
 def draw_floor(center_x, y, center_z, x_dim, z_dim, x_slices, z_slices):
-    set_floor_material(GL_FRONT)
+    render_queue.use_material(FLOOR_MATERIAL, GL_FRONT)
     
-    glPushMatrix()
-    glTranslatef(center_x - x_dim / 2, y, center_z + z_dim / 2)
-    glRotatef(-90, 1, 0, 0)
+    render_queue.push_matrix()
+    render_queue.translate(center_x - x_dim / 2, y, center_z + z_dim / 2)
+    render_queue.rotate(-90, 1, 0, 0)
     draw_textured_plane(x_dim, z_dim, x_slices, z_slices, floor_texture)
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 # draws a square room using textured planes
 def draw_walls(center_x, y, center_z, length, height, l_slices, h_slices):
-    set_wall_material(GL_FRONT)  
+    render_queue.use_material(WALL_MATERIAL, GL_FRONT)
 
     # Draw side 1 backward-facing wall on xy-plane (opposite player)
-    glPushMatrix()
-    glTranslatef(center_x - length / 2, y, center_z - length / 2)    
+    render_queue.push_matrix()
+    render_queue.translate(center_x - length / 2, y, center_z - length / 2)    
     draw_textured_plane(length, height, l_slices, h_slices, wall_texture)
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # Draw side 2 forward-facing wall on xy-plane (behind player)
-    glPushMatrix()
-    glRotate(180, 0, 1, 0)
-    glTranslatef(center_x - length / 2, y, center_z - length / 2)
+    render_queue.push_matrix()
+    render_queue.rotate(180, 0, 1, 0)
+    render_queue.translate(center_x - length / 2, y, center_z - length / 2)
     draw_textured_plane(length, height, l_slices, h_slices, wall_texture)
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check   
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # Draw side 3 right-facing wall on yz-plane (left of player)
-    glPushMatrix()
-    glRotate(90, 0, 1, 0)
-    glTranslatef(center_z - length / 2, y, center_x - length / 2)
+    render_queue.push_matrix()
+    render_queue.rotate(90, 0, 1, 0)
+    render_queue.translate(center_z - length / 2, y, center_x - length / 2)
     draw_textured_plane(length, height, l_slices, h_slices, wall_texture) 
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check  
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # Draw side 4 left-facing wall on yz-plane (right of player)
-    glPushMatrix()
-    glRotate(270, 0, 1, 0)
-    glTranslatef(center_z - length / 2, y, center_x - length / 2)
+    render_queue.push_matrix()
+    render_queue.rotate(270, 0, 1, 0)
+    render_queue.translate(center_z - length / 2, y, center_x - length / 2)
     draw_textured_plane(length, height, l_slices, h_slices, wall_texture)  
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 # draws the ceiling using a textured plane facing down
 def draw_ceiling(center_x, y, center_z, x_dim, z_dim, x_slices, z_slices):
-    set_ceiling_material(GL_FRONT)
+    render_queue.use_material(CEILING_MATERIAL, GL_FRONT)
     
-    glPushMatrix()
-    glTranslatef(center_x - x_dim / 2, y, center_z - z_dim / 2)
-    glRotatef(90, 1, 0, 0)
+    render_queue.push_matrix()
+    render_queue.translate(center_x - x_dim / 2, y, center_z - z_dim / 2)
+    render_queue.rotate(90, 1, 0, 0)
     draw_textured_plane(x_dim, z_dim, x_slices, z_slices, ceiling_texture)
     # glTranslatef(0, 0, 1); gluSphere(ball, 0.25, 16, 16) # Normal check
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_table_top(width, length):
     thickness = 1
-    set_wood_support_material(GL_FRONT)
+    render_queue.use_material(WOOD_SUPPORT_MATERIAL, GL_FRONT)
     draw_rect(0, 0, 0, width, thickness, length, 5, 2, 5, table_top_texture, stretch=True)
 
 def draw_table_leg(height):
-    glPushMatrix()
+    render_queue.push_matrix()
     
-    set_wood_support_material(GL_FRONT)
-
-    glEnable(GL_TEXTURE_2D)
-    glBindTexture(GL_TEXTURE_2D, table_support_texture)
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    render_queue.use_material(WOOD_SUPPORT_MATERIAL, GL_FRONT)
     
-    glRotatef(-90, 1, 0, 0)
+    render_queue.rotate(-90, 1, 0, 0)
     radius = 0.4
-    gluCylinder(tube, radius, radius, height, 32, 4)  
+    render_queue.submit(table_leg_texture, gluCylinder, tube, radius, radius, height, 32, 4)
     
-    glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
 def draw_side_table(x, y, z):
-    glPushMatrix()
-    glTranslatef(x, y, z)    
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)    
     height = 8
     width = 8 
     length = 6
     
-    glPushMatrix()
-    glTranslatef(-width/2 + 1, 0, -length/2 + 1)
+    render_queue.push_matrix()
+    render_queue.translate(-width/2 + 1, 0, -length/2 + 1)
     draw_table_leg(height)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
-    glPushMatrix()
-    glTranslatef(width/2 - 1, 0, -length/2 + 1)
+    render_queue.push_matrix()
+    render_queue.translate(width/2 - 1, 0, -length/2 + 1)
     draw_table_leg(height)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
-    glPushMatrix()
-    glTranslatef(-width/2 + 1, 0, length/2 - 1)
+    render_queue.push_matrix()
+    render_queue.translate(-width/2 + 1, 0, length/2 - 1)
     draw_table_leg(height)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
-    glPushMatrix()
-    glTranslatef(width/2 - 1, 0, length/2 - 1)
+    render_queue.push_matrix()
+    render_queue.translate(width/2 - 1, 0, length/2 - 1)
     draw_table_leg(height)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
-    glPushMatrix()
-    glTranslatef(0, height, 0)
+    render_queue.push_matrix()
+    render_queue.translate(0, height, 0)
     draw_table_top(width, length)
-    glPopMatrix()
+    render_queue.pop_matrix()
     
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_lamp_base(radius):
-    glPushMatrix()
-    
-    set_desk_lamp_material(GL_FRONT)
+    render_queue.push_matrix()
     
-    glBindTexture(GL_TEXTURE_2D, lamp_support_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    
-    glEnable(GL_TEXTURE_2D)
+    render_queue.use_material(DESK_LAMP_MATERIAL, GL_FRONT)
 
-    glRotatef(-90, 1, 0, 0)
+    render_queue.rotate(-90, 1, 0, 0)
     base_height = 0.1 
-    gluCylinder(tube, radius, radius, base_height, 32, 1)
-    glRotatef(180, 1, 0, 0)
-    gluDisk(disk, 0, radius, 32, 2)  
-    glRotatef(-180, 1, 0, 0)
-    glTranslatef(0, 0, base_height)
-    gluDisk(disk, 0, radius, 32, 2)
+    render_queue.submit(lamp_support_texture, gluCylinder, tube, radius, radius, base_height, 32, 1)
+    render_queue.rotate(180, 1, 0, 0)
+    render_queue.submit(lamp_support_texture, gluDisk, disk, 0, radius, 32, 2)
+    render_queue.rotate(-180, 1, 0, 0)
+    render_queue.translate(0, 0, base_height)
+    render_queue.submit(lamp_support_texture, gluDisk, disk, 0, radius, 32, 2)
     
-    glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_lamp_pole(height, radius):
-    glPushMatrix()
-    
-    set_desk_lamp_material(GL_FRONT)
-
-    glBindTexture(GL_TEXTURE_2D, lamp_support_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.push_matrix()
     
-    glEnable(GL_TEXTURE_2D)
+    render_queue.use_material(DESK_LAMP_MATERIAL, GL_FRONT)
 
-    glRotatef(-90, 1, 0, 0)
-    gluCylinder(tube, radius, radius, height, 16, 2)
+    render_queue.rotate(-90, 1, 0, 0)
+    render_queue.submit(lamp_support_texture, gluCylinder, tube, radius, radius, height, 16, 2)
     
-    glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_lamp_head(radius, height):
-    glPushMatrix()
-    
-    set_desk_lamp_material(GL_FRONT)
+    render_queue.push_matrix()
     
-    glBindTexture(GL_TEXTURE_2D, lamp_head_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(DESK_LAMP_MATERIAL, GL_FRONT)
+
+    render_queue.rotate(90, 1, 0, 0)
+    render_queue.submit(lamp_head_texture, gluCylinder, tube, radius, radius, height, 32, 2)
+    render_queue.rotate(180, 1, 0, 0)
+    render_queue.submit(lamp_head_texture, gluDisk, disk, 0, radius, 32, 2)
+    render_queue.rotate(-180, 1, 0, 0)
+    render_queue.translate(0, 0, height)
     
-    glEnable(GL_TEXTURE_2D)
-
-    glRotatef(90, 1, 0, 0)
-    gluCylinder(tube, radius, radius, height, 32, 2)
-    glRotatef(180, 1, 0, 0)
-    gluDisk(disk, 0, radius, 32, 2)
-    glRotatef(-180, 1, 0, 0)
-    glTranslatef(0, 0, height)
-    
-    glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_desk_lamp(x, y, z):
-    glPushMatrix()
-    glTranslatef(x, y, z)
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)
     base_radius = 0.8
     draw_lamp_base(base_radius)
 
@@ -1179,143 +1273,139 @@ def draw_desk_lamp(x, y, z):
     draw_lamp_pole(pole_height, pole_radius)
     
     
-    glTranslatef(0, pole_height, 0)
+    render_queue.translate(0, pole_height, 0)
     head_radius = 1.2
     head_height = 1.6
     draw_lamp_head(head_radius, head_height)
     
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_single_dice(x, y, z, size, rotations=[0,0,0]):
-    glPushMatrix()
-    glTranslatef(x, y, z)   
-    glRotatef(rotations[0], 1, 0, 0)
-    glRotatef(rotations[1], 0, 1, 0)
-    glRotatef(rotations[2], 0, 0, 1) 
-    
-    glBindTexture(GL_TEXTURE_2D, dice_texture_1)
-
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-
-    set_dice_material(GL_FRONT)
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)   
+    render_queue.rotate(rotations[0], 1, 0, 0)
+    render_queue.rotate(rotations[1], 0, 1, 0)
+    render_queue.rotate(rotations[2], 0, 0, 1) 
+    # the die is the same every time, only where it is changes
+    render_queue.bake(("die", size), draw_dice_sides, size)
+    render_queue.pop_matrix()
+
+# draws the sides of a die centered on the origin
+def draw_dice_sides(size):
+    # all six sides are in the dice atlas, so they all share one texture
+    render_queue.use_material(DICE_MATERIAL, GL_FRONT)
     
     # Draw side 1 (+z)
-    glPushMatrix()
-    glTranslate(-size/2, -size/2, size/2)
-    draw_textured_plane(size, size, 5, 5, dice_texture_1)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(-size/2, -size/2, size/2)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[1])
+    render_queue.pop_matrix()
 
     # Draw side 2 (-z)
-    glPushMatrix()
-    glTranslate(size/2, -size/2, -size/2)
-    glRotated(180, 0, 1, 0)
-    draw_textured_plane(size, size, 5, 5, dice_texture_6)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(size/2, -size/2, -size/2)
+    render_queue.rotate(180, 0, 1, 0)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[6])
+    render_queue.pop_matrix()
 
     # Draw side 3 (-x)
-    glPushMatrix()
-    glTranslate(-size/2, -size/2, -size/2)
-    glRotatef(-90, 0, 1, 0)
-    draw_textured_plane(size, size, 5, 5, dice_texture_5)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(-size/2, -size/2, -size/2)
+    render_queue.rotate(-90, 0, 1, 0)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[5])
+    render_queue.pop_matrix()
 
     # Draw side 4 (+x)
-    glPushMatrix()
-    glTranslatef(size/2, -size/2, size/2)
-    glRotatef(90, 0, 1, 0)
-    draw_textured_plane(size, size, 5, 5, dice_texture_2)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(size/2, -size/2, size/2)
+    render_queue.rotate(90, 0, 1, 0)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[2])
+    render_queue.pop_matrix()
 
     # Draw side 5 (-y)
-    glPushMatrix()
-    glTranslatef(-size/2, -size/2, -size/2)
-    glRotatef(90, 1, 0, 0)
-    draw_textured_plane(size, size, 5, 5, dice_texture_4)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(-size/2, -size/2, -size/2)
+    render_queue.rotate(90, 1, 0, 0)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[4])
+    render_queue.pop_matrix()
 
     # Draw side 6 (+y)
-    glPushMatrix()
-    glTranslatef(-size/2, size/2, size/2)
-    glRotatef(-90, 1, 0, 0)
-    draw_textured_plane(size, size, 5, 5, dice_texture_3)
-    glPopMatrix()
-
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.translate(-size/2, size/2, size/2)
+    render_queue.rotate(-90, 1, 0, 0)
+    draw_textured_plane(size, size, 5, 5, dice_atlas.texture, region=dice_atlas[3])
+    render_queue.pop_matrix()
 
 def draw_dice(x, y, z):
     draw_single_dice(x, y, z, 0.5, dice_rotation)
     draw_single_dice(x + 1.2, y, z + 0.2, 0.5, dice_rotation2)
 
-def draw_pool_table(x, y, z):
+# rim_step is the angle between points around the pockets
+def draw_pool_table(x, y, z, rim_step=math.pi / 16):
     # corners (3 x 2 x 3) # floor should be at midpoint level, hole extends down
 
-    glPushMatrix()
-    glTranslatef(x, y, z)
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)
 
     # top left
-    glPushMatrix()
-    glRotatef(-90, 0, 1, 0)
-    draw_corner(-3.5, 4.75, 8)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.rotate(-90, 0, 1, 0)
+    draw_corner(-3.5, 4.75, 8, rim_step)
+    render_queue.pop_matrix()
     
     # top right
-    glPushMatrix()
-    glRotatef(180, 0, 1, 0)
-    draw_corner(-8, 4.75, 3.5)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.rotate(180, 0, 1, 0)
+    draw_corner(-8, 4.75, 3.5, rim_step)
+    render_queue.pop_matrix()
 
     # bottom left
-    glPushMatrix()
-    draw_corner(-8, 4.75, 3.5)
-    glPopMatrix()
+    render_queue.push_matrix()
+    draw_corner(-8, 4.75, 3.5, rim_step)
+    render_queue.pop_matrix()
 
     # bottom right
-    glPushMatrix()
-    glRotatef(90, 0, 1, 0)
-    draw_corner(-3.5, 4.75, 8)
-    glPopMatrix()
+    render_queue.push_matrix()
+    render_queue.rotate(90, 0, 1, 0)
+    draw_corner(-3.5, 4.75, 8, rim_step)
+    render_queue.pop_matrix()
 
     # middles (3 x 2 x 3) # floor should be at midpoint level, hole extends down
 
-    glPushMatrix()
-    draw_middle_hole(0, 4.75, 3.5)
-    glRotatef(180, 0, 1, 0)
-    draw_middle_hole(0, 4.75, 3.5)
-    glPopMatrix()
+    render_queue.push_matrix()
+    draw_middle_hole(0, 4.75, 3.5, rim_step)
+    render_queue.rotate(180, 0, 1, 0)
+    draw_middle_hole(0, 4.75, 3.5, rim_step)
+    render_queue.pop_matrix()
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # x-aligned wood segments (5 x 1.5 x 1.5)
-    set_pool_wood_material(GL_FRONT)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT)
     draw_rect(x - 4, y + 4.75, z - 4.25, 5, 1.5, 1.5, 10, 4, 3, pool_wood_texture, False)
     draw_rect(x + 4, y + 4.75, z - 4.25, 5, 1.5, 1.5, 10, 4, 3, pool_wood_texture, False)
     draw_rect(x - 4, y + 4.75, z + 4.25, 5, 1.5, 1.5, 10, 4, 3, pool_wood_texture, False)
     draw_rect(x + 4, y + 4.75, z + 4.25, 5, 1.5, 1.5, 10, 4, 3, pool_wood_texture, False)
 
     # x-aligned felt segments (5 x 1.5 x 0.5)
-    set_felt_material(GL_FRONT)
+    render_queue.use_material(FELT_MATERIAL, GL_FRONT)
     draw_rect(x - 4, y + 4.75, z - 3.25, 5, 1.5, 0.5, 10, 4, 1, felt_texture, False)
     draw_rect(x + 4, y + 4.75, z - 3.25, 5, 1.5, 0.5, 10, 4, 1, felt_texture, False)
     draw_rect(x - 4, y + 4.75, z + 3.25, 5, 1.5, 0.5, 10, 4, 1, felt_texture, False)
     draw_rect(x + 4, y + 4.75, z + 3.25, 5, 1.5, 0.5, 10, 4, 1, felt_texture, False)
 
     # z-aligned wood segments (1.5 x 1.5 x 4)
-    set_pool_wood_material(GL_FRONT)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT)
     draw_rect(x - 8.75, y + 4.75, z, 1.5, 1.5, 4, 3, 4, 8, pool_wood_texture, False)
     draw_rect(x + 8.75, y + 4.75, z, 1.5, 1.5, 4, 3, 4, 8, pool_wood_texture, False)
 
     # z-aligned felt segments (0.5 x 1.5 x 4)
-    set_felt_material(GL_FRONT)
+    render_queue.use_material(FELT_MATERIAL, GL_FRONT)
     draw_rect(x - 7.75, y + 4.75, z, 0.5, 1.5, 4, 3, 4, 8, felt_texture, False)
     draw_rect(x + 7.75, y + 4.75, z, 0.5, 1.5, 4, 3, 4, 8, felt_texture, False)
 
     # felt play area (15 x 1 x 6) minus corners
-    set_felt_material(GL_FRONT)
+    render_queue.use_material(FELT_MATERIAL, GL_FRONT)
     draw_rect(x, y + 4.5, z, 13, 1, 4, 26, 2, 8, felt_texture, False) # big center
 
     draw_rect(x - 4, y + 4.5, z - 2.5, 5, 1, 1, 10, 1, 2, felt_texture, False)
@@ -1327,70 +1417,39 @@ def draw_pool_table(x, y, z):
     draw_rect(x + 7, y + 4.5, z, 1, 1, 4, 2, 2, 8, felt_texture, False)
 
     # wood bottom middle (19 x 1 x 10)
-    set_pool_wood_material(GL_FRONT)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT)
     draw_rect(x, y + 3.5, z, 19, 1, 10, 38, 2, 20, pool_wood_texture, False)
 
     # wood legs (3 x 7 x 3)
-    set_pool_wood_material(GL_FRONT)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT)
     draw_rect(x - 6, y - 0.5, z - 2.5, 3, 7, 3, 6, 14, 6, pool_wood_texture, False)
     draw_rect(x + 6, y - 0.5, z - 2.5, 3, 7, 3, 6, 14, 6, pool_wood_texture, False)
     draw_rect(x - 6, y - 0.5, z + 2.5, 3, 7, 3, 6, 14, 6, pool_wood_texture, False)
     draw_rect(x + 6, y - 0.5, z + 2.5, 3, 7, 3, 6, 14, 6, pool_wood_texture, False)
 
-def draw_textured_plane(x_size, y_size, x_slices, y_slices, texture, stretch=True):
+def draw_textured_plane(x_size, y_size, x_slices, y_slices, texture, stretch=True, region=None):
     """ Draw a textured plane of the specified dimensions on the xy-plane.
         The plane is a unit square with lower left corner at origin.
+        The grid is built once per shape and kept in a buffer (see meshes.py).
+        With region, texture is an atlas and only that part of it is used (see atlas.py).
+        The plane is submitted to the render queue with its current material.
     """
-    glBindTexture(GL_TEXTURE_2D, texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    # Center the plane on the origin in x-direction
-    # Lower corner = (sx, sy) and upper corner = (ex, ey)
-    dx = x_size/x_slices # Change in x direction
-    dy = y_size/y_slices  # Change in y direction
+    render_queue.submit(texture, draw_plane, x_size, y_size, x_slices, y_slices, stretch, region)
 
+# the geometry of draw_textured_plane, drawn by the render queue once the texture is bound
+def draw_plane(x_size, y_size, x_slices, y_slices, stretch=True, region=None):
+    meshes.plane(x_size, y_size, x_slices, y_slices, stretch, region).draw()
+    # the current normal is left undefined by the normal array, later immediate mode shapes expect it facing +z
     glNormal3f(0, 0, 1)
-    y = 0
-    for j in range(y_slices):
-        glBegin(GL_TRIANGLE_STRIP)
-        cx = 0
-        for i in range(x_slices):
-            if stretch:
-                glTexCoord2f(cx/x_size, (y+dy)/y_size)
-            else:
-                glTexCoord2f(cx, (y+dy))
-            glVertex3f(cx, y+dy, 0)
-            if stretch:
-                glTexCoord2f(cx/x_size, y/y_size)
-            else:
-                glTexCoord2f(cx, y)
-            glVertex3f(cx, y, 0)
-            cx += dx
-        if stretch:
-            glTexCoord2f(1, (y+dy)/y_size)
-        else:
-            glTexCoord2f(x_size, (y+dy))
-        glVertex3f(x_size, y+dy, 0)
-        if stretch:
-            glTexCoord2f(1, y/y_size)
-        else:
-            glTexCoord2f(x_size, y)
-        glVertex3f(x_size, y, 0)
-        glEnd()
-        y += dy
-   
-    glDisable(GL_TEXTURE_2D)
 
 def draw_rect(x, y, z, x_size, y_size, z_size, x_slices, y_slices, z_slices, texture_name, stretch=True):
-    """ Draw a rectangle centered around (x, y, z) with size (x_size, y_size, z_size)."""  
+    """ Draw a rectangle centered around (x, y, z) with size (x_size, y_size, z_size).
+        The whole rectangle is one item in the render queue, with the current material.
+    """
+    render_queue.submit(texture_name, draw_box, x, y, z, x_size, y_size, z_size, x_slices, y_slices, z_slices, stretch)
+
+# the geometry of draw_rect, drawn by the render queue once the texture is bound
+def draw_box(x, y, z, x_size, y_size, z_size, x_slices, y_slices, z_slices, stretch=True):
     # move to cube location
     glPushMatrix()
     glTranslate(x, y, z)  
@@ -1398,58 +1457,51 @@ def draw_rect(x, y, z, x_size, y_size, z_size, x_slices, y_slices, z_slices, tex
     # Draw side 1 (+z)
     glPushMatrix()
     glTranslate(-x_size/2, -y_size/2, z_size/2)
-    draw_textured_plane(x_size, y_size, x_slices, y_slices, texture_name, stretch)
+    draw_plane(x_size, y_size, x_slices, y_slices, stretch)
     glPopMatrix()
 
     # Draw side 2 (-z)
     glPushMatrix()
     glTranslate(x_size/2, -y_size/2, -z_size/2)
     glRotated(180, 0, 1, 0)
-    draw_textured_plane(x_size, y_size, x_slices, y_slices, texture_name, stretch)
+    draw_plane(x_size, y_size, x_slices, y_slices, stretch)
     glPopMatrix()
 
     # Draw side 3 (-x)
     glPushMatrix()
     glTranslate(-x_size/2, -y_size/2, -z_size/2)
     glRotatef(-90, 0, 1, 0)
-    draw_textured_plane(z_size, y_size, z_slices, y_slices, texture_name, stretch)
+    draw_plane(z_size, y_size, z_slices, y_slices, stretch)
     glPopMatrix()
 
     # Draw side 4 (+x)
     glPushMatrix()
     glTranslatef(x_size/2, -y_size/2, z_size/2)
     glRotatef(90, 0, 1, 0)
-    draw_textured_plane(z_size, y_size, z_slices, y_slices, texture_name, stretch)
+    draw_plane(z_size, y_size, z_slices, y_slices, stretch)
     glPopMatrix()
 
     # Draw side 5 (-y)
     glPushMatrix()
     glTranslatef(-x_size/2, -y_size/2, -z_size/2)
     glRotatef(90, 1, 0, 0)
-    draw_textured_plane(x_size, z_size, x_slices, z_slices, texture_name, stretch)
+    draw_plane(x_size, z_size, x_slices, z_slices, stretch)
     glPopMatrix()
 
     # Draw side 6 (+y)
     glPushMatrix()
     glTranslatef(-x_size/2, y_size/2, z_size/2)
     glRotatef(-90, 1, 0, 0)
-    draw_textured_plane(x_size, z_size, x_slices, z_slices, texture_name, stretch)
+    draw_plane(x_size, z_size, x_slices, z_slices, stretch)
     glPopMatrix()
 
     # return
     glPopMatrix()
 
 def draw_hole_insides(start_angle, end_angle, turn_amount, height):
-    glPushMatrix()
+    render_queue.push_matrix()
 
-    set_pocket_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, pocket_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(POCKET_MATERIAL, GL_FRONT_AND_BACK)
 
     dtheta = turn_amount
     theta = start_angle
@@ -1467,38 +1519,28 @@ def draw_hole_insides(start_angle, end_angle, turn_amount, height):
         # draw the panel
         size = math.sqrt((curr[0] - prev[0])**2 + (curr[1] - prev[1])**2)
 
-        glPushMatrix()
-        glTranslate(prev[0], -0.75, prev[1])
-        glRotatef(-90, 0, 1, 0)
-        glRotatef(math.degrees(((math.pi / 2) - (turn_amount / 2) + theta)), 0, 1, 0)
+        render_queue.push_matrix()
+        render_queue.translate(prev[0], -0.75, prev[1])
+        render_queue.rotate(-90, 0, 1, 0)
+        render_queue.rotate(math.degrees(((math.pi / 2) - (turn_amount / 2) + theta)), 0, 1, 0)
         draw_textured_plane(size, height, 3, 3, felt_texture)
-        glPopMatrix()
+        render_queue.pop_matrix()
 
         prev = (vx, vz)
 
-    glPushMatrix()
-    glTranslatef(-1.25, -0.5, -1.25)
-    glRotatef(90, 1, 0, 0)
+    render_queue.push_matrix()
+    render_queue.translate(-1.25, -0.5, -1.25)
+    render_queue.rotate(90, 1, 0, 0)
     draw_textured_plane(2.5, 2.5, 5, 5, pocket_texture, False)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 # for drawing L-shaped rounded planes with upwards-facing normals
 # only use on quadrantal angles
-def draw_quarter_rim(start_angle, end_angle, turn_amount, corner_x, corner_z, entry_x, entry_z, exit_x, exit_z):
-    glPushMatrix() 
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    glNormal3f(0, -1, 0)
-
-    glBegin(GL_TRIANGLE_FAN)
-    glTexCoord2f(corner_x, corner_z)
-    glVertex3f(corner_x, 0, corner_z)
-    glTexCoord2f(entry_x, entry_z)
-    glVertex3f(entry_x, 0, entry_z)
+# submitted to the render queue with texture and the current material
+def draw_quarter_rim(texture, start_angle, end_angle, turn_amount, corner_x, corner_z, entry_x, entry_z, exit_x, exit_z):
+    points = [(corner_x, 0, corner_z), (entry_x, 0, entry_z)]
 
     dtheta = turn_amount
     theta = start_angle
@@ -1507,8 +1549,7 @@ def draw_quarter_rim(start_angle, end_angle, turn_amount, corner_x, corner_z, en
         vx = math.sin(theta)
         vz = math.cos(theta)
 
-        glTexCoord2f(vx, vz)
-        glVertex3f(vx, 0, vz) # point on circle
+        points.append((vx, 0, vz)) # point on circle
 
         theta += dtheta
 
@@ -1516,486 +1557,260 @@ def draw_quarter_rim(start_angle, end_angle, turn_amount, corner_x, corner_z, en
     vx = math.sin(theta)
     vz = math.cos(theta)
 
-    glTexCoord2f(vx, vz)
-    glVertex3f(vx, 0, vz) # last point on circle
-
-    glTexCoord2f(exit_x, exit_z)
-    glVertex3f(exit_x, 0, exit_z)
+    points.append((vx, 0, vz)) # last point on circle
+    points.append((exit_x, 0, exit_z))
 
-    glEnd()
+    # the texture is laid flat across the rim
+    render_queue.submit(texture, draw_fan, (0, -1, 0), [(x, z, x, y, z) for (x, y, z) in points])
 
-    glDisable(GL_TEXTURE_2D)
+# draws one flat triangle fan, from (s, t, x, y, z) points (texture coordinate and vertex)
+def draw_fan(normal, points):
+    glNormal3f(*normal)
 
-    glPopMatrix()
+    glBegin(GL_TRIANGLE_FAN)
+    for (s, t, x, y, z) in points:
+        glTexCoord2f(s, t)
+        glVertex3f(x, y, z)
+    glEnd()
 
-def draw_corner(x, y, z):
+def draw_corner(x, y, z, rim_step=math.pi / 16):
     # note: faces that would be otherwise fully included in the structure are not drawn
     # this includes stuff like the seam between the felt and wood, and so on
 
-    glPushMatrix()
-    glTranslate(x, y, z) 
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z) 
 
     # wood section
-    set_pool_wood_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, pool_wood_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT_AND_BACK)
 
     # wood corner walls
 
     # back
-    glPushMatrix()
-    glTranslate(-1.5, -0.75, 1.5)
+    render_queue.push_matrix()
+    render_queue.translate(-1.5, -0.75, 1.5)
     draw_textured_plane(3, 1.5, 6, 4, pool_wood_texture, False)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # side
-    glPushMatrix()
-    glTranslate(-1.5, -0.75, -1.5)
-    glRotatef(-90, 0, 1, 0)
+    render_queue.push_matrix()
+    render_queue.translate(-1.5, -0.75, -1.5)
+    render_queue.rotate(-90, 0, 1, 0)
     draw_textured_plane(3, 1.5, 6, 4, pool_wood_texture, False)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # wood corner top
-    glPushMatrix()
+    render_queue.push_matrix()
 
-    glTranslatef(0, 0.75, 0)
+    render_queue.translate(0, 0.75, 0)
 
-    draw_quarter_rim(math.pi, 3 * math.pi / 2, math.pi / 16, -1.5, -1.5, 0, -1.5, -1.5, 0) # top left
-    draw_quarter_rim(3 * math.pi / 2, 2 * math.pi, math.pi / 16, -1.5, 1.5, -1.5, 0, 0, 1.5) # bottom left
-    draw_quarter_rim(0, math.pi / 2, math.pi / 16, 1.5, 1.5, 0, 1.5, 1.5, 0) # bottom right
+    draw_quarter_rim(pool_wood_texture, math.pi, 3 * math.pi / 2, rim_step, -1.5, -1.5, 0, -1.5, -1.5, 0) # top left
+    draw_quarter_rim(pool_wood_texture, 3 * math.pi / 2, 2 * math.pi, rim_step, -1.5, 1.5, -1.5, 0, 0, 1.5) # bottom left
+    draw_quarter_rim(pool_wood_texture, 0, math.pi / 2, rim_step, 1.5, 1.5, 0, 1.5, 1.5, 0) # bottom right
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # felt section
-    set_felt_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, felt_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(FELT_MATERIAL, GL_FRONT_AND_BACK)
 
     # slope in on top
-    glPushMatrix()
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    glNormal3f(0.5, 0, 0.5)
-
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(0, 0)
-    glVertex3f(0, 0, -1)
-
-    glTexCoord2f(0, 1)
-    glVertex3f(0, 0.75, -1)
-
-    glTexCoord2f(1, 1)
-    glVertex3f(0.5, 0.75, -1.5)
-
-    glTexCoord2f(1, 0)
-    glVertex3f(0.5, 0, -1.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0.5, 0, 0.5), [(0, 0, 0, 0, -1), (0, 1, 0, 0.75, -1), (1, 1, 0.5, 0.75, -1.5), (1, 0, 0.5, 0, -1.5)])
 
     # top of top
-    glPushMatrix()
-
-    glNormal3f(0, 1, 0)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(0, -1)
-    glVertex3f(0, 0.75, -1)
-
-    glTexCoord2f(0, -1.5)
-    glVertex3f(0, 0.75, -1.5)
-
-    glTexCoord2f(0.5, -1.5)
-    glVertex3f(0.5, 0.75, -1.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0, 1, 0), [(0, -1, 0, 0.75, -1), (0, -1.5, 0, 0.75, -1.5), (0.5, -1.5, 0.5, 0.75, -1.5)])
 
     # right
-    glPushMatrix()
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glNormal3f(0.5, 0, -0.5)
-
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(0, 0)
-    glVertex3f(1, 0, 0)
-
-    glTexCoord2f(0, 1)
-    glVertex3f(1, 0.75, 0)
-
-    glTexCoord2f(1, 1)
-    glVertex3f(1.5, 0.75, -0.5)
-
-    glTexCoord2f(1, 0)
-    glVertex3f(1.5, 0, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0.5, 0, -0.5), [(0, 0, 1, 0, 0), (0, 1, 1, 0.75, 0), (1, 1, 1.5, 0.75, -0.5), (1, 0, 1.5, 0, -0.5)])
 
     # top right
-
-    glPushMatrix()
-
-    glNormal3f(0, 1, 0)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(-1, 0)
-    glVertex3f(1, 0.75, 0)
-
-    glTexCoord2f(-1.5, 0)
-    glVertex3f(1.5, 0.75, 0)
-
-    glTexCoord2f(-1.5, -0.5)
-    glVertex3f(1.5, 0.75, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0, 1, 0), [(-1, 0, 1, 0.75, 0), (-1.5, 0, 1.5, 0.75, 0), (-1.5, -0.5, 1.5, 0.75, -0.5)])
 
     # felt entryway
-    glPushMatrix()
+    render_queue.push_matrix()
 
-    glTranslatef(0, 0.25, 0)
+    render_queue.translate(0, 0.25, 0)
 
-    draw_quarter_rim(math.pi / 2, math.pi, math.pi / 16, 1.5, -1.5, 1.5, 0, 0, -1.5) # top right
+    draw_quarter_rim(felt_texture, math.pi / 2, math.pi, rim_step, 1.5, -1.5, 1.5, 0, 0, -1.5) # top right
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # black section
 
     # black cylinder liner
-    draw_hole_insides(math.pi, 5 * math.pi / 2, math.pi / 16, 1.5) # outer
-    draw_hole_insides(math.pi / 2, math.pi, math.pi / 16, 1) # inner
+    draw_hole_insides(math.pi, 5 * math.pi / 2, rim_step, 1.5) # outer
+    draw_hole_insides(math.pi / 2, math.pi, rim_step, 1) # inner
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
-def draw_middle_hole(x, y, z):
-    glPushMatrix()
+def draw_middle_hole(x, y, z, rim_step=math.pi / 16):
+    render_queue.push_matrix()
 
-    glTranslatef(x, y, z)
+    render_queue.translate(x, y, z)
 
     # wood section
-    set_pool_wood_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, pool_wood_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(POOL_WOOD_MATERIAL, GL_FRONT_AND_BACK)
 
     # back wooden part entryway
-    glPushMatrix()
+    render_queue.push_matrix()
 
-    glTranslate(0, 0.75, 0) # offset center
+    render_queue.translate(0, 0.75, 0) # offset center
 
-    draw_quarter_rim(3 * math.pi / 2, 2 * math.pi, math.pi / 16, -1.5, 1.5, -1.5, 0, 0, 1.5) # left
-    draw_quarter_rim(0, math.pi / 2, math.pi / 16, 1.5, 1.5, 0, 1.5, 1.5, 0) # right
+    draw_quarter_rim(pool_wood_texture, 3 * math.pi / 2, 2 * math.pi, rim_step, -1.5, 1.5, -1.5, 0, 0, 1.5) # left
+    draw_quarter_rim(pool_wood_texture, 0, math.pi / 2, rim_step, 1.5, 1.5, 0, 1.5, 1.5, 0) # right
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # wooden back panel
-    glPushMatrix()
-    glTranslate(-1.5, -0.75, 1.5)
+    render_queue.push_matrix()
+    render_queue.translate(-1.5, -0.75, 1.5)
     draw_textured_plane(3, 1.5, 6, 4, pool_wood_texture, False)
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # felt section
-    set_felt_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, felt_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_NEAREST/GL_LINEAR
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(FELT_MATERIAL, GL_FRONT_AND_BACK)
 
     # slope in on left
-    glPushMatrix()
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glNormal3f(0.5, 0, -0.5)
-
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(0, 0)
-    glVertex3f(-1, 0, 0)
-
-    glTexCoord2f(0, 1)
-    glVertex3f(-1, 0.75, 0)
-
-    glTexCoord2f(1, 1)
-    glVertex3f(-1.5, 0.75, -0.5)
-
-    glTexCoord2f(1, 0)
-    glVertex3f(-1.5, 0, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0.5, 0, -0.5), [(0, 0, -1, 0, 0), (0, 1, -1, 0.75, 0), (1, 1, -1.5, 0.75, -0.5), (1, 0, -1.5, 0, -0.5)])
 
     # top left
-
-    glPushMatrix()
-
-    glNormal3f(0, 1, 0)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(1, 0)
-    glVertex3f(-1, 0.75, 0)
-
-    glTexCoord2f(1.5, 0)
-    glVertex3f(-1.5, 0.75, 0)
-
-    glTexCoord2f(1.5, -0.5)
-    glVertex3f(-1.5, 0.75, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0, 1, 0), [(1, 0, -1, 0.75, 0), (1.5, 0, -1.5, 0.75, 0), (1.5, -0.5, -1.5, 0.75, -0.5)])
 
     # felt entryway
-    glPushMatrix()
+    render_queue.push_matrix()
 
-    glTranslate(0, 0.25, 0) # offset center
+    render_queue.translate(0, 0.25, 0) # offset center
 
-    draw_quarter_rim(math.pi, 3 * math.pi / 2, math.pi / 16, -1.5, -1.5, 0, -1.5, -1.5, 0) # left
-    draw_quarter_rim(math.pi / 2, math.pi, math.pi / 16, 1.5, -1.5, 1.5, 0, 0, -1.5) # right
+    draw_quarter_rim(felt_texture, math.pi, 3 * math.pi / 2, rim_step, -1.5, -1.5, 0, -1.5, -1.5, 0) # left
+    draw_quarter_rim(felt_texture, math.pi / 2, math.pi, rim_step, 1.5, -1.5, 1.5, 0, 0, -1.5) # right
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # slope on right
-
-    glPushMatrix()
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glNormal3f(0.5, 0, -0.5)
-
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(0, 0)
-    glVertex3f(1, 0, 0)
-
-    glTexCoord2f(0, 1)
-    glVertex3f(1, 0.75, 0)
-
-    glTexCoord2f(1, 1)
-    glVertex3f(1.5, 0.75, -0.5)
-
-    glTexCoord2f(1, 0)
-    glVertex3f(1.5, 0, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0.5, 0, -0.5), [(0, 0, 1, 0, 0), (0, 1, 1, 0.75, 0), (1, 1, 1.5, 0.75, -0.5), (1, 0, 1.5, 0, -0.5)])
 
     # top right
-
-    glPushMatrix()
-
-    glNormal3f(0, 1, 0)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-    
-    glBegin(GL_TRIANGLE_FAN)
-
-    glTexCoord2f(-1, 0)
-    glVertex3f(1, 0.75, 0)
-
-    glTexCoord2f(-1.5, 0)
-    glVertex3f(1.5, 0.75, 0)
-
-    glTexCoord2f(-1.5, -0.5)
-    glVertex3f(1.5, 0.75, -0.5)
-
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+    render_queue.submit(felt_texture, draw_fan, (0, 1, 0), [(-1, 0, 1, 0.75, 0), (-1.5, 0, 1.5, 0.75, 0), (-1.5, -0.5, 1.5, 0.75, -0.5)])
 
     # black section
 
     # black cylinder liner
-    draw_hole_insides(math.pi / 2, 3 * math.pi / 2, math.pi / 16, 1) # inner
-    draw_hole_insides(3 * math.pi / 2, 5 * math.pi / 2, math.pi / 16, 1.5) # outer
-
-    glPopMatrix()
-
-def draw_billiard_ball(x, y, z, id, direction, x_distance, z_distance):
-    glPushMatrix()
-
-    texture = cue_ball_texture # temp, should not run
-
-    if id == 1:
-        texture = one_ball_texture
+    draw_hole_insides(math.pi / 2, 3 * math.pi / 2, rim_step, 1) # inner
+    draw_hole_insides(3 * math.pi / 2, 5 * math.pi / 2, rim_step, 1.5) # outer
+
+    render_queue.pop_matrix()
+
+# the texture for an object ball
+# name of the image in the ball atlas that a ball is drawn with
+def ball_image(id):
+    if id == 0:
+        return "cue"
+    elif id == 1:
+        return "one"
     elif id == 3:
-        texture = three_ball_texture
+        return "three"
     elif id == 8:
-        texture = eight_ball_texture
+        return "eight"
     elif id == 10:
-        texture = ten_ball_texture
+        return "ten"
     elif id == 14:
-        texture = fourteen_ball_texture
+        return "fourteen"
     elif id == 9:
-        texture = nine_ball_texture
+        return "nine"
     elif id == 13:
-        texture = thirteen_ball_texture
+        return "thirteen"
     elif id == 6:
-        texture = six_ball_texture
+        return "six"
     else:
-        texture = two_ball_texture
+        return "two"
 
-    set_ball_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) 
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-
-    glEnable(GL_TEXTURE_2D)
-
-    glTranslatef(x, y, z)
-    glPushMatrix()
-    
-    # reapplying all rotations previously done
-    glMatrixMode(GL_MODELVIEW)
-    glLoadMatrixf(ball_rotation_matrices[id])
-
-    # determine new rotation axis
-    rotation_axis = direction.cross(up_vector)
-    rotation_axis.normalize()
-
-    # determine distance traveled (pythagorean theorem)
-    distance = math.sqrt(x_distance ** 2 + z_distance ** 2)
-    angle_traveled = distance / 0.25 # using distance as arc length
-
-    # perform rotation
-    glRotatef(math.degrees(angle_traveled), rotation_axis.dx, rotation_axis.dy, rotation_axis.dz)
-
-    # update matrix
-    ball_rotation_matrices[id] = glGetFloatv(GL_MODELVIEW_MATRIX)
-
-    # restore translated matrix
-    glPopMatrix()
-    glMultMatrixf(ball_rotation_matrices[id])
-
-    gluSphere(ball, 0.25, 16, 16)
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
-
-def draw_cue_ball(x, y, z):
-    glPushMatrix()
-
-    set_cue_ball_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, cue_ball_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) 
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    glTranslatef(x, y, z)
-    gluSphere(ball, 0.25, 16, 16)
-
-    glDisable(GL_TEXTURE_2D)
-
-    glPopMatrix()
+def strike_cue_ball(angle, power):
+    if USE_EVENT_PHYSICS:
+        pool_events.strike(angle, power)
+    else:
+        pool.strike(angle, power)
+
+def start_shot_hint():
+    global shot_hint
+    if shot_hint is not None:
+        return
+    print(f'Searching {HINT_SHOTS} shots for a hint...')
+    # the search always uses the event simulator, stepping every frame is too slow for hundreds of shots
+    shot_hint = ShotSearch(pool)
+    shot_hint.start(random_shots(HINT_SHOTS))
+
+def check_shot_hint():
+    # aim at the best shot once the search finishes
+    global shot_hint, cue_ball_angle, cue_ball_power
+    if shot_hint is None or not shot_hint.ready():
+        return
+    best = shot_hint.results()[0]
+    shot_hint = None
+    cue_ball_angle = best.angle
+    cue_ball_power = best.power
+    print(f'Hint: {best}')
+
+def cancel_shot_hint():
+    global shot_hint
+    if shot_hint is not None:
+        shot_hint.cancel()
+        shot_hint = None
 
 def reset_balls():
-    global all_balls, won_pool
-    all_balls = []
+    global won_pool
     won_pool = False
-    all_balls.append(BilliardBall(0, table_x + -2, table_z + 0))        # cue
-    all_balls.append(BilliardBall(8, table_x + 2, table_z + 0))         # eight
-    all_balls.append(BilliardBall(1, table_x + 2.4, table_z + 0.2))     # one
-    all_balls.append(BilliardBall(3, table_x + 2.4, table_z + -0.2))    # three
-    all_balls.append(BilliardBall(10, table_x + 2.8, table_z + 0.4))    # ten
-    all_balls.append(BilliardBall(14, table_x + 2.8, table_z + -0.4))   # fourteen
-    all_balls.append(BilliardBall(9, table_x + 2.8, table_z))           # nine
-    all_balls.append(BilliardBall(13, table_x + 3.2, table_z + 0.2))    # thirteen
-    all_balls.append(BilliardBall(4, table_x + 3.2, table_z - 0.2))     # four
-    all_balls.append(BilliardBall(6, table_x + 3.2, table_z + 0.6))     # six
-    all_balls.append(BilliardBall(2, table_x + 3.2, table_z - 0.6))     # two
+    cancel_shot_hint()
+    pool.rack()
+    pool_events.reset()
 
 def draw_balls():
-    for ball in all_balls:
-        if ball.id == 0:
-            if not ball.sunk:
-                draw_cue_ball(ball.x, 9.25, ball.z)
-            else:
-                # TODO: check if all other balls stationary
-                ball.x = 0
-                ball.z = 0
-                ball.force = 0
-        else:
-            if not ball.sunk:
-                draw_billiard_ball(ball.x, 9.25, ball.z, ball.id, ball.force_direction, ball.distance_x, ball.distance_z) # TODO: rotation
+    # draw in between the last two steps so motion stays smooth when FPS and steps don't line up
+    xs, zs = pool.interpolated_positions(render_alpha)
+    rotations = pool.orientation_matrices(render_alpha)
+    positions = np.stack([xs, np.full(len(xs), 9.25), zs], axis=1)
+
+    cue_ball = pool.cue_ball()
+    if cue_ball.sunk:
+        # TODO: check if all other balls stationary
+        cue_ball.x = 0
+        cue_ball.z = 0
+        cue_ball.force = 0
+
+    # every ball is the same sphere and every ball texture is in the ball atlas,
+    #   so the balls of each material are drawn in one call (see meshes.py and atlas.py)
+    spheres = meshes.sphere_batch(0.25, 16, 16)
+    regions = np.array([ball_atlas[ball_image(id)].as_tuple() for id in pool.ids])
+    on_table = ~pool.sunk
+    cue_ball_drawn = on_table & (pool.ids == 0)
+    others_drawn = on_table & (pool.ids != 0)
+    textures.bind(ball_atlas.texture)
+    pixel_lighting.texturing(True)
+
+    materials.apply(CUE_BALL_MATERIAL, GL_FRONT_AND_BACK)
+    # the cue ball is drawn without its rolling rotation
+    spheres.draw(positions[cue_ball_drawn], regions=regions[cue_ball_drawn])
+
+    materials.apply(BALL_MATERIAL, GL_FRONT_AND_BACK)
+    spheres.draw(positions[others_drawn], rotations[others_drawn], regions=regions[others_drawn])
+
+    pixel_lighting.texturing(False)
 
 def draw_hanging_spotlight(x, y, z):
     # may need additional parameters for swinging
-    glPushMatrix()
-    glTranslatef(x, y, z)
-    glRotatef(math.degrees(light_angle), 0, 0, 1)
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)
+    # blend between the last two steps of the swing
+    drawn_angle = previous_light_angle + (light_angle - previous_light_angle) * render_alpha
+    render_queue.rotate(math.degrees(drawn_angle), 0, 0, 1)
+
+    # the lamp is rounder up close, each level has its own display list
+    shade_distance = light_pole_length + 2.5
+    slices = detail.segments(x + shade_distance * math.sin(drawn_angle), y - shade_distance * math.cos(drawn_angle), z, 5, HANGING_LAMP_LEVELS)
+    render_queue.bake(("hanging lamp", slices), draw_hanging_lamp, slices)
+
+    render_queue.pop_matrix()
+
+# draws the hanging lamp pole and shade, hanging down from the origin
+def draw_hanging_lamp(slices):
+    stacks = max(2, slices // 3)
 
     pole_radius = 0.25
     pole_height = light_pole_length
@@ -2004,71 +1819,35 @@ def draw_hanging_spotlight(x, y, z):
     lower_lamp_radius = 5
     lamp_height = 5
 
-    # prepare the texture for the hanging lamp pole
-    glBindTexture(GL_TEXTURE_2D, aluminum_light_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_LINEAR/GL_NEAREST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    render_queue.use_material(ALUMINUM_MATERIAL, GL_FRONT_AND_BACK)
 
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
+    render_queue.push_matrix()
 
     # drawing the hanging light pole
-    glTranslatef(0, -pole_height, 0)
-    glPushMatrix()
-    glTranslatef(0, 0.1, 0)
-    glRotatef(-90, 1, 0, 0)
-    set_aluminum_material(GL_FRONT_AND_BACK)
+    render_queue.translate(0, -pole_height, 0)
+    render_queue.push_matrix()
+    render_queue.translate(0, 0.1, 0)
+    render_queue.rotate(-90, 1, 0, 0)
     # parameters are: quadric, base radius, height radius, height, slices, stacks
-    gluCylinder(tube, pole_radius, pole_radius, pole_height, 30, 10)
-    glPopMatrix()
-
-    # Disabling texturing mode to switch texture
-    glDisable(GL_TEXTURE_2D)
-
-    # prepare the texture for the hanging lamp shade
-    glBindTexture(GL_TEXTURE_2D, aluminum_dark_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)           # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST) # try GL_LINEAR/GL_NEAREST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-
-    # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
+    render_queue.submit(aluminum_light_texture, gluCylinder, tube, pole_radius, pole_radius, pole_height, slices, stacks)
+    render_queue.pop_matrix()
 
     # draw a circle for the top of the lamp shade
     # parameters are: quadric, inner radius (imagine a donut), outer radius, slices, and rings
     # TODO: determine if this should be done manually
-    glRotatef(-90, 1, 0, 0)
-    set_aluminum_material(GL_FRONT_AND_BACK)
-    gluDisk(disk, 0, upper_lamp_radius, 30, 10)
-    glRotate(90, 1, 0, 0)
+    render_queue.rotate(-90, 1, 0, 0)
+    render_queue.submit(aluminum_dark_texture, gluDisk, disk, 0, upper_lamp_radius, slices, stacks)
+    render_queue.rotate(90, 1, 0, 0)
 
     # drawing the hanging light shade
-    glTranslatef(0, -lamp_height, 0)
-    glRotatef(-90, 1, 0, 0)
-    set_aluminum_material(GL_FRONT_AND_BACK)
-    gluCylinder(tube, lower_lamp_radius, upper_lamp_radius, lamp_height, 30, 10)
-    glRotatef(90, 1, 0, 0)
-
-    # Disabling texturing mode
-    glDisable(GL_TEXTURE_2D)
+    render_queue.translate(0, -lamp_height, 0)
+    render_queue.rotate(-90, 1, 0, 0)
+    render_queue.submit(aluminum_dark_texture, gluCylinder, tube, lower_lamp_radius, upper_lamp_radius, lamp_height, slices, stacks)
 
-    glPopMatrix()
-
-# TODO: implement disabling
-# draws a painting on the xy-plane based on the lighting
-def draw_wall_painting(x, y, z, width, height):
-    # move to corner to draw the painting canvas
-    glPushMatrix()
-    glTranslatef(x - (width / 2), (y - height / 2), z)
-    set_painting_material(GL_FRONT)
+    render_queue.pop_matrix()
 
+# the painting only shows when every light other than the flashlight is off
+def is_painting_visible():
     painting_visible = True
     for index, light in enumerate(lights):
         if index == 0:
@@ -2077,18 +1856,27 @@ def draw_wall_painting(x, y, z, width, height):
             painting_visible = False
         elif light.enabled:
             painting_visible = False       
-    
+    return painting_visible
+
+# TODO: implement disabling
+# draws a painting on the xy-plane based on the lighting
+def draw_wall_painting(x, y, z, width, height, painting_visible):
+    # move to corner to draw the painting canvas
+    render_queue.push_matrix()
+    render_queue.translate(x - (width / 2), (y - height / 2), z)
+    render_queue.use_material(PAINTING_MATERIAL, GL_FRONT)
+
     if (painting_visible):
         draw_textured_plane(width, height, 10, 10, library_painting_texture)
     else:
         draw_textured_plane(width, height, 10, 10, ceiling_texture)
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
     # move to center to draw the frame
-    glPushMatrix()
-    glTranslatef(x, y, z)
-    set_wood_support_material(GL_FRONT)
+    render_queue.push_matrix()
+    render_queue.translate(x, y, z)
+    render_queue.use_material(WOOD_SUPPORT_MATERIAL, GL_FRONT)
 
     frame_size = 1
 
@@ -2101,31 +1889,58 @@ def draw_wall_painting(x, y, z, width, height):
     # right side
     draw_rect(width/2 + frame_size/2, 0, 0, frame_size, width + 2 * frame_size, frame_size, 3, 10, 3, table_support_texture, False)
 
-    glPopMatrix()
+    render_queue.pop_matrix()
 
 def draw_ball_game_indicator():
     glPushMatrix()
     # move to cue ball position
-    glTranslatef(all_balls[0].x, 9.25, all_balls[0].z)
+    glTranslatef(pool.cue_ball().x, 9.25, pool.cue_ball().z)
     # rotate to cue ball angle
     glRotatef(90 + cue_ball_angle, 0, 1, 0)
     # move slightly forward
     glTranslatef(0, 0, 0.5)
 
-    set_cue_ball_material(GL_FRONT_AND_BACK)
-    glBindTexture(GL_TEXTURE_2D, cue_ball_texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE) 
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)           
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    materials.apply(CUE_BALL_MATERIAL, GL_FRONT_AND_BACK)
+    textures.bind(cue_ball_texture)
 
     # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
+    pixel_lighting.texturing(True)
     gluCylinder(tube, 0.05, 0.05, cue_ball_power * 0.25, 32, 2)  
+    pixel_lighting.texturing(False)
+    glPopMatrix()
+
+# draws the profiler's numbers over the top left of the scene
+#   the text is only rendered again every PROFILER_OVERLAY_REFRESH frames
+def draw_profiler_overlay():
+    global profiler_overlay
+    if profiler_overlay is None or profiler.frames % PROFILER_OVERLAY_REFRESH == 0:
+        font = pygame.font.SysFont("monospace", 14)
+        rows = profiler.report_rows()
+        line_height = font.get_linesize()
+        # names on the left, numbers lined up on the right of their columns
+        columns = [max(font.size(row[column])[0] for row in rows) for column in range(3)]
+        width = columns[0] + columns[1] + columns[2] + 40
+        height = line_height * len(rows) + 10
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        for (index, (name, average, last)) in enumerate(rows):
+            y = 5 + index * line_height
+            surface.blit(font.render(name, True, (255, 255, 255)), (5, y))
+            for (text, right) in ((average, columns[0] + columns[1] + 20), (last, width - 5)):
+                surface.blit(font.render(text, True, (255, 255, 255)), (right - font.size(text)[0], y))
+        # bottom row first, the way glDrawPixels wants it
+        profiler_overlay = (width, height, pygame.image.tostring(surface, "RGBA", True))
+
+    (width, height, pixels) = profiler_overlay
+    glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+    glDisable(GL_LIGHTING)
+    glDisable(GL_DEPTH_TEST)
     glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glWindowPos2i(10, max(window_dimensions[1] - 10 - height, 0))
+    glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+    glPopAttrib()
 
 # TODO: implement
 def print_help_message():
@@ -2145,6 +1960,7 @@ def print_help_message():
     print("  3 - Toggle blue overhead light")
     print("  4 - Toggle hanging spotlight (yellow)")
     print("  5 - Toggle desk lamp")
+    print("  L - Switch between per-pixel and fixed function lighting")
     
     print("\nInteraction Controls:")
     print("  G - Roll the dice")
@@ -2154,110 +1970,63 @@ def print_help_message():
     print("  Space      - Toggle aiming / fire when aiming")
     print("  Left/Right - Adjust angle")
     print("  Up/Down    - Increase/decrease power")
+    print("  B          - Aim at a hint from the shot search (while aiming)")
     print("  P          - Reset the pool minigame")
     
     print("\nSystem Controls:")
     print("  H - Show this help message")
+    print("  C - Show how many objects are outside the view and the state changes")
+    print("  I - Show/hide the frame profiler")
+    print("  O - Save the frame profile to " + PROFILE_EXPORT_FILE)
     print("  ESC - Exit program")
 
 #=======================================
-# Material Property Functions
+# Materials
+#   applied with materials.apply(MATERIAL, face), face will be either GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK
+#   (see materials.py, setting the material that is already active is skipped)
 #=======================================
 
-# helper method to set the material properties for a given face to match an aluminum surface
+# material properties to match an aluminum surface
 #   properties derived from: https://people.eecs.ku.edu/~jrmiller/Courses/672/InClass/3DLighting/MaterialProperties.html
 #   specifically the one for silver
-# face will be either GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK
-def set_aluminum_material(face):
-    glMaterialfv(face, GL_AMBIENT, [ 0.19225, 0.19225, 0.19225, 1.0 ])
-    glMaterialfv(face, GL_DIFFUSE, [ 0.50754, 0.50754, 0.50754, 1.0 ])
-    glMaterialfv(face, GL_SPECULAR, [ 0.508273, 0.508273, 0.508273, 1.0 ])
-    glMaterialf(face, GL_SHININESS, 51.2)
-
-# helper method to set the material properties for the checkerboard floor
-def set_floor_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.4, 0.4, 0.4, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.6, 0.6, 0.6, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.0, 0.0, 0.0, 1.0])
-    glMaterialf(face, GL_SHININESS, 0.0)
-
-# helper method to set the material properties for the walls
-def set_wall_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.4, 0.4, 0.4, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.6, 0.6, 0.6, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.0, 0.0, 0.0, 1.0])
-    glMaterialf(face, GL_SHININESS, 0.0)
-
-# helper method to set the material properties for the walls
-def set_ceiling_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.6, 0.6, 0.6, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-
-# helper method to set the material properties for the table supports
-def set_pool_wood_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the felt
-def set_felt_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the felt
-def set_pocket_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.1, 0.1, 0.1, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.1, 0.1, 0.1, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 1.0)
-
-# helper method to set the material properties for the desk lamp
-def set_desk_lamp_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the table supports
-def set_wood_support_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the painting on the wall
+ALUMINUM_MATERIAL = Material([ 0.19225, 0.19225, 0.19225, 1.0 ], [ 0.50754, 0.50754, 0.50754, 1.0 ], [ 0.508273, 0.508273, 0.508273, 1.0 ], 51.2)
+
+# material properties for the checkerboard floor
+FLOOR_MATERIAL = Material([0.4, 0.4, 0.4, 1.0], [0.6, 0.6, 0.6, 1.0], [0.0, 0.0, 0.0, 1.0], 0.0)
+
+# material properties for the walls
+WALL_MATERIAL = Material([0.4, 0.4, 0.4, 1.0], [0.6, 0.6, 0.6, 1.0], [0.0, 0.0, 0.0, 1.0], 0.0)
+
+# material properties for the ceiling
+CEILING_MATERIAL = Material([0.2, 0.2, 0.2, 1.0], [0.6, 0.6, 0.6, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the pool table wood
+POOL_WOOD_MATERIAL = Material([0.2, 0.2, 0.2, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the felt
+FELT_MATERIAL = Material([0.5, 0.5, 0.5, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the pockets
+POCKET_MATERIAL = Material([0.1, 0.1, 0.1, 1.0], [0.1, 0.1, 0.1, 1.0], [0.1, 0.1, 0.1, 1.0], 1.0)
+
+# material properties for the desk lamp
+DESK_LAMP_MATERIAL = Material([0.2, 0.2, 0.2, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the table supports
+WOOD_SUPPORT_MATERIAL = Material([0.2, 0.2, 0.2, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the painting on the wall
 # TODO: update to be different from felt
-def set_painting_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the cue ball
-def set_cue_ball_material(face):
-    glMaterialfv(face, GL_AMBIENT, [1, 1, 1, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [1, 1, 1, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [1, 1, 1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-# helper method to set the material properties for the other balls
-def set_ball_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 10.0)
-
-def set_dice_material(face):
-    glMaterialfv(face, GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
-    glMaterialfv(face, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-    glMaterialfv(face, GL_SPECULAR, [0.1, 0.1, 0.1, 1.0])
-    glMaterialf(face, GL_SHININESS, 0.0)
+PAINTING_MATERIAL = Material([0.5, 0.5, 0.5, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the cue ball
+CUE_BALL_MATERIAL = Material([1, 1, 1, 1.0], [1, 1, 1, 1.0], [1, 1, 1, 1.0], 10.0)
+
+# material properties for the other balls
+BALL_MATERIAL = Material([0.5, 0.5, 0.5, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 10.0)
+
+# material properties for the dice
+DICE_MATERIAL = Material([0.5, 0.5, 0.5, 1.0], [0.8, 0.8, 0.8, 1.0], [0.1, 0.1, 0.1, 1.0], 0.0)
 
 #=======================================
 # Direct OpenGL Matrix Operation Examples
@@ -11,11 +11,23 @@
 #   facing downward of unspecified type, with no attenuation.
 #   Choosing the type of light is required, and a warning
 #   will be displayed if not specified.
+#   Assigning to a light remembers which settings changed, so only those
+#   have to be sent to OpenGL again (see place_lights in the scene).
+#   Changing a list in place (light.ambient[0] = 1) is not noticed, assign
+#   a new list or call mark_changed instead.
 #==============================
 from utils import *
 import copy
 
 class Light:
+    # settings that stay in OpenGL until changed, position and direction are not here
+    # since they depend on the camera and have to be sent every frame anyway
+    TRACKED_SETTINGS = (
+        "enabled", "ambient", "diffuse", "specular",
+        "constant_attenuation", "linear_attenuation", "quadratic_attenuation",
+        "spot_cutoff", "spot_exponent",
+    )
+
     # constructor
     def __init__(
         self, 
@@ -36,6 +48,10 @@ class Light:
         spot_cutoff=180.0,                  # how wide the spot light will be
         spot_exponent=0.0                   # how focused the spot light will be
     ):
+        # names of the tracked settings assigned since the light was last sent to OpenGL
+        # (starts with everything, since nothing has been sent yet)
+        self.changed = set()
+
         # light display properties
         self.gl_light_name = gl_light_name
         self.enabled = enabled
@@ -67,4 +83,20 @@ class Light:
     # used to get the position as 4 value list for glLightfv function
     # constructs the list using the position Point and the is_point_light and is_directional_light value to determine if point light or directional light
     def get_position_list(self):
-        return [ self.position.x, self.position.y, self.position.z, 1.0 if self.is_point_light and not self.is_directional_light else 0.0 ]
\ No newline at end of file
+        return [ self.position.x, self.position.y, self.position.z, 1.0 if self.is_point_light and not self.is_directional_light else 0.0 ]
+
+    # remember which tracked settings change
+    def __setattr__(self, name, value):
+        if name in Light.TRACKED_SETTINGS:
+            self.changed.add(name)
+        object.__setattr__(self, name, value)
+
+    # marks settings as changed (all of them if none are given), for changes made in place
+    def mark_changed(self, *names):
+        self.changed.update(names if names else Light.TRACKED_SETTINGS)
+
+    # returns the settings changed since the last call and starts tracking again
+    def take_changes(self):
+        changed = self.changed
+        self.changed = set()
+        return changed
@@ -0,0 +1,58 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# lod.py module
+# Description:
+#   Level of detail for curved shapes.
+#   Each curved shape has a few tessellation levels (segments around its
+#   outline), each built once. The level drawn is picked from how big the
+#   shape looks on screen: its radius over its distance from camera.eye,
+#   scaled by the camera's field of view and the window height. Shapes far
+#   away get the coarse levels, shapes up close the finest one.
+#==============================
+import math
+
+# aim for segments about this many pixels long around the outline of a shape
+PIXELS_PER_SEGMENT = 6
+
+def projected_size(camera, viewport_height, x, y, z, radius):
+    """ Roughly how many pixels tall a sphere of radius at (x, y, z) looks from camera. """
+    distance = math.sqrt((x - camera.eye.x)**2 + (y - camera.eye.y)**2 + (z - camera.eye.z)**2)
+    if distance <= radius:
+        return math.inf
+    # camAngle is the vertical field of view (see gluPerspective)
+    return viewport_height * radius / (distance * math.tan(math.radians(camera.camAngle) / 2))
+
+def choose_segments(size, levels, pixels_per_segment=PIXELS_PER_SEGMENT):
+    """ The coarsest of levels (segment counts, from coarse to fine) that keeps the segments around
+        an outline size pixels across about pixels_per_segment long, or the finest level if none do.
+    """
+    wanted = math.pi * size / pixels_per_segment
+    for segments in levels:
+        if segments >= wanted:
+            return segments
+    return levels[-1]
+
+class LevelOfDetail:
+    """Picks tessellation levels for a camera, and counts how often each level is used"""
+
+    def __init__(self, viewport_height, pixels_per_segment=PIXELS_PER_SEGMENT):
+        self.viewport_height = viewport_height
+        self.pixels_per_segment = pixels_per_segment
+        self.camera = None
+        self.chosen = {}  # segments -> times chosen since the last reset
+
+    def begin_frame(self, camera):
+        self.camera = camera
+        self.chosen = {}
+
+    def segments(self, x, y, z, radius, levels):
+        """ Segments to draw a curved shape of radius around (x, y, z) with, out of levels (coarse to fine). """
+        if self.camera is None:
+            return levels[-1]
+        size = projected_size(self.camera, self.viewport_height, x, y, z, radius)
+        segments = choose_segments(size, levels, self.pixels_per_segment)
+        self.chosen[segments] = self.chosen.get(segments, 0) + 1
+        return segments
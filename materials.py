@@ -0,0 +1,84 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# materials.py module
+# Description:
+#   Materials for the fixed function lighting, and a tracker that skips
+#   setting the material that is already active.
+#   A Material is made once and never changes, with its colors packed into
+#   float arrays up front, so applying it makes no new Python lists.
+#   Two materials with the same values count as the same material, so
+#   switching between (say) the felt and an identical painting costs nothing.
+#==============================
+import numpy as np
+from OpenGL.GL import *
+
+class Material:
+    """Ambient, diffuse and specular colors (RGBA) and shininess, fixed once made"""
+
+    __slots__ = ("ambient", "diffuse", "specular", "shininess", "key")
+
+    def __init__(self, ambient, diffuse, specular, shininess):
+        object.__setattr__(self, "ambient", Material.pack(ambient))
+        object.__setattr__(self, "diffuse", Material.pack(diffuse))
+        object.__setattr__(self, "specular", Material.pack(specular))
+        object.__setattr__(self, "shininess", float(shininess))
+        # compared instead of the arrays
+        object.__setattr__(self, "key", (tuple(ambient), tuple(diffuse), tuple(specular), float(shininess)))
+
+    @staticmethod
+    def pack(color):
+        array = np.array(color, dtype=np.float32)
+        array.flags.writeable = False
+        return array
+
+    def __setattr__(self, name, value):
+        raise AttributeError("materials can't be changed, make a new one instead")
+
+    def __eq__(self, other):
+        return isinstance(other, Material) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def upload(self, face):
+        glMaterialfv(face, GL_AMBIENT, self.ambient)
+        glMaterialfv(face, GL_DIFFUSE, self.diffuse)
+        glMaterialfv(face, GL_SPECULAR, self.specular)
+        glMaterialf(face, GL_SHININESS, self.shininess)
+
+class MaterialTracker:
+    """Remembers the front and back materials, and only sets the ones that change"""
+
+    def __init__(self):
+        self.front = None   # Material currently on the front faces, or None if not known
+        self.back = None
+        self.applied = 0    # materials that reached OpenGL
+        self.skipped = 0    # materials skipped because they were already active
+
+    def apply(self, material, face=GL_FRONT):
+        """ Sets material on face (GL_FRONT, GL_BACK or GL_FRONT_AND_BACK), unless it is already set there. """
+        set_front = face != GL_BACK and material != self.front
+        set_back = face != GL_FRONT and material != self.back
+        if set_front and set_back:
+            material.upload(GL_FRONT_AND_BACK)
+        elif set_front:
+            material.upload(GL_FRONT)
+        elif set_back:
+            material.upload(GL_BACK)
+        else:
+            self.skipped += 1
+            return
+
+        self.applied += 1
+        if face != GL_BACK:
+            self.front = material
+        if face != GL_FRONT:
+            self.back = material
+
+    def forget(self):
+        """ Call after anything sets materials behind the tracker's back (like a display list). """
+        self.front = None
+        self.back = None
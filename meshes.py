@@ -0,0 +1,271 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# meshes.py module
+# Description:
+#   Builds meshes as NumPy arrays and keeps them in OpenGL buffers.
+#   A mesh is built once, all at once, instead of sending every vertex
+#   from Python with glTexCoord/glNormal/glVertex, and is then drawn with a
+#   single glDrawElements. Meshes are cached by their shape, so identical
+#   planes (like the faces of the repeated rects on the pool table) share
+#   one buffer.
+#   An InstanceBatch draws one mesh many times (like every ball on the table)
+#   with a single draw call. The fixed function pipeline has no per-instance
+#   transforms, so the copies are placed with NumPy before they are sent.
+#==============================
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# vertices are interleaved as (s, t, nx, ny, nz, x, y, z), to match GL_T2F_N3F_V3F
+VERTEX_FLOATS = 8
+
+def plane_vertices(x_size, y_size, x_slices, y_slices, stretch=True):
+    """ Interleaved vertices of a plane on the xy-plane with its lower left corner at the origin, facing +z.
+        Returns a ((y_slices + 1) * (x_slices + 1), 8) float32 array, one row of the grid after another.
+        With stretch the texture covers the plane once, otherwise it repeats every unit.
+    """
+    dx = x_size/x_slices
+    dy = y_size/y_slices
+    # the grid lines are added up one step at a time, the same way the old immediate mode loops did
+    xs = np.empty(x_slices + 1)
+    xs[0] = 0
+    xs[1:x_slices] = np.cumsum(np.full(x_slices - 1, dx))
+    xs[x_slices] = x_size
+    ys = np.empty(y_slices + 1)
+    ys[0] = 0
+    ys[1:] = np.cumsum(np.full(y_slices, dy))
+
+    if stretch:
+        s = xs / x_size
+        s[x_slices] = 1
+        t = ys / y_size
+    else:
+        s = xs
+        t = ys
+
+    (grid_x, grid_y) = np.meshgrid(xs, ys)
+    (grid_s, grid_t) = np.meshgrid(s, t)
+    vertices = np.zeros((grid_x.size, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, 0] = grid_s.ravel()
+    vertices[:, 1] = grid_t.ravel()
+    vertices[:, 4] = 1
+    vertices[:, 5] = grid_x.ravel()
+    vertices[:, 6] = grid_y.ravel()
+    return vertices
+
+def plane_indices(x_slices, y_slices):
+    """ Triangles for the grid from plane_vertices, split the same way as one triangle strip per row
+        (top then bottom vertex of each column), so the planes look exactly like they used to.
+    """
+    columns = x_slices + 1
+    row = np.arange(y_slices)[:, None]
+    column = np.arange(columns)[None, :]
+    return strip_triangles((row + 1) * columns + column, row * columns + column)
+
+def sphere_vertices(radius, slices, stacks):
+    """ Interleaved vertices of a sphere laid out like gluSphere (smooth normals, texture coordinates,
+        poles on the z axis). Returns a ((stacks + 1) * (slices + 1), 8) float32 array, one stack after another.
+    """
+    # GLU works in single precision, so the same is done here
+    slice_angles = (2 * np.pi * np.arange(slices + 1) / slices).astype(np.float32)
+    slice_angles[slices] = 0
+    stack_angles = (np.pi * np.arange(stacks + 1) / stacks).astype(np.float32)
+    (sin_slice, cos_slice) = (np.sin(slice_angles), np.cos(slice_angles))
+    (sin_stack, cos_stack) = (np.sin(stack_angles), np.cos(stack_angles))
+    ring_radius = np.float32(radius) * sin_stack
+    # make sure it comes to a point
+    ring_radius[0] = 0
+    ring_radius[stacks] = 0
+
+    vertices = np.zeros((stacks + 1, slices + 1, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, :, 0] = 1 - np.arange(slices + 1, dtype=np.float32) / slices
+    vertices[:, :, 1] = (1 - np.arange(stacks + 1, dtype=np.float32) / stacks)[:, None]
+    vertices[:, :, 2] = sin_slice[None, :] * sin_stack[:, None]
+    vertices[:, :, 3] = cos_slice[None, :] * sin_stack[:, None]
+    vertices[:, :, 4] = cos_stack[:, None]
+    vertices[:, :, 5] = ring_radius[:, None] * sin_slice[None, :]
+    vertices[:, :, 6] = ring_radius[:, None] * cos_slice[None, :]
+    vertices[:, :, 7] = (np.float32(radius) * cos_stack)[:, None]
+    return vertices.reshape(-1, VERTEX_FLOATS)
+
+def sphere_indices(slices, stacks):
+    """ Triangles for the grid from sphere_vertices, one quad strip per stack like gluSphere. """
+    columns = slices + 1
+    stack = np.arange(stacks)[:, None]
+    column = np.arange(columns)[None, :]
+    return strip_triangles((stack + 1) * columns + column, stack * columns + column)
+
+def strip_triangles(top, bottom):
+    """ Triangles of strips that alternate between the top and bottom rows of vertex indices
+        (each row of the arrays is one strip), in the order OpenGL would split them.
+    """
+    (strips, columns) = top.shape
+    strip = np.empty((strips, 2 * columns), dtype=np.uint32)
+    strip[:, 0::2] = top
+    strip[:, 1::2] = bottom
+
+    # triangle i of a strip is (i, i+1, i+2), with the first two swapped on odd triangles to keep the winding
+    first = np.arange(2 * columns - 2)
+    odd = first % 2 == 1
+    corners = np.stack([np.where(odd, first + 1, first), np.where(odd, first, first + 1), first + 2], axis=1)
+    return strip[:, corners].reshape(-1)
+
+class Mesh:
+    """Vertices and triangle indices in OpenGL buffers"""
+
+    def __init__(self, vertices, indices):
+        self.count = len(indices)
+        self.draws = 0  # times drawn
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices.astype(np.uint32), GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        glInterleavedArrays(GL_T2F_N3F_V3F, 0, ctypes.c_void_p(0))
+        glDrawElements(GL_TRIANGLES, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glPopClientAttrib()
+        self.draws += 1
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        glDeleteBuffers(2, [self.vertex_buffer, self.index_buffer])
+
+class InstanceBatch:
+    """One mesh drawn at many places in a single draw call.
+       The copies are moved and turned with NumPy and sent as one vertex array, so the number of
+       OpenGL calls stays the same no matter how many instances there are.
+    """
+
+    def __init__(self, vertices, indices):
+        self.texture_coordinates = vertices[:, 0:2]
+        self.normals = vertices[:, 2:5]
+        self.positions = vertices[:, 5:8]
+        self.indices = indices.astype(np.uint32)
+        self.instance_indices = {}  # instance count -> indices of that many copies
+        self.last_key = None        # the instances of the last draw, and the arrays made for them
+        self.last_arrays = None
+        self.draws = 0              # draw calls made (one for every instance drawn together)
+
+    def indices_for(self, count):
+        if count not in self.instance_indices:
+            offsets = (np.arange(count, dtype=np.uint32) * len(self.positions))[:, None]
+            self.instance_indices[count] = (self.indices[None, :] + offsets).reshape(-1)
+        return self.instance_indices[count]
+
+    def draw(self, positions, rotations=None, colors=None, regions=None):
+        """ Draws a copy of the mesh at each of positions (n, 3).
+            rotations are optional (n, 4, 4) matrices laid out for glMultMatrixf (like BallSet.orientation_matrices),
+            colors optional (n, 3) RGB colors for drawing without lighting,
+            and regions optional (n, 4) atlas regions (u0, v0, u1, v1) to move each copy's texture into (see atlas.py).
+        """
+        count = len(positions)
+        if count == 0:
+            return
+        positions = np.asarray(positions, dtype=np.float32)
+        if rotations is not None:
+            rotations = np.asarray(rotations, dtype=np.float32)
+        if colors is not None:
+            colors = np.asarray(colors, dtype=np.float32)
+        if regions is not None:
+            regions = np.asarray(regions, dtype=np.float32)
+
+        # instances that haven't moved since the last draw (like the light spheres) reuse the arrays from then
+        key = tuple(None if array is None else array.tobytes() for array in (positions, rotations, colors, regions))
+        if key != self.last_key:
+            self.last_arrays = self.instance_arrays(positions, rotations, colors, regions)
+            self.last_key = key
+        (vertices, normals, texture_coordinates, colors) = self.last_arrays
+
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, vertices)
+        glNormalPointer(GL_FLOAT, 0, normals)
+        glTexCoordPointer(2, GL_FLOAT, 0, texture_coordinates)
+        if colors is not None:
+            glEnableClientState(GL_COLOR_ARRAY)
+            glColorPointer(3, GL_FLOAT, 0, colors)
+        indices = self.indices_for(count)
+        glDrawElements(GL_TRIANGLES, len(indices), GL_UNSIGNED_INT, indices)
+        glPopClientAttrib()
+        self.draws += 1
+
+    def instance_arrays(self, positions, rotations, colors, regions=None):
+        """ (vertices, normals, texture coordinates, colors) of every copy, ready to send. """
+        count = len(positions)
+        if rotations is not None:
+            # a column-major matrix m[column][row] turns a vertex v into v @ m[:3, :3]
+            turns = rotations[:, :3, :3]
+            vertices = np.matmul(self.positions[None, :, :], turns) + positions[:, None, :]
+            normals = np.matmul(self.normals[None, :, :], turns)
+        else:
+            vertices = self.positions[None, :, :] + positions[:, None, :]
+            normals = np.broadcast_to(self.normals, (count,) + self.normals.shape)
+        vertices = np.ascontiguousarray(vertices.reshape(-1, 3))
+        normals = np.ascontiguousarray(normals.reshape(-1, 3))
+        if regions is not None:
+            # each copy's coordinates are scaled into its own part of the atlas
+            corners = regions[:, None, 0:2]
+            sizes = regions[:, None, 2:4] - corners
+            texture_coordinates = (corners + self.texture_coordinates[None, :, :] * sizes).reshape(-1, 2)
+        else:
+            texture_coordinates = np.broadcast_to(self.texture_coordinates, (count,) + self.texture_coordinates.shape).reshape(-1, 2)
+        texture_coordinates = np.ascontiguousarray(texture_coordinates, dtype=np.float32)
+        if colors is not None:
+            colors = np.ascontiguousarray(np.repeat(colors, len(self.positions), axis=0))
+        return (vertices, normals, texture_coordinates, colors)
+
+class MeshCache:
+    """Meshes keyed by their shape, built the first time each shape is asked for"""
+
+    def __init__(self):
+        self.meshes = {}
+
+    def sphere(self, radius, slices, stacks):
+        key = ("sphere", radius, slices, stacks)
+        if key not in self.meshes:
+            self.meshes[key] = Mesh(sphere_vertices(radius, slices, stacks), sphere_indices(slices, stacks))
+        return self.meshes[key]
+
+    def plane(self, x_size, y_size, x_slices, y_slices, stretch=True, region=None):
+        """ A plane mesh, with its texture moved into region of an atlas if given (see atlas.py). """
+        key = ("plane", x_size, y_size, x_slices, y_slices, bool(stretch), None if region is None else region.as_tuple())
+        if key not in self.meshes:
+            vertices = plane_vertices(x_size, y_size, x_slices, y_slices, stretch)
+            if region is not None:
+                (vertices[:, 0], vertices[:, 1]) = region.remap(vertices[:, 0], vertices[:, 1])
+            self.meshes[key] = Mesh(vertices, plane_indices(x_slices, y_slices))
+        return self.meshes[key]
+
+    def sphere_batch(self, radius, slices, stacks):
+        """ An InstanceBatch of spheres, for drawing many at once. """
+        key = ("sphere batch", radius, slices, stacks)
+        if key not in self.meshes:
+            self.meshes[key] = InstanceBatch(sphere_vertices(radius, slices, stacks), sphere_indices(slices, stacks))
+        return self.meshes[key]
+
+    def draws(self):
+        """ Draw calls made by every mesh so far. """
+        return sum(mesh.draws for mesh in self.meshes.values())
+
+    def clear(self):
+        for mesh in self.meshes.values():
+            if isinstance(mesh, Mesh):
+                mesh.delete()
+        self.meshes = {}
+
+    def __len__(self):
+        return len(self.meshes)
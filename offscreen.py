@@ -0,0 +1,263 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# offscreen.py module
+# Description:
+#   Renders the scene without a window, to a sequence of image files.
+#   An EGL context is made on Mesa's surfaceless platform (no display or
+#   GPU needed, llvmpipe draws on the CPU), and every frame is drawn into
+#   a framebuffer object of the size asked for. The camera follows a
+#   scripted path: a turntable around the pool table, or keyframes from a
+#   file. Frames are read back and handed to a background thread that
+#   encodes and writes them, so drawing the next frame doesn't wait on it:
+#       python offscreen.py [--frames 36] [--output frames] [--format png|rgb]
+#                           [--size 1000x800] [--path keyframes.txt] [--lights 1,2]
+#==============================
+import os
+# OpenGL picks its platform on first import, so this has to come before anything imports it (including the scene)
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import math
+import queue
+import ctypes
+import argparse
+import threading
+import numpy as np
+from PIL import Image
+from OpenGL import EGL
+from OpenGL.GL import *
+from utils import Point
+import interactive_scene_pygame as scene
+
+# frames waiting for the writer thread before drawing waits for it to catch up
+WRITE_QUEUE_SIZE = 8
+
+class OffscreenContext:
+    """An OpenGL context with no window, from EGL"""
+
+    def __init__(self):
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        (major, minor) = (EGL.EGLint(), EGL.EGLint())
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("EGL could not be initialized (is Mesa's libEGL installed?)")
+
+        attributes = [
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        ]
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, (EGL.EGLint * len(attributes))(*attributes), ctypes.pointer(config), 1, ctypes.pointer(count))
+        if count.value == 0:
+            raise RuntimeError("no EGL config can draw with desktop OpenGL")
+
+        # the frames go to a framebuffer object, the surface only has to exist
+        surface_attributes = [EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE]
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config, (EGL.EGLint * len(surface_attributes))(*surface_attributes))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not self.context or not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise RuntimeError("could not make an EGL OpenGL context current")
+
+    def destroy(self):
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglTerminate(self.display)
+
+class Framebuffer:
+    """A framebuffer object with color and depth, to draw frames into"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        (self.color, self.depth) = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f'a {width}x{height} framebuffer is not supported')
+
+    def read(self):
+        """ The pixels drawn so far, as RGB bytes with the bottom row first (as OpenGL stores them). """
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        return glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+
+    def delete(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glDeleteRenderbuffers(2, [self.color, self.depth])
+        glDeleteFramebuffers(1, [self.framebuffer])
+
+class FrameWriter:
+    """Writes frames to files on a background thread"""
+
+    FORMATS = ("png", "rgb")    # rgb is the raw pixels, top row first, with no header
+
+    def __init__(self, directory, format="png"):
+        if format not in FrameWriter.FORMATS:
+            raise ValueError(f'unknown frame format {format} (use one of {", ".join(FrameWriter.FORMATS)})')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = format
+        self.frames = queue.Queue(WRITE_QUEUE_SIZE)
+        self.written = 0
+        self.error = None   # the first exception the thread ran into, raised again by close
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, index, width, height, pixels):
+        """ Queues a frame (RGB bytes, bottom row first) to be written as frame number index. """
+        if self.error is not None:
+            raise self.error
+        self.frames.put((index, width, height, pixels))
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self.save(*frame)
+                self.written += 1
+            except Exception as error:
+                self.error = error
+
+    def save(self, index, width, height, pixels):
+        path = os.path.join(self.directory, f'frame_{index:04d}.{self.format}')
+        if self.format == "png":
+            Image.frombytes("RGB", (width, height), pixels).transpose(Image.Transpose.FLIP_TOP_BOTTOM).save(path)
+        else:
+            rows = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width * 3)
+            with open(path, "wb") as file:
+                file.write(rows[::-1].tobytes())
+
+    def close(self):
+        """ Waits for every queued frame to be written. """
+        self.frames.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+#==============================
+# Camera paths
+#   each is a list of (eye Point, look angle, pitch angle), one per frame
+#==============================
+
+def aim(eye, target):
+    """ The (look angle, pitch angle) that point a Camera at eye towards target. """
+    (dx, dy, dz) = (target.x - eye.x, target.y - eye.y, target.z - eye.z)
+    # the inverse of the forward direction in Camera.placeCamera
+    look = math.degrees(math.atan2(-dx, -dz))
+    pitch = math.degrees(math.atan2(-dy, math.sqrt(dx**2 + dz**2)))
+    return (look, pitch)
+
+def turntable_path(frames, center, radius, height):
+    """ frames evenly spaced points on a circle around center, height above the floor, all looking at center. """
+    path = []
+    for frame in range(frames):
+        angle = 2 * math.pi * frame / frames
+        eye = Point(center.x + radius * math.sin(angle), height, center.z + radius * math.cos(angle))
+        path.append((eye,) + aim(eye, center))
+    return path
+
+def load_keyframes(file_name):
+    """ Keyframes from a text file, one per line as "x y z look pitch" (blank lines and # comments are skipped). """
+    keyframes = []
+    with open(file_name) as file:
+        for line in file:
+            line = line.split("#")[0].strip()
+            if line:
+                (x, y, z, look, pitch) = (float(value) for value in line.split())
+                keyframes.append((Point(x, y, z), look, pitch))
+    if len(keyframes) == 0:
+        raise ValueError(f'{file_name} has no keyframes')
+    return keyframes
+
+def keyframe_path(keyframes, frames):
+    """ frames points moving at an even pace through keyframes, from the first to the last. """
+    if len(keyframes) == 1 or frames == 1:
+        return [keyframes[0]] * frames
+    path = []
+    for frame in range(frames):
+        position = frame / (frames - 1) * (len(keyframes) - 1)
+        index = min(int(position), len(keyframes) - 2)
+        t = position - index
+        ((eye0, look0, pitch0), (eye1, look1, pitch1)) = (keyframes[index], keyframes[index + 1])
+        eye = Point(eye0.x + (eye1.x - eye0.x) * t, eye0.y + (eye1.y - eye0.y) * t, eye0.z + (eye1.z - eye0.z) * t)
+        path.append((eye, look0 + (look1 - look0) * t, pitch0 + (pitch1 - pitch0) * t))
+    return path
+
+#==============================
+# Rendering
+#==============================
+
+def render(path, writer, width, height, steps_per_frame=0):
+    """ Draws the scene from each camera in path and hands the frames to writer.
+        steps_per_frame runs the animations and physics that many steps between frames.
+    """
+    scene.window_dimensions = (width, height)
+    scene.detail.viewport_height = height
+    scene.camera = scene.create_camera(width / height)
+    framebuffer = Framebuffer(width, height)
+    try:
+        for (index, (eye, look, pitch)) in enumerate(path):
+            for step in range(steps_per_frame):
+                scene.advance()
+            scene.camera.eye = eye
+            scene.camera.lookAngle = look
+            scene.camera.pitchAngle = pitch
+            scene.update_flashlight()
+            scene.display()
+            writer.write(index, width, height, framebuffer.read())
+    finally:
+        framebuffer.delete()
+
+def parse_size(text):
+    (width, height) = (int(value) for value in text.lower().split("x"))
+    return (width, height)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Renders the scene without a window to a sequence of images")
+    parser.add_argument("--frames", type=int, default=36, help="number of frames to draw")
+    parser.add_argument("--output", metavar="DIR", default="frames", help="directory to write the frames to")
+    parser.add_argument("--format", choices=FrameWriter.FORMATS, default="png", help="png images, or raw RGB bytes")
+    parser.add_argument("--size", type=parse_size, default=scene.window_dimensions, metavar="WxH", help="frame size in pixels")
+    parser.add_argument("--path", metavar="FILE", help="camera keyframes (x y z look pitch per line) instead of a turntable")
+    parser.add_argument("--radius", type=float, default=25, help="distance of the turntable camera from the pool table")
+    parser.add_argument("--height", type=float, default=20, help="height of the turntable camera")
+    parser.add_argument("--lights", default="", help="lights to turn on, like 1,2,3")
+    parser.add_argument("--steps-per-frame", type=int, default=0, help="animation/physics steps between frames (0 keeps the scene still)")
+    arguments = parser.parse_args()
+
+    context = OffscreenContext()
+    scene.init_scene()
+    for light in arguments.lights.split(","):
+        if light.strip():
+            scene.lights[int(light)].enabled = True
+
+    if arguments.path:
+        path = keyframe_path(load_keyframes(arguments.path), arguments.frames)
+    else:
+        path = turntable_path(arguments.frames, Point(scene.table_x, 9, scene.table_z), arguments.radius, arguments.height)
+
+    writer = FrameWriter(arguments.output, arguments.format)
+    (width, height) = arguments.size
+    try:
+        render(path, writer, width, height, arguments.steps_per_frame)
+    finally:
+        writer.close()
+        context.destroy()
+    print(f'Wrote {writer.written} frames to {arguments.output}')
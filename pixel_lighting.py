@@ -0,0 +1,242 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# pixel_lighting.py module
+# Description:
+#   Per-pixel lighting with GLSL, in place of the fixed function lighting.
+#   Fixed function OpenGL has at most 8 lights (GL_LIGHT0 to GL_LIGHT7) and
+#   works out the lighting at each vertex, so a spotlight only shows up on a
+#   surface cut into a fine enough grid. Here the lights are kept in a
+#   uniform buffer (up to MAX_LIGHTS of them) and the fragment shader lights
+#   every pixel, with the same math as fixed function OpenGL: ambient,
+#   diffuse and specular (local viewer), attenuation by distance, spot
+#   cutoff and exponent, and two sided lighting with the back material.
+#   The shaders read the materials, matrices and texture coordinates from
+#   the usual fixed function state, so everything is drawn the same way as
+#   before (display lists, quadrics, vertex arrays) with the program on.
+#   Lights are given as light.Light objects, and sent in eye space like
+#   glLightfv does, so upload has to be called with the camera's modelview.
+#   Needs OpenGL 3.1 (or ARB_uniform_buffer_object), Mesa's llvmpipe has it.
+#==============================
+import math
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+# most lights the uniform buffer has room for
+MAX_LIGHTS = 64
+# floats for one light in the buffer: six vec4s (std140 lays out a struct of vec4s with no gaps)
+LIGHT_FLOATS = 24
+# bytes before the lights in the buffer (the light count, padded to a vec4)
+HEADER_SIZE = 16
+# uniform buffer binding point the lights are on
+LIGHTS_BINDING = 0
+# where spot lights point when they aren't given a direction (the OpenGL default, already in eye space)
+DEFAULT_SPOT_DIRECTION = (0.0, 0.0, -1.0)
+
+VERTEX_SHADER = """
+#version 120
+
+varying vec3 eye_position;
+varying vec3 eye_normal;
+
+void main() {
+    vec4 position = gl_ModelViewMatrix * gl_Vertex;
+    eye_position = position.xyz / position.w;
+    eye_normal = gl_NormalMatrix * gl_Normal;
+    gl_TexCoord[0] = gl_TextureMatrix[0] * gl_MultiTexCoord0;
+    // exactly where fixed function puts it, so depth matches anything drawn without the program
+    gl_Position = ftransform();
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+#extension GL_ARB_uniform_buffer_object : require
+
+const int MAX_LIGHTS = %d;
+
+struct LightData {
+    vec4 position;      // eye space (divided through by w), w is 0 for a directional light
+    vec4 spot;          // unit direction in eye space, and the cosine of the cutoff (below -1 when it isn't a spot)
+    vec4 ambient;
+    vec4 diffuse;
+    vec4 specular;
+    vec4 attenuation;   // constant, linear, quadratic, and the spot exponent
+};
+
+layout(std140) uniform Lights {
+    ivec4 light_count;
+    LightData lights[MAX_LIGHTS];
+};
+
+uniform sampler2D image;
+uniform bool textured;
+
+varying vec3 eye_position;
+varying vec3 eye_normal;
+
+// pow that gives 1 for an exponent of 0 (like OpenGL), where GLSL leaves pow(0, 0) undefined
+float power(float base, float exponent) {
+    return exponent == 0.0 ? 1.0 : pow(max(base, 0.0), exponent);
+}
+
+void main() {
+    // two sided lighting, the back of a face is lit from the other side with the back material
+    // (picked once here, so the light loop below is only in the shader once)
+    vec3 normal = normalize(gl_FrontFacing ? eye_normal : -eye_normal);
+    vec4 ambient = gl_FrontFacing ? gl_FrontMaterial.ambient : gl_BackMaterial.ambient;
+    vec4 diffuse = gl_FrontFacing ? gl_FrontMaterial.diffuse : gl_BackMaterial.diffuse;
+    vec4 specular = gl_FrontFacing ? gl_FrontMaterial.specular : gl_BackMaterial.specular;
+    float shininess = gl_FrontFacing ? gl_FrontMaterial.shininess : gl_BackMaterial.shininess;
+    vec3 color = gl_FrontFacing ? gl_FrontLightModelProduct.sceneColor.rgb : gl_BackLightModelProduct.sceneColor.rgb;
+    vec3 view = normalize(-eye_position);
+
+    for (int i = 0; i < light_count.x; i++) {
+        vec4 position = lights[i].position;
+        vec4 factors = lights[i].attenuation;
+        // position.w is 0 for a directional light, which leaves the direction as it is with no attenuation
+        vec3 to_light = position.xyz - position.w * eye_position;
+        float distance = length(to_light);
+        to_light /= distance;
+        float attenuation = position.w == 0.0 ? 1.0 : 1.0 / (factors.x + (factors.y + factors.z * distance) * distance);
+        vec4 spot = lights[i].spot;
+        if (spot.w >= -1.0) {
+            float along = dot(-to_light, spot.xyz);
+            attenuation *= along < spot.w ? 0.0 : power(along, factors.w);
+        }
+
+        float lambert = dot(normal, to_light);
+        vec3 lit = lights[i].ambient.rgb * ambient.rgb;
+        if (lambert > 0.0) {
+            lit += lambert * lights[i].diffuse.rgb * diffuse.rgb;
+            lit += power(dot(normal, normalize(to_light + view)), shininess) * lights[i].specular.rgb * specular.rgb;
+        }
+        color += attenuation * lit;
+    }
+
+    gl_FragColor = vec4(clamp(color, 0.0, 1.0), diffuse.a);
+    // GL_MODULATE
+    if (textured) {
+        gl_FragColor *= texture2D(image, gl_TexCoord[0].st);
+    }
+}
+"""
+
+def supports_pixel_lighting():
+    """ Whether the current OpenGL context can run the lighting shader (GLSL and uniform buffers). """
+    version = glGetString(GL_VERSION)
+    if version is None:
+        return False
+    (major, minor) = (int(part) for part in version.split()[0].split(b".")[:2])
+    if (major, minor) >= (3, 1):
+        return True
+    extensions = glGetString(GL_EXTENSIONS) or b""
+    return (major, minor) >= (2, 0) and b"GL_ARB_uniform_buffer_object" in extensions.split()
+
+class PixelLighting:
+    """The lighting shader and the buffer of lights it reads"""
+
+    def __init__(self, enabled=True, max_lights=MAX_LIGHTS):
+        self.enabled = enabled      # turned off by create when the shader can't run here
+        self.max_lights = max_lights
+        self.program = None
+        self.buffer = None
+        self.textured_location = -1
+        self.active = False         # whether the program is in use
+        self.textured = None        # last value sent to the textured uniform
+        self.data = np.zeros((max_lights, LIGHT_FLOATS), dtype=np.float32)
+        self.count = 0              # lights in the buffer
+        self.dropped = 0            # enabled lights left out because the buffer was full
+
+    def create(self):
+        """ Builds the shaders and the light buffer. Returns False (and turns itself off) if they can't be used here. """
+        if not self.enabled:
+            return False
+        if not supports_pixel_lighting():
+            self.enabled = False
+            return False
+        try:
+            self.program = shaders.compileProgram(
+                shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(FRAGMENT_SHADER % self.max_lights, GL_FRAGMENT_SHADER),
+            )
+        except RuntimeError as error:
+            print(f'Per-pixel lighting is not available, using fixed function lighting ({error.args[0]})')
+            self.enabled = False
+            return False
+
+        block = glGetUniformBlockIndex(self.program, "Lights")
+        glUniformBlockBinding(self.program, block, LIGHTS_BINDING)
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferData(GL_UNIFORM_BUFFER, HEADER_SIZE + self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+        glUseProgram(self.program)
+        glUniform1i(glGetUniformLocation(self.program, "image"), 0)
+        self.textured_location = glGetUniformLocation(self.program, "textured")
+        glUseProgram(0)
+        return True
+
+    def upload(self, lights):
+        """ Sends the enabled lights to the buffer, with the current modelview matrix (the camera) taking them
+            into eye space the way glLightfv would.
+        """
+        lit = [light for light in lights if light.enabled]
+        self.dropped = max(len(lit) - self.max_lights, 0)
+        lit = lit[:self.max_lights]
+        self.count = len(lit)
+        data = self.data[:self.count]
+        for (row, light) in zip(data, lit):
+            row[0:4] = light.get_position_list()
+            # spot directions are only sent to OpenGL for spot lights (see place_lights in the scene)
+            row[4:7] = light.direction[0:3] if light.is_spot_light else DEFAULT_SPOT_DIRECTION
+            row[7] = math.cos(math.radians(light.spot_cutoff)) if light.spot_cutoff != 180 else -2
+            row[8:12] = light.ambient
+            row[12:16] = light.diffuse
+            row[16:20] = light.specular
+            row[20:24] = (light.constant_attenuation, light.linear_attenuation, light.quadratic_attenuation, light.spot_exponent)
+
+        # OpenGL hands back the matrix with its columns as rows, so a row vector times it is the transformed point
+        view = glGetFloatv(GL_MODELVIEW_MATRIX)
+        data[:, 0:4] = data[:, 0:4] @ view
+        spots = [index for (index, light) in enumerate(lit) if light.is_spot_light]
+        data[spots, 4:7] = data[spots, 4:7] @ view[0:3, 0:3]
+        # done once here instead of for every pixel: positions divided through by w, spot directions made unit length
+        positional = data[:, 3] != 0
+        data[positional, 0:4] /= data[positional, 3:4]
+        data[:, 4:7] /= np.maximum(np.linalg.norm(data[:, 4:7], axis=1, keepdims=True), 1e-6)
+
+        header = np.array([self.count, 0, 0, 0], dtype=np.int32)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, HEADER_SIZE, header)
+        if self.count > 0:
+            glBufferSubData(GL_UNIFORM_BUFFER, HEADER_SIZE, data.nbytes, data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def use(self):
+        """ Lights everything drawn from now on with the shader, until stop. """
+        glUseProgram(self.program)
+        glBindBufferBase(GL_UNIFORM_BUFFER, LIGHTS_BINDING, self.buffer)
+        self.active = True
+        self.texturing(bool(glIsEnabled(GL_TEXTURE_2D)))
+
+    def stop(self):
+        glUseProgram(0)
+        self.active = False
+
+    def texturing(self, enabled):
+        """ Turns GL_TEXTURE_2D on or off, and tells the shader (which can't see it) when it is in use. """
+        if enabled:
+            glEnable(GL_TEXTURE_2D)
+        else:
+            glDisable(GL_TEXTURE_2D)
+        if self.active and enabled != self.textured:
+            glUniform1i(self.textured_location, 1 if enabled else 0)
+            self.textured = enabled
+
+    def __str__(self):
+        return f'{self.count} lights shaded per pixel' + (f' ({self.dropped} left out, the most is {self.max_lights})' if self.dropped else '')
@@ -0,0 +1,160 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# profiler.py module
+# Description:
+#   Frame time profiler.
+#   Parts of a frame are timed with nested scopes:
+#       with profiler.scope("pool table"):
+#           ...
+#   and a scope inside another is reported under it ("display/objects/pool table").
+#   Counters (texture binds, draw calls, ...) are read from the objects that
+#   already count them once at the end of each frame, so nothing extra runs
+#   in the drawing code. The last WINDOW frames are kept for rolling averages
+#   and 99th percentiles, and can be exported as JSON.
+#   When the profiler is off, scope() hands back one shared object that does
+#   nothing, so the timed code costs next to nothing extra.
+#==============================
+import json
+import time
+from collections import deque
+
+# frames kept for the averages and percentiles
+WINDOW = 120
+
+class NullScope:
+    """Stands in for a Scope while the profiler is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class Scope:
+    """Times one part of a frame, and adds it to the profiler when done"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.profiler.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        elapsed = time.perf_counter() - self.start
+        path = "/".join(self.profiler.stack)
+        self.profiler.stack.pop()
+        self.profiler.frame[path] = self.profiler.frame.get(path, 0.0) + elapsed
+        return False
+
+def percentile(values, fraction):
+    """ The value fraction (0 to 1) of the way through values once sorted. """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class FrameProfiler:
+    """Timing scopes and counters for the last WINDOW frames"""
+
+    def __init__(self, enabled=False, window=WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.stack = []         # names of the scopes currently open
+        self.frame = {}         # scope path -> seconds spent in it this frame
+        self.times = {}         # scope path -> deque of seconds per frame
+        self.counters = {}      # counter name -> (read function, per frame or not, last value read)
+        self.counts = {}        # counter name -> deque of values per frame
+        self.frames = 0         # frames ended while enabled
+
+    def scope(self, name):
+        """ A context manager that times everything inside it as name. """
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def track(self, name, read, per_frame=False):
+        """ Adds a counter, read with read() at the end of every frame.
+            read() gives a running total (like TextureRegistry.binds), and the change since the last frame is kept,
+            unless per_frame is True and read() already gives this frame's value.
+        """
+        self.counters[name] = [read, per_frame, read()]
+        self.counts[name] = deque(maxlen=self.window)
+
+    def end_frame(self):
+        """ Stores this frame's times and counter values. """
+        if not self.enabled:
+            return
+        for (path, seconds) in self.frame.items():
+            if path not in self.times:
+                self.times[path] = deque(maxlen=self.window)
+            self.times[path].append(seconds)
+        # scopes that didn't run this frame (like a culled object) took no time
+        for (path, samples) in self.times.items():
+            if path not in self.frame:
+                samples.append(0.0)
+        self.frame = {}
+
+        for (name, counter) in self.counters.items():
+            (read, per_frame, last) = counter
+            value = read()
+            self.counts[name].append(value if per_frame else value - last)
+            counter[2] = value
+        self.frames += 1
+
+    def reset(self):
+        """ Forgets every frame so far (like after being off, when the counters kept running). """
+        self.frame = {}
+        self.times = {}
+        self.frames = 0
+        for (name, counter) in self.counters.items():
+            counter[2] = counter[0]()
+            self.counts[name].clear()
+
+    def summary(self):
+        """ {"times": {path: {mean_ms, p99_ms, max_ms}}, "counters": {name: {mean, max}}, "frames": n} over the window. """
+        times = {}
+        for (path, samples) in sorted(self.times.items()):
+            times[path] = {
+                "mean_ms": 1000 * sum(samples) / len(samples),
+                "p99_ms": 1000 * percentile(samples, 0.99),
+                "max_ms": 1000 * max(samples),
+            }
+        counters = {}
+        for (name, values) in self.counts.items():
+            if len(values) > 0:
+                counters[name] = {"mean": sum(values) / len(values), "max": max(values)}
+        return {"frames": min(self.frames, self.window), "times": times, "counters": counters}
+
+    def report_rows(self):
+        """ The summary as rows of (name, average, p99 or max) text, with scopes indented under the ones they are in. """
+        summary = self.summary()
+        rows = [("scope", "avg ms", "p99 ms")]
+        for (path, stats) in summary["times"].items():
+            name = "  " * path.count("/") + path.split("/")[-1]
+            rows.append((name, f'{stats["mean_ms"]:.2f}', f'{stats["p99_ms"]:.2f}'))
+        if summary["counters"]:
+            rows.append(("", "", ""))
+            rows.append(("per frame", "avg", "max"))
+            for (name, stats) in summary["counters"].items():
+                rows.append((name, f'{stats["mean"]:.1f}', f'{stats["max"]}'))
+        return rows
+
+    def report_lines(self):
+        """ report_rows lined up as text. """
+        return [f'{name:<28}{average:>8}{last:>8}' for (name, average, last) in self.report_rows()]
+
+    def export(self, file_name):
+        """ Writes the summary, and every frame in the window, as JSON. """
+        report = self.summary()
+        report["samples_ms"] = {path: [1000 * seconds for seconds in samples] for (path, samples) in sorted(self.times.items())}
+        report["samples"] = {name: list(values) for (name, values) in self.counts.items()}
+        with open(file_name, "w") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
@@ -0,0 +1,239 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# recording.py module
+# Description:
+#   Records pool games to a compact binary log and replays them.
+#   A log holds the table, the rack, the random seed, and every
+#   strike (angle, power) and reset with the physics step it happened on.
+#   The physics is deterministic, so replaying the log re-creates the game
+#   exactly, either headless (much faster than real time) or in the scene
+#   (python interactive_scene_pygame.py --replay FILE [--speed N]).
+#
+#   Log layout (little-endian):
+#     header   magic "PSR1", flags (1 = event physics), substeps, seed,
+#              table (x, z, half length, half width, friction, pocket sizes),
+#              sleep speed, delay, ball count, then (id, dx, dz) for each ball
+#     records  kind, steps since the last record (varint), then for a strike
+#              the angle (0.01 degrees) and power (0.001) as unsigned shorts
+#   A strike takes 6-8 bytes.
+#==============================
+import sys
+import time
+import random
+import struct
+from billiards import *
+
+MAGIC = b"PSR1"
+EVENT_PHYSICS_FLAG = 1
+
+HEADER_FORMAT = "<4sBBI8dHB"
+BALL_FORMAT = "<Bdd"
+STRIKE_FORMAT = "<HH"
+
+# kinds of records
+STRIKE_RECORD = 0
+RESET_RECORD = 1
+
+# strike values are stored as whole numbers of these units
+ANGLE_UNIT = 0.01
+POWER_UNIT = 0.001
+
+def quantize_strike(angle, power):
+    """ The (angle, power) actually played and stored for a strike, plus their stored units. """
+    angle_units = int(round((angle % 360) / ANGLE_UNIT)) % int(round(360 / ANGLE_UNIT))
+    power_units = min(max(int(round(power / POWER_UNIT)), 0), 0xFFFF)
+    return (angle_units * ANGLE_UNIT, power_units * POWER_UNIT, angle_units, power_units)
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, offset)
+        shift += 7
+
+class ShotRecord:
+    """A single strike or reset, on the physics step it happened before"""
+
+    def __init__(self, kind, step, angle=0.0, power=0.0):
+        self.kind = kind
+        self.step = step
+        self.angle = angle
+        self.power = power
+
+class ShotLog:
+    """Everything needed to replay a game: the starting table and balls, the seed, and the records"""
+
+    def __init__(self, table, layout, seed, events=False, substeps=1, sleep_speed=0.0, records=None):
+        self.table = table
+        self.layout = layout
+        self.seed = seed
+        self.events = events
+        self.substeps = substeps
+        self.sleep_speed = sleep_speed
+        self.records = records if records is not None else []
+
+    def new_ball_set(self):
+        """ A freshly racked ball set (and its event simulator) matching the log. """
+        table = self.table
+        ball_set = BallSet(
+            Table(table.x, table.z, table.half_length, table.half_width, table.delay, table.friction, table.corner_pocket_size, table.middle_pocket_size),
+            list(self.layout), self.substeps, self.sleep_speed)
+        return (ball_set, EventSimulator(ball_set))
+
+    def to_bytes(self):
+        table = self.table
+        out = bytearray(struct.pack(
+            HEADER_FORMAT, MAGIC, EVENT_PHYSICS_FLAG if self.events else 0, self.substeps, self.seed,
+            table.x, table.z, table.half_length, table.half_width, table.friction, table.corner_pocket_size, table.middle_pocket_size,
+            self.sleep_speed, table.delay, len(self.layout)))
+        for (id, dx, dz) in self.layout:
+            out += struct.pack(BALL_FORMAT, id, dx, dz)
+
+        last_step = 0
+        for record in self.records:
+            out.append(record.kind)
+            write_varint(out, record.step - last_step)
+            last_step = record.step
+            if record.kind == STRIKE_RECORD:
+                (angle, power, angle_units, power_units) = quantize_strike(record.angle, record.power)
+                out += struct.pack(STRIKE_FORMAT, angle_units, power_units)
+        return bytes(out)
+
+    @staticmethod
+    def from_bytes(data):
+        (magic, flags, substeps, seed, x, z, half_length, half_width, friction, corner, middle, sleep_speed, delay, count) = struct.unpack_from(HEADER_FORMAT, data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a pool shot log")
+        offset = struct.calcsize(HEADER_FORMAT)
+
+        layout = []
+        for ball in range(count):
+            layout.append(struct.unpack_from(BALL_FORMAT, data, offset))
+            offset += struct.calcsize(BALL_FORMAT)
+
+        records = []
+        step = 0
+        while offset < len(data):
+            kind = data[offset]
+            (steps, offset) = read_varint(data, offset + 1)
+            step += steps
+            if kind == STRIKE_RECORD:
+                (angle_units, power_units) = struct.unpack_from(STRIKE_FORMAT, data, offset)
+                offset += struct.calcsize(STRIKE_FORMAT)
+                records.append(ShotRecord(kind, step, angle_units * ANGLE_UNIT, power_units * POWER_UNIT))
+            else:
+                records.append(ShotRecord(kind, step))
+
+        table = Table(x, z, half_length, half_width, delay, friction, corner, middle)
+        return ShotLog(table, layout, seed, bool(flags & EVENT_PHYSICS_FLAG), substeps, sleep_speed, records)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            return ShotLog.from_bytes(file.read())
+
+class ShotRecorder:
+    """Builds a ShotLog while a game is played"""
+
+    def __init__(self, ball_set, events=False, seed=None):
+        # the seed is kept in the log and used again on replay, but only the pool game (strikes and resets) is
+        #   recorded, the lights, lamp swing and dice come from key presses that aren't in the log
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        random.seed(self.seed)
+        self.log = ShotLog(ball_set.table, list(ball_set.layout), self.seed, events, ball_set.substeps, ball_set.sleep_speed)
+
+    def strike(self, step, angle, power):
+        """ Records a strike before the given physics step. Returns the (angle, power) to play,
+            rounded to what the log stores so the game and the replay stay the same.
+        """
+        (angle, power, angle_units, power_units) = quantize_strike(angle, power)
+        self.log.records.append(ShotRecord(STRIKE_RECORD, step, angle, power))
+        return (angle, power)
+
+    def reset(self, step):
+        self.log.records.append(ShotRecord(RESET_RECORD, step))
+
+    def save(self, path):
+        self.log.save(path)
+
+class ShotPlayer:
+    """Hands out the records of a log as the physics steps they belong to come up"""
+
+    def __init__(self, log):
+        self.log = log
+        self.next_record = 0
+
+    def due(self, step):
+        """ Every record to apply before the given physics step. """
+        records = []
+        while self.next_record < len(self.log.records) and self.log.records[self.next_record].step <= step:
+            records.append(self.log.records[self.next_record])
+            self.next_record += 1
+        return records
+
+    def finished(self):
+        return self.next_record >= len(self.log.records)
+
+def play_step(ball_set, simulator, records, events=False):
+    """ One physics step of the game, in the same order as advance() in the scene. """
+    for record in records:
+        if record.kind == STRIKE_RECORD:
+            if events:
+                simulator.strike(record.angle, record.power)
+            else:
+                ball_set.strike(record.angle, record.power)
+        else:
+            ball_set.rack()
+            simulator.reset()
+
+    # sinking the cue ball resets the game
+    if ball_set.scratched():
+        ball_set.rack()
+        simulator.reset()
+
+    if events:
+        simulator.advance()
+    else:
+        ball_set.step()
+
+def replay(log):
+    """ Replays a log without drawing, until the last shot stops. Returns (ball set, physics steps played). """
+    (ball_set, simulator) = log.new_ball_set()
+    player = ShotPlayer(log)
+    step = 0
+    while True:
+        if ball_set.at_rest() and not ball_set.scratched():
+            if player.finished():
+                break
+            # nothing moves until the next record, so skip straight to it
+            step = max(step, log.records[player.next_record].step)
+        play_step(ball_set, simulator, player.due(step), log.events)
+        step += 1
+    return (ball_set, step)
+
+if __name__ == '__main__':
+    log = ShotLog.load(sys.argv[1])
+    start_time = time.perf_counter()
+    (ball_set, steps) = replay(log)
+    elapsed = time.perf_counter() - start_time
+
+    strikes = sum(1 for record in log.records if record.kind == STRIKE_RECORD)
+    print(f'{strikes} strikes, {steps} steps ({steps * log.table.delay / 1000:.1f}s of play) replayed in {elapsed:.3f}s')
+    print(f'sunk: {ball_set.ids[ball_set.sunk].tolist()}')
@@ -0,0 +1,56 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# redraw.py module
+# Description:
+#   Decides when the scene needs to be drawn again.
+#   A frame is only drawn when something could look different from the
+#   last one: something was marked (a key press, the window being shown
+#   again), a watched value changed (like the camera), or the scene is
+#   active (an animation or the balls are moving). When none of these
+#   happened the frame is skipped, and the main loop can sleep until the
+#   next event instead of drawing the same picture 60 times a second.
+#==============================
+
+class RedrawTracker:
+    """Collects reasons to redraw between frames"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled  # when False, every frame is drawn
+        self.reasons = set()    # why the next frame has to be drawn
+        self.watched = {}       # name -> value last seen by watch
+        self.was_active = True  # draw the first frame, and one more after activity stops
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+
+    def mark(self, reason):
+        """ Makes sure the next frame is drawn. """
+        self.reasons.add(reason)
+
+    def watch(self, name, value):
+        """ Marks name when value (anything comparable) is different from the last time it was watched. """
+        if name not in self.watched or self.watched[name] != value:
+            self.watched[name] = value
+            self.mark(name)
+
+    def should_draw(self, active):
+        """ Whether to draw this frame, given whether anything in the scene is active (moving) right now.
+            The frame after activity stops is still drawn, so the final resting state is shown.
+        """
+        draw = not self.enabled or active or self.was_active or len(self.reasons) > 0
+        self.was_active = active
+        self.reasons = set()
+        if draw:
+            self.frames_drawn += 1
+        else:
+            self.frames_skipped += 1
+        return draw
+
+    def idle(self):
+        """ True if there is nothing to draw until something new happens (the loop can wait for an event). """
+        return self.enabled and not self.was_active and len(self.reasons) == 0
+
+    def __str__(self):
+        return f'{self.frames_drawn} frames drawn, {self.frames_skipped} skipped'
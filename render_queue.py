@@ -0,0 +1,219 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# render_queue.py module
+# Description:
+#   A queue of draw items, sorted by texture and material before drawing.
+#   Instead of binding textures and setting materials as they go, the draw
+#   functions submit items (a texture, the material set with use_material,
+#   the current transform, and a function that only draws geometry). At the
+#   end of the frame the queue is sorted so that everything with the same
+#   texture and material is drawn together, and each state change is made
+#   once instead of every time the code happens to switch back and forth.
+#   Static objects are recorded once with bake, and each group of their
+#   items that shares a texture and material goes into its own display list
+#   (see geometry_cache.py), which holds geometry only. Every frame the
+#   object then submits one item per group, and those are sorted along with
+#   everything else.
+#   Transforms are kept on the CPU: the draw functions move with the queue's
+#   push_matrix, translate, rotate, scale and pop_matrix instead of the
+#   OpenGL calls of the same name, and each item keeps the matrix it was
+#   submitted with. Nothing is read back from OpenGL while queueing.
+#==============================
+import math
+import numpy as np
+from OpenGL.GL import *
+
+class DrawItem:
+    """Something to draw with one texture and material, and where to draw it"""
+
+    __slots__ = ("texture", "material", "face", "matrix", "draw", "args")
+
+    def __init__(self, texture, material, face, matrix, draw, args):
+        self.texture = texture      # Texture (see textures.py), or None for no texturing
+        self.material = material    # Material (see materials.py), or None to leave it alone
+        self.face = face
+        self.matrix = matrix        # transform from where the queue began (laid out for glMultMatrixf), or None if it is the same
+        self.draw = draw            # draw(*args) makes only geometry calls (no binds or materials)
+        self.args = args
+
+class RenderQueue:
+    """Draw items for a frame, drawn sorted by texture and material"""
+
+    def __init__(self, textures, materials, geometry, enabled=True, texturing=None):
+        self.textures = textures    # TextureRegistry the binds go through (see textures.py)
+        self.materials = materials  # MaterialTracker the materials go through (see materials.py)
+        self.geometry = geometry    # GeometryCache for the baked groups (see geometry_cache.py)
+        self.texturing = texturing or set_texturing  # turns texturing on and off
+        self.enabled = enabled      # when False, items are drawn in the order they were submitted
+        self.items = []
+        self.matrix = None          # transform from where the queue began, None while there is none
+        self.stack = []             # matrices saved by push_matrix
+        self.material = None        # material for the next items, from use_material
+        self.face = GL_FRONT
+        self.ranks = {}             # Material -> its place in the sort (equal materials share one)
+        self.baked = {}             # bake key -> list of (texture, material, face, items) groups
+        self.drawn = 0              # items drawn by the last flush
+        self.changes = 0            # texture binds and material changes the last flush made
+        self.unsorted_changes = 0   # the changes the last flush would have made without sorting
+
+    def begin(self):
+        """ Starts a new queue. Items are drawn relative to the modelview matrix when flush is called. """
+        self.items = []
+        self.matrix = None
+        self.stack = []
+        self.material = None
+        self.face = GL_FRONT
+
+    def use_material(self, material, face=GL_FRONT):
+        """ Sets the material for the items submitted after this (like MaterialTracker.apply). """
+        self.material = material
+        self.face = face
+
+    def submit(self, texture, draw, *args):
+        """ Queues draw(*args) to be drawn with texture, the current material and the current transform. """
+        self.items.append(DrawItem(texture, self.material, self.face, self.matrix, draw, args))
+
+    #==============================
+    # Transforms, the same as the OpenGL matrix calls but for the queued items
+    #==============================
+
+    def push_matrix(self):
+        self.stack.append(self.matrix)
+
+    def pop_matrix(self):
+        self.matrix = self.stack.pop()
+
+    def multiply(self, matrix):
+        # matrices are laid out for glMultMatrixf (columns as rows), so the new one goes on the left
+        #   (matrices are never changed once made, so items can share them)
+        self.matrix = matrix if self.matrix is None else matrix @ self.matrix
+
+    def translate(self, x, y, z):
+        self.multiply(translation_matrix(x, y, z))
+
+    def rotate(self, angle, x, y, z):
+        self.multiply(rotation_matrix(angle, x, y, z))
+
+    def scale(self, x, y, z):
+        self.multiply(scale_matrix(x, y, z))
+
+    def bake(self, key, draw_function, *args):
+        """ Submits a static object. The first time, draw_function(*args) is recorded and its items are
+            grouped by texture and material, each group becoming one display list the first time it is drawn.
+        """
+        # taken before recording, every group is drawn from where the object was submitted
+        matrix = self.matrix
+        if key not in self.baked:
+            self.baked[key] = self.record(draw_function, *args)
+        for (index, (texture, material, face, items)) in enumerate(self.baked[key]):
+            self.items.append(DrawItem(texture, material, face, matrix, self.geometry.draw, ((key, index), draw_items, items)))
+
+    def record(self, draw_function, *args):
+        # the object's items are collected on their own, relative to where it is drawn from
+        #   (and whatever transform draw_function leaves behind is put back afterwards)
+        saved = (self.items, self.matrix, self.stack, self.material, self.face)
+        self.begin()
+        draw_function(*args)
+        groups = {}
+        for item in self.items:
+            groups.setdefault((item.texture, item.material, item.face), []).append(item)
+        (self.items, self.matrix, self.stack, self.material, self.face) = saved
+        return [state + (items,) for (state, items) in groups.items()]
+
+    def sort_key(self, item):
+        texture = item.texture.name if item.texture is not None else 0
+        if item.material not in self.ranks:
+            self.ranks[item.material] = len(self.ranks)
+        return (texture, self.ranks[item.material], item.face)
+
+    def flush(self):
+        """ Draws every queued item, sorted by texture then material, and empties the queue. """
+        self.unsorted_changes = count_changes(self.items)
+        if self.enabled:
+            # sorted() keeps the order items were submitted in within each texture and material
+            self.items = sorted(self.items, key=self.sort_key)
+        self.changes = count_changes(self.items)
+        self.drawn = len(self.items)
+
+        (texture, material) = (False, False)    # nothing set yet
+        for item in self.items:
+            if item.texture is not texture:
+                if item.texture is None:
+                    self.texturing(False)
+                else:
+                    self.textures.bind(item.texture)
+                    self.texturing(True)
+                texture = item.texture
+            if (item.material, item.face) != material:
+                if item.material is not None:
+                    self.materials.apply(item.material, item.face)
+                material = (item.material, item.face)
+            draw_item(item)
+        self.texturing(False)
+        self.items = []
+
+    def __str__(self):
+        return f'{self.drawn} items drawn with {self.changes} state changes ({self.unsorted_changes} in the order they were submitted)'
+
+def translation_matrix(x, y, z):
+    """ The matrix glTranslatef multiplies by, laid out for glMultMatrixf. """
+    matrix = np.identity(4, dtype=np.float32)
+    matrix[3, 0:3] = (x, y, z)
+    return matrix
+
+def rotation_matrix(angle, x, y, z):
+    """ The matrix glRotatef multiplies by (angle in degrees, counterclockwise about (x, y, z)), laid out for glMultMatrixf. """
+    length = math.sqrt(x * x + y * y + z * z)
+    (x, y, z) = (x / length, y / length, z / length)
+    radians = math.radians(angle)
+    (c, s) = (math.cos(radians), math.sin(radians))
+    t = 1 - c
+    matrix = np.identity(4, dtype=np.float32)
+    # the rotation's columns, as rows
+    matrix[0:3, 0:3] = (
+        (t * x * x + c, t * x * y + s * z, t * x * z - s * y),
+        (t * x * y - s * z, t * y * y + c, t * y * z + s * x),
+        (t * x * z + s * y, t * y * z - s * x, t * z * z + c),
+    )
+    return matrix
+
+def scale_matrix(x, y, z):
+    """ The matrix glScalef multiplies by, laid out for glMultMatrixf. """
+    return np.diag(np.array((x, y, z, 1), dtype=np.float32))
+
+def set_texturing(enabled):
+    if enabled:
+        glEnable(GL_TEXTURE_2D)
+    else:
+        glDisable(GL_TEXTURE_2D)
+
+def draw_item(item):
+    """ Draws item where it was submitted, without setting its state. """
+    if item.matrix is None:
+        item.draw(*item.args)
+    else:
+        glPushMatrix()
+        glMultMatrixf(item.matrix)
+        item.draw(*item.args)
+        glPopMatrix()
+
+def draw_items(items):
+    """ Draws items one after the other (a baked group, that all shares one state). """
+    for item in items:
+        draw_item(item)
+
+def count_changes(items):
+    """ Texture binds and material changes it takes to draw items in this order. """
+    changes = 0
+    (texture, material) = (False, False)
+    for item in items:
+        if item.texture is not texture:
+            changes += 1
+            texture = item.texture
+        if (item.material, item.face) != material:
+            changes += 1
+            material = (item.material, item.face)
+    return changes
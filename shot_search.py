@@ -0,0 +1,163 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# shot_search.py module
+# Description:
+#   Monte Carlo search for good pool shots.
+#   A grid or random sample of (angle, power) shots is spread across a
+#   pool of worker processes. Each worker plays the shot on its own copy
+#   of the current ball set until every ball stops, and the results are
+#   ranked by balls sunk without scratching.
+#   Shots are played with the EventSimulator by default, which jumps from
+#   impact to impact and is about 8x faster than stepping every frame (a
+#   grid of 7200 shots takes about 28s on one core instead of 209s). Its
+#   contact rule is not quite the same as BallSet.step though (see
+#   billiards.py), so a few shots end differently in the game.
+#   Used for the in-game hint, or run directly for offline analysis:
+#       python shot_search.py [number of random shots]
+#==============================
+import sys
+import time
+import random
+import multiprocessing
+from billiards import *
+
+# limits of the aiming controls in the scene
+MIN_POWER = 0.1
+MAX_POWER = 4.0
+ANGLE_STEP = 2      # degrees per left/right press
+POWER_STEP = 0.1    # power per up/down press
+
+# longest a shot is played before giving up on the balls stopping
+MAX_SHOT_FRAMES = 5000
+
+class ShotResult:
+    """The outcome of one shot"""
+
+    def __init__(self, angle, power, sunk, scratched, frames):
+        self.angle = angle          # degrees, same as cue_ball_angle
+        self.power = power          # same as cue_ball_power
+        self.sunk = sunk            # object balls sunk by this shot
+        self.scratched = scratched  # True if the cue ball went in
+        self.frames = frames        # frames until every ball stopped
+
+    def rank_key(self):
+        # scratches go last, then the most balls sunk, then the shortest shot
+        return (self.scratched, -self.sunk, self.frames)
+
+    def __str__(self):
+        return f'angle {self.angle:g}, power {self.power:.1f}: {self.sunk} sunk{" (scratch)" if self.scratched else ""}, {self.frames:.0f} frames'
+
+def shot_grid(angle_step=ANGLE_STEP, power_step=POWER_STEP, min_power=MIN_POWER, max_power=MAX_POWER):
+    """ Every (angle, power) shot on a grid, by default every shot reachable with the aiming controls. """
+    angles = [angle * angle_step for angle in range(int(round(360 / angle_step)))]
+    powers = [round(min_power + step * power_step, 6) for step in range(int(round((max_power - min_power) / power_step)) + 1)]
+    return [(angle, power) for angle in angles for power in powers]
+
+def random_shots(count, seed=None, angle_step=ANGLE_STEP, power_step=POWER_STEP):
+    """ A random sample of count shots from the grid (without repeats once the grid runs out). """
+    grid = shot_grid(angle_step, power_step)
+    generator = random.Random(seed)
+    if count >= len(grid):
+        return grid
+    return generator.sample(grid, count)
+
+def simulate_shot(ball_set, angle, power, events=True, max_frames=MAX_SHOT_FRAMES):
+    """ Plays one shot on a copy of ball_set until every ball stops. Returns a ShotResult. """
+    balls = ball_set.copy()
+    sunk_before = balls.sunk.copy()
+
+    if events:
+        simulator = EventSimulator(balls)
+        simulator.strike(angle, power)
+        frames = simulator.run_until_rest(max_frames)
+    else:
+        balls.strike(angle, power)
+        frames = 0
+        while not balls.at_rest() and frames < max_frames:
+            balls.step()
+            frames += 1
+
+    sunk = int((balls.sunk & ~sunk_before)[balls.ids != 0].sum())
+    return ShotResult(angle, power, sunk, balls.scratched(), frames)
+
+def rank_shots(results):
+    return sorted(results, key=ShotResult.rank_key)
+
+#==============================
+# Worker processes
+#   each worker is handed the ball set once, then only (angle, power) pairs are sent
+#==============================
+
+worker_ball_set = None
+worker_events = True
+
+def start_worker(ball_set, events):
+    global worker_ball_set, worker_events
+    worker_ball_set = ball_set
+    worker_events = events
+
+def evaluate_shot(shot):
+    (angle, power) = shot
+    return simulate_shot(worker_ball_set, angle, power, worker_events)
+
+class ShotSearch:
+    """Evaluates many shots from one table state across a process pool"""
+
+    def __init__(self, ball_set, events=True, processes=None):
+        self.ball_set = ball_set.copy()   # later changes to the game don't affect the search
+        self.events = events              # use the EventSimulator (False steps every frame, like the scene by default)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.workers = None
+        self.pending = None
+
+    def chunksize(self, shots):
+        # a few chunks per process keeps every worker busy without sending one shot at a time
+        return max(1, len(shots) // (self.processes * 4))
+
+    def search(self, shots):
+        """ Evaluates every shot and returns the results, best first (blocks until done). """
+        if self.processes == 1:
+            start_worker(self.ball_set, self.events)
+            return rank_shots([evaluate_shot(shot) for shot in shots])
+        with multiprocessing.Pool(self.processes, start_worker, (self.ball_set, self.events)) as workers:
+            return rank_shots(workers.map(evaluate_shot, shots, self.chunksize(shots)))
+
+    def start(self, shots):
+        """ Starts evaluating shots in the background, check ready() and collect them with results(). """
+        self.workers = multiprocessing.Pool(self.processes, start_worker, (self.ball_set, self.events))
+        self.pending = self.workers.map_async(evaluate_shot, shots, self.chunksize(shots))
+        self.workers.close()
+
+    def ready(self):
+        return self.pending is not None and self.pending.ready()
+
+    def results(self):
+        """ The results of start(), best first (blocks until done). """
+        results = rank_shots(self.pending.get())
+        self.workers.join()
+        self.workers = None
+        self.pending = None
+        return results
+
+    def cancel(self):
+        if self.workers is not None:
+            self.workers.terminate()
+            self.workers.join()
+        self.workers = None
+        self.pending = None
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else len(shot_grid())
+    shots = random_shots(count, seed=0)
+    search = ShotSearch(BallSet(Table()))
+
+    start_time = time.perf_counter()
+    results = search.search(shots)
+    elapsed = time.perf_counter() - start_time
+
+    print(f'{len(shots)} shots in {elapsed:.2f}s on {search.processes} processes ({len(shots) / elapsed:.0f} shots/s)')
+    for result in results[:10]:
+        print(f'  {result}')
@@ -0,0 +1,160 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# textures.py module
+# Description:
+#   Keeps track of every texture in the scene.
+#   Wrap and filter settings belong to the texture object in OpenGL, so they
+#   are set once when the texture is uploaded instead of every time it is
+#   drawn. The registry also remembers which texture is bound, so binding
+#   the texture that is already bound costs nothing.
+#   Images are uploaded at a power of two size picked from their own
+#   resolution, with a full chain of mipmaps so far away surfaces don't
+#   shimmer, and in a compressed format (S3TC) when the driver has one.
+#==============================
+import math
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
+
+# compressed internal format for each pixel format
+COMPRESSED_FORMATS = {
+    GL_RGB: GL_COMPRESSED_RGB_S3TC_DXT1_EXT,    # 6:1
+    GL_RGBA: GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,  # 4:1
+}
+# bytes per pixel of the uncompressed formats
+CHANNELS = {GL_RGB: 3, GL_RGBA: 4}
+
+# min filter used instead of the texture's own when it has mipmaps
+MIPMAP_FILTER = GL_LINEAR_MIPMAP_NEAREST
+
+def power_of_two_size(size, max_size):
+    """ The power of two closest to size (a source image width or height), no bigger than max_size. """
+    size = 2 ** round(math.log2(max(size, 1)))
+    return min(size, 2 ** int(math.log2(max_size)))
+
+def mip_chain(pixels, max_level=None):
+    """ Mipmap levels of pixels ((height, width, channels) uint8 array), from pixels itself down to 1x1,
+        each made by averaging 2x2 blocks of the one before. Stops early at max_level, or at an odd size.
+    """
+    levels = [pixels]
+    while max_level is None or len(levels) <= max_level:
+        (height, width) = pixels.shape[:2]
+        if (height == 1 and width == 1) or (height > 1 and height % 2) or (width > 1 and width % 2):
+            break
+        # a side that is already 1 pixel stays 1 pixel, the other keeps halving
+        (rows, columns) = (max(height // 2, 1), max(width // 2, 1))
+        blocks = pixels.reshape(rows, height // rows, columns, width // columns, pixels.shape[2])
+        pixels = (blocks.mean(axis=(1, 3)) + 0.5).astype(np.uint8)
+        levels.append(pixels)
+    return levels
+
+# renderers that run on the CPU, where compressed textures are decoded again for every sample
+#   and there is no video memory bandwidth to save
+SOFTWARE_RENDERERS = (b"llvmpipe", b"softpipe", b"swrast", b"Software Rasterizer")
+
+def supports_compression():
+    """ Whether compressing textures to S3TC is worth it in the current OpenGL context:
+        the driver has to support it, and run on a GPU.
+    """
+    extensions = glGetString(GL_EXTENSIONS) or b""
+    renderer = glGetString(GL_RENDERER) or b""
+    if any(name in renderer for name in SOFTWARE_RENDERERS):
+        return False
+    return b"GL_EXT_texture_compression_s3tc" in extensions.split()
+
+class Texture:
+    """Handle to an uploaded texture and the sampler settings it was given"""
+
+    def __init__(self, name, width, height, wrap, min_filter, mag_filter, levels=1, internal_format=None, size=0):
+        self.name = name              # OpenGL texture name
+        self.width = width
+        self.height = height
+        self.wrap = wrap              # GL_REPEAT/GL_CLAMP_TO_EDGE, same for s and t
+        self.min_filter = min_filter  # GL_NEAREST/GL_LINEAR, or MIPMAP_FILTER
+        self.mag_filter = mag_filter
+        self.levels = levels          # mipmap levels uploaded (1 means no mipmaps)
+        self.internal_format = internal_format
+        self.size = size              # bytes OpenGL keeps for every level
+
+class TextureRegistry:
+    """Every uploaded texture, and the one that is currently bound"""
+
+    def __init__(self, mipmaps=True, compress=True):
+        self.textures = {}  # key (usually the file name) -> Texture
+        self.bound = None   # Texture currently bound, or None if not known
+        self.binds = 0      # binds that reached OpenGL
+        self.skipped = 0    # binds skipped because the texture was already bound
+        self.mipmaps = mipmaps    # default for upload
+        self.compress = compress  # default for upload, only where the driver supports it
+        self.can_compress = None  # whether it does, checked on the first upload
+
+    def upload(self, key, width, height, format, pixels, wrap=GL_REPEAT, filter=GL_NEAREST, mag_filter=None, mipmaps=None, compress=None, max_level=None):
+        """ Uploads pixels (in format GL_RGB/GL_RGBA) as a new texture and sets its sampler state. Returns the Texture.
+            mipmaps and compress default to the registry's settings, max_level limits how many mipmaps are made.
+        """
+        if mag_filter is None:
+            mag_filter = filter
+        if mipmaps is None:
+            mipmaps = self.mipmaps
+        if compress is None:
+            compress = self.compress
+        if compress and self.can_compress is None:
+            self.can_compress = supports_compression()
+        compress = compress and self.can_compress
+
+        levels = [pixels]
+        if mipmaps:
+            # pixels can be bytes (from PIL), a list or an array
+            array = np.frombuffer(pixels, dtype=np.uint8) if isinstance(pixels, bytes) else np.asarray(pixels, dtype=np.uint8)
+            levels = mip_chain(array.reshape(height, width, CHANNELS[format]), max_level)
+        internal_format = COMPRESSED_FORMATS[format] if compress else format
+
+        texture = Texture(glGenTextures(1), width, height, wrap, MIPMAP_FILTER if mipmaps else filter, mag_filter, len(levels), internal_format)
+        self.bind(texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, texture.min_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, mag_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+        # rows are tightly packed, the small mipmaps of RGB images aren't 4-byte aligned
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for (level, level_pixels) in enumerate(levels):
+            (level_width, level_height) = (max(width >> level, 1), max(height >> level, 1))
+            glTexImage2D(GL_TEXTURE_2D, level, internal_format, level_width, level_height, 0, format, GL_UNSIGNED_BYTE, level_pixels)
+            if compress:
+                texture.size += glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED_IMAGE_SIZE)
+            else:
+                texture.size += level_width * level_height * CHANNELS[format]
+        self.textures[key] = texture
+        return texture
+
+    def bind(self, texture):
+        """ Binds texture, unless it is already bound. """
+        if texture is self.bound:
+            self.skipped += 1
+            return
+        glBindTexture(GL_TEXTURE_2D, texture.name)
+        self.bound = texture
+        self.binds += 1
+
+    def forget(self):
+        """ Call after anything binds textures behind the registry's back (like a display list),
+            so the next bind always goes through.
+        """
+        self.bound = None
+
+    def __getitem__(self, key):
+        return self.textures[key]
+
+    def __contains__(self, key):
+        return key in self.textures
+
+    def __len__(self):
+        return len(self.textures)
+
+    def memory(self):
+        """ Bytes OpenGL keeps for every texture in the registry. """
+        return sum(texture.size for texture in self.textures.values())
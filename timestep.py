@@ -0,0 +1,41 @@
+#==============================
+# Matthew Merritt, Michael Merritt, Harsh Gandhi
+# CSC345/CSC645: Computer Graphics
+#   Fall 2024
+#
+# timestep.py module
+# Description:
+#   Defines a fixed timestep accumulator.
+#   The real time each rendered frame takes is added up, and the scene
+#   is updated in whole steps of a fixed size, so animations and physics
+#   run at the same speed no matter how fast frames are drawn.
+#   The leftover time is used to blend between the last two steps when drawing.
+#==============================
+
+class FixedTimestep:
+    """Turns variable frame times into a whole number of fixed size update steps"""
+
+    def __init__(self, steps_per_second=60.0, max_steps=5):
+        self.step_time = 1.0 / steps_per_second     # seconds per update step
+        self.max_steps = max_steps                  # most steps run for a single frame
+        self.accumulator = 0.0                      # real time not yet used by a step
+        self.steps_dropped = 0                      # steps skipped because a frame took too long
+
+    def advance(self, frame_time):
+        """ Adds the real time (seconds) of the last frame. Returns how many update steps to run now. """
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.step_time)
+
+        # a very slow frame would otherwise need more and more steps to catch up,
+        #   so past the cap the extra time is dropped instead (the scene slows down a little)
+        if steps > self.max_steps:
+            self.steps_dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = steps * self.step_time + self.accumulator % self.step_time
+
+        self.accumulator -= steps * self.step_time
+        return steps
+
+    def alpha(self):
+        """ How far (0 to 1) the current time is between the last step and the next one, used for drawing. """
+        return min(max(self.accumulator / self.step_time, 0.0), 1.0)